@@ -0,0 +1,35 @@
+"""Sąlyginiai GET (`ETag` / `If-None-Match` -> 304) API endpoint'ams.
+
+Principai:
+- ETag sudaromas iš pigių versijų šaltinių (generacijų, `updated_at`), o ne
+  iš atsakymo kūno, todėl patikrinamas prieš sunkias užklausas ir
+  serializavimą – 304 atveju kūnas išvis nesudaromas.
+- ETag'ai stiprūs: ta pati versija visada duoda identišką atsakymą.
+"""
+
+from __future__ import annotations
+
+import hashlib
+
+from django.http import HttpRequest, HttpResponseNotModified
+from django.utils.http import parse_etags, quote_etag
+
+
+def make_etag(*parts: object) -> str:
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()
+    return quote_etag(digest)
+
+
+def not_modified(request: HttpRequest, etag: str) -> HttpResponseNotModified | None:
+    """304 atsakymas, jei klientas jau turi šią versiją; kitaip `None`."""
+
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return None
+    # `If-None-Match` lyginamas silpnai: `W/` (pvz., po gzip) nesvarbus.
+    etags = [value.removeprefix("W/") for value in parse_etags(header)]
+    if "*" not in etags and etag not in etags:
+        return None
+    response = HttpResponseNotModified()
+    response["ETag"] = etag
+    return response
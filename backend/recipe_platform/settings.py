@@ -13,6 +13,34 @@ if env_file.exists():
 
 UPSTASH_SEARCH_ENABLED = env.bool("UPSTASH_SEARCH_ENABLED", default=True)
 UPSTASH_SEARCH_INDEX = env("UPSTASH_SEARCH_INDEX", default="recipes")
+# Struktūrinius filtrus (tag, category, ...) perduoti Upstash užklausai.
+# Reikalauja dokumentų su `*_slugs` laukais (`upstash_backfill_recipes`).
+UPSTASH_SEARCH_FILTER_PUSHDOWN = env.bool("UPSTASH_SEARCH_FILTER_PUSHDOWN", default=True)
+# Paieškos backend'as: `recipes.search_backend.UpstashSearchBackend` arba
+# įterptinis `recipes.bm25.BM25SearchBackend` (be tinklo kvietimų).
+RECIPE_SEARCH_BACKEND = env(
+    "RECIPE_SEARCH_BACKEND", default="recipes.search_backend.UpstashSearchBackend"
+)
+RECIPE_SEARCH_BM25_PATH = env("RECIPE_SEARCH_BM25_PATH", default=str(BASE_DIR / "var" / "search"))
+RECIPE_SEARCH_BM25_JOURNAL_MAX_BYTES = env.int(
+    "RECIPE_SEARCH_BM25_JOURNAL_MAX_BYTES", default=8 * 1024 * 1024
+)
+# Paieškos rezultatų (surikiuotų ID) talpykla proceso atmintyje.
+RECIPE_SEARCH_RESULT_CACHE_TIMEOUT = env.int("RECIPE_SEARCH_RESULT_CACHE_TIMEOUT", default=300)
+RECIPE_SEARCH_RESULT_CACHE_SIZE = env.int("RECIPE_SEARCH_RESULT_CACHE_SIZE", default=256)
+RECIPE_SEARCH_MAX_RESULTS = env.int("RECIPE_SEARCH_MAX_RESULTS", default=10000)
+# Panašių receptų indeksas (`related.npy`, mmap'inamas visų worker'ių).
+RECIPE_RELATED_PATH = env("RECIPE_RELATED_PATH", default=str(BASE_DIR / "var" / "related"))
+# Indekso pakeitimai per DB eilę (`update_related_recipes` worker'is); False – iškart po commit'o.
+RECIPE_RELATED_UPDATES_QUEUED = env.bool("RECIPE_RELATED_UPDATES_QUEUED", default=True)
+# Rekomendacijų kaimynai (`build_recommendations`) ir sąveikų svorio pusėjimo laikas.
+RECIPE_RECOMMEND_PATH = env("RECIPE_RECOMMEND_PATH", default=str(BASE_DIR / "var" / "recommend"))
+RECIPE_RECOMMEND_HALF_LIFE_DAYS = env.int("RECIPE_RECOMMEND_HALF_LIFE_DAYS", default=180)
+# `sort=trending` įverčio pusėjimo laikas; pakeitus – `update_popularity --rebuild`.
+RECIPE_TRENDING_HALF_LIFE_HOURS = env.int("RECIPE_TRENDING_HALF_LIFE_HOURS", default=72)
+# Peržiūrų skaitiklis: kaupiama proceso atmintyje, į DB rašoma kas N sekundžių.
+RECIPE_VIEW_COUNTER_ENABLED = env.bool("RECIPE_VIEW_COUNTER_ENABLED", default=True)
+RECIPE_VIEW_FLUSH_INTERVAL = env.int("RECIPE_VIEW_FLUSH_INTERVAL", default=30)
 
 PRIMARY_DOMAIN = env("PRIMARY_DOMAIN", default="apetitas.lt")
 API_HOST = env("API_HOST", default=f"api.{PRIMARY_DOMAIN}")
@@ -101,6 +129,39 @@ TIME_ZONE = "Europe/Vilnius"
 USE_I18N = True
 USE_TZ = True
 
+CACHES = {
+    "default": env.cache("CACHE_URL", default="locmemcache://"),
+}
+RECIPE_LISTING_CACHE_TIMEOUT = env.int("RECIPE_LISTING_CACHE_TIMEOUT", default=300)
+# Viešos recepto detalės talpykla (s); 0 – išjungta.
+RECIPE_DETAIL_CACHE_TIMEOUT = env.int("RECIPE_DETAIL_CACHE_TIMEOUT", default=600)
+# Paveikslėlių variantai generuojami `process_image_jobs` worker'yje; False – sinchroniškai
+# išsaugant (pvz., lokaliai be worker'io).
+RECIPE_IMAGE_JOBS_ENABLED = env.bool("RECIPE_IMAGE_JOBS_ENABLED", default=True)
+RECIPE_IMAGE_JOB_MAX_ATTEMPTS = env.int("RECIPE_IMAGE_JOB_MAX_ATTEMPTS", default=5)
+# Paveikslėlių origin (`/api/recipes/images/...`): atskiras parašo raktas (ne SECRET_KEY; tuščias –
+# origin išjungtas), leistini pločiai ir kokybės, vienu metu koduojamų užklausų skaičius.
+RECIPE_IMAGE_ORIGIN_KEY = env("RECIPE_IMAGE_ORIGIN_KEY", default="")
+RECIPE_IMAGE_ORIGIN_WIDTHS = env.list(
+    "RECIPE_IMAGE_ORIGIN_WIDTHS",
+    cast=int,
+    default=[160, 240, 320, 480, 640, 768, 960, 1280, 1600, 1920],
+)
+RECIPE_IMAGE_ORIGIN_QUALITIES = env.list(
+    "RECIPE_IMAGE_ORIGIN_QUALITIES", cast=int, default=[60, 75, 85]
+)
+RECIPE_IMAGE_ORIGIN_WORKERS = env.int("RECIPE_IMAGE_ORIGIN_WORKERS", default=2)
+RECIPE_FILTER_INDEX_ENABLED = env.bool("RECIPE_FILTER_INDEX_ENABLED", default=True)
+# Pasiūlymų (typeahead) indekso pilno perkrovimo intervalas (populiarumui), s.
+RECIPE_SUGGEST_MAX_AGE = env.int("RECIPE_SUGGEST_MAX_AGE", default=3600)
+# „Ką galiu pagaminti?“ – atmintyje laikomas ingredientų indeksas (`/recipes/pantry`).
+RECIPE_PANTRY_INDEX_ENABLED = env.bool("RECIPE_PANTRY_INDEX_ENABLED", default=True)
+# Paieška be rezultatų: False – tik „Galbūt turėjote omenyje…“, True – iškart
+# grąžinami pataisytos užklausos rezultatai.
+RECIPE_SEARCH_AUTOCORRECT = env.bool("RECIPE_SEARCH_AUTOCORRECT", default=False)
+# DB paieška per tsvector (tik PostgreSQL), kai Upstash nenaudojamas.
+RECIPE_FULLTEXT_ENABLED = env.bool("RECIPE_FULLTEXT_ENABLED", default=True)
+
 STATIC_URL = "/static/"
 STATIC_ROOT = BASE_DIR / "staticfiles"
 STATICFILES_DIRS = [BASE_DIR /
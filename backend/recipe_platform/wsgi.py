@@ -14,3 +14,14 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "recipe_platform.settings")
 
 application = get_wsgi_application()
+
+# Atmintyje laikomi receptų indeksai užkraunami paleidžiant, ne per pirmą užklausą.
+from recipes.filter_index import warm_filter_index  # noqa: E402
+from recipes.pantry import warm_pantry_index  # noqa: E402
+from recipes.spelling import warm_spelling_index  # noqa: E402
+from recipes.suggest import warm_suggest_index  # noqa: E402
+
+warm_filter_index()
+warm_suggest_index()
+warm_spelling_index()
+warm_pantry_index()
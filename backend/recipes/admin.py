@@ -3,8 +3,11 @@
 from django.contrib import admin
 from ckeditor.widgets import CKEditorWidget
 from django import forms
+from django.db import transaction
+from django.utils import timezone
 
 from recipes import models
+from recipes.detail_cache import bump_detail_versions
 
 
 class RecipeAdminForm(forms.ModelForm):
@@ -132,4 +135,33 @@ class CommentAdmin(admin.ModelAdmin):
 
     @admin.action(description="Pažymėti kaip patvirtintus")
     def approve_comments(self, request, queryset):
+        # `update()` signalų nekelia – viešą detalę pasendinam patys.
+        recipe_ids = set(queryset.values_list("recipe_id", flat=True))
         queryset.update(is_approved=True)
+        transaction.on_commit(lambda: bump_detail_versions(recipe_ids))
+
+
+@admin.register(models.RecipeViewDaily)
+class RecipeViewDailyAdmin(admin.ModelAdmin):
+    list_display = ("recipe", "day", "views")
+    list_filter = ("day",)
+    search_fields = ("recipe__title",)
+    date_hierarchy = "day"
+
+
+@admin.register(models.ImageVariantJob)
+class ImageVariantJobAdmin(admin.ModelAdmin):
+    list_display = ("kind", "object_id", "source", "status", "attempts", "run_after", "updated_at")
+    list_filter = ("status", "kind")
+    search_fields = ("source",)
+    readonly_fields = ("last_error",)
+    actions = ["retry_jobs"]
+
+    @admin.action(description="Grąžinti į eilę")
+    def retry_jobs(self, request, queryset):
+        queryset.update(
+            status=models.ImageVariantJob.Status.PENDING,
+            attempts=0,
+            run_after=timezone.now(),
+            locked_at=None,
+        )
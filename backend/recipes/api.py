@@ -2,54 +2,120 @@
 
 from __future__ import annotations
 
+import json
 import logging
+from datetime import timedelta
 from typing import Iterable
 from typing import Optional
 
+import numpy as np
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Avg, Case, Count, IntegerField, Prefetch, Q, When
+from django.db import connection
+from django.db.models import Case, Count, Exists, F, IntegerField, Prefetch, Subquery, When
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
+from django.utils import timezone
 from django.views.decorators.csrf import csrf_protect
 from ninja import Query, Router
 from ninja.errors import HttpError
+from pyroaring import BitMap
 
 from notifications.services import EmailTemplateNotFound, send_templated_email
-
-from .models import Bookmark, Comment, Rating, Recipe, RecipeIngredient, RecipeStep
-from .upstash_search import is_enabled as upstash_is_enabled
-from .upstash_search import search_recipe_ids
+from recipe_platform.conditional import make_etag, not_modified
+
+from . import detail_cache, listing_cache
+from . import image_origin as image_origin_service
+from .etags import list_etag_parts
+from .filter_index import RecipeFilterIndex, get_filter_index
+from .filtering import SLUG_FILTERS, apply_structured_filters, has_structured_filters
+from .fulltext import apply_fulltext_search
+from .fulltext import is_enabled as fulltext_is_enabled
+from .image_variants import SIZES as IMAGE_SIZES
+from .image_variants import current_original, current_variants
+from .models import (
+    Bookmark,
+    Comment,
+    Cuisine,
+    Difficulty,
+    Ingredient,
+    MealType,
+    Rating,
+    Recipe,
+    RecipeCategory,
+    RecipeIngredient,
+    RecipeRatingStats,
+    RecipeStep,
+    RecipeViewDaily,
+    Tag,
+)
+from .pagination import (
+    LIST_ORDERING,
+    SCORE_FIELDS,
+    InvalidCursorError,
+    RecipeCursor,
+    decode_cursor,
+    encode_keyset_cursor,
+    encode_ranked_cursor,
+    encode_score_cursor,
+    keyset_filter,
+    score_keyset_filter,
+    score_ordering,
+)
+from .pantry import get_pantry_index
+from .ratings import set_user_rating
+from .recommendations import recommended_recipe_ids
+from .related import related_recipe_ids
 from .schemas import (
     BookmarkToggleSchema,
     CommentCreateSchema,
     CommentSchema,
+    FacetBucketSchema,
     ImageSetSchema,
     ImageVariantSchema,
     IngredientSchema,
     MeasurementUnitSchema,
+    PantryFilters,
+    PantryRecipeSchema,
+    PantryResponse,
     RecipeDetailSchema,
+    RecipeFacetsResponse,
     RecipeFilters,
     RecipeIngredientSchema,
     RecipeListResponse,
     RecipeStepSchema,
     RecipeSummarySchema,
+    RecipeViewDaySchema,
+    RecipeViewStatsFilters,
+    RecipeViewStatsResponse,
+    RelatedFilters,
+    RelatedRecipesResponse,
+    RatingBucketSchema,
     RatingCreateSchema,
     RatingSchema,
+    RecommendedFilters,
     SimpleLookupSchema,
+    SuggestFilters,
+    SuggestItemSchema,
+    SuggestResponse,
 )
+from .search_backend import max_results as search_max_results
+from .search_backend import ranked_recipe_ids
+from .spelling import suggest_correction
+from .suggest import get_suggest_index
+from .view_counter import pending_views, record_view
 
 User = get_user_model()
 
 router = Router(tags=["Recipes"])
 logger = logging.getLogger(__name__)
 
-IMAGE_VARIANT_ATTRS = {
-    "thumb": {"avif": "image_thumb_avif", "webp": "image_thumb_webp"},
-    "small": {"avif": "image_small_avif", "webp": "image_small_webp"},
-    "medium": {"avif": "image_medium_avif", "webp": "image_medium_webp"},
-    "large": {"avif": "image_large_avif", "webp": "image_large_webp"},
-}
+
+def _abs_url(request, url: str) -> str:
+    if url.startswith("http://") or url.startswith("https://"):
+        return url
+    return request.build_absolute_uri(url)
 
 
 def _abs_media_url(request, file_field) -> str | None:
@@ -59,42 +125,57 @@ def _abs_media_url(request, file_field) -> str | None:
         url = file_field.url
     except ValueError:
         return None
-    if url.startswith("http://") or url.startswith("https://"):
-        return url
-    return request.build_absolute_uri(url)
+    return _abs_url(request, url)
 
 
 def _simple_lookup(obj) -> SimpleLookupSchema:
     return SimpleLookupSchema(id=obj.id, name=obj.name, slug=getattr(obj, "slug", None))
 
 
+def _serialize_variant(request, formats: dict) -> ImageVariantSchema:
+    avif, webp = formats.get("avif"), formats.get("webp")
+    sample = avif or webp or {}
+    return ImageVariantSchema(
+        avif=_abs_url(request, avif["url"]) if avif else None,
+        webp=_abs_url(request, webp["url"]) if webp else None,
+        width=sample.get("width"),
+        height=sample.get("height"),
+        avif_bytes=avif["bytes"] if avif else None,
+        webp_bytes=webp["bytes"] if webp else None,
+    )
+
+
 def _serialize_image_set(request, obj) -> ImageSetSchema | None:
-    image_field = getattr(obj, "image", None)
-    original_url = _abs_media_url(request, image_field)
-    variants: dict[str, ImageVariantSchema] = {}
-    has_variant = False
-    for size, mapping in IMAGE_VARIANT_ATTRS.items():
-        avif_spec = getattr(obj, mapping["avif"], None)
-        webp_spec = getattr(obj, mapping["webp"], None)
-        avif_url = _abs_media_url(request, avif_spec)
-        webp_url = _abs_media_url(request, webp_spec)
-        if avif_url or webp_url:
-            has_variant = True
-        variants[size] = ImageVariantSchema(avif=avif_url, webp=webp_url)
-    if not original_url and not has_variant:
+    # Tik manifestas (`recipes.image_variants`) – jokių saugyklos kreipinių.
+    original_url = _abs_media_url(request, getattr(obj, "image", None))
+    variants = current_variants(obj)
+    if not original_url and not variants:
         return None
+    original = current_original(obj)
+    origin = image_origin_service.origin_path(obj)
     return ImageSetSchema(
         original=original_url,
-        thumb=variants.get("thumb"),
-        small=variants.get("small"),
-        medium=variants.get("medium"),
-        large=variants.get("large"),
+        origin=_abs_url(request, origin) if origin else None,
+        sources=image_origin_service.sources(obj, lambda url: _abs_url(request, url)),
+        width=original.get("width"),
+        height=original.get("height"),
+        lqip=original.get("lqip"),
+        color=original.get("color"),
+        **{size: _serialize_variant(request, variants.get(size, {})) for size in IMAGE_SIZES},
     )
 
 
+def _rating_stats(recipe: Recipe) -> RecipeRatingStats | None:
+    try:
+        return recipe.rating_stats
+    except RecipeRatingStats.DoesNotExist:
+        return None
+
+
 def _serialize_recipe_summary(request, recipe: Recipe, bookmarked_ids: set[int]) -> RecipeSummarySchema:
-    rating_average = getattr(recipe, "rating_average", None)
-    rating_count = getattr(recipe, "rating_count", 0) or 0
+    stats = _rating_stats(recipe)
+    rating_average = stats.rating_average if stats else None
+    rating_count = stats.rating_count if stats else 0
     return RecipeSummarySchema(
         id=recipe.id,
         title=recipe.title,
@@ -225,11 +306,12 @@ def _notify_comment_submission(request, comment: Comment) -> None:
 
 
 def _prefetch_for_list(qs):
-    return qs.prefetch_related("tags")
+    # Paieškos laukai dideli ir sąrašui nereikalingi.
+    return qs.defer("search_document", "search_vector").prefetch_related("tags")
 
 
 def _prefetch_for_detail(qs):
-    return qs.prefetch_related(
+    return qs.defer("search_document", "search_vector").prefetch_related(
         "tags",
         "categories",
         "meal_types",
@@ -246,95 +328,225 @@ def _prefetch_for_detail(qs):
     )
 
 
-def _annotate_with_ratings(qs):
-    return qs.annotate(
-        rating_average=Avg("ratings__value"),
-        rating_count=Count("ratings", distinct=True),
+def _with_rating_stats(qs):
+    # Denormalizuota suvestinė – 1:1 LEFT JOIN, jokio agregavimo ir dublikatų.
+    return qs.select_related("rating_stats")
+
+
+def _serialize_rating_distribution(recipe: Recipe) -> list[RatingBucketSchema]:
+    stats = _rating_stats(recipe)
+    histogram = stats.histogram() if stats else {}
+    return [
+        RatingBucketSchema(value=value, count=histogram.get(value, 0))
+        for value in RecipeRatingStats.HISTOGRAM_FIELDS
+    ]
+
+
+def _apply_search(
+    qs, filters: RecipeFilters, *, allow_backend: bool = True, min_results: int = 0
+):
+    """Pritaiko paiešką; grąžina (qs, ranked_ids, prefiltered, exhausted).
+
+    `ranked_ids` nėra `None` tik tada, kai rezultatus davė paieškos backend'as
+    (`recipes.search_backend`) – tada jų tvarka yra rangas. Kitu atveju
+    (išjungta, klaida) – DB fallback.
+    `min_results` – kiek surikiuotų ID reikia puslapiui (`start + limit + 1`).
+    `prefiltered` reiškia, kad struktūriniai filtrai jau pritaikyti backend'o
+    pusėje ir ID sąrašas yra galutinis. `exhausted` – `ranked_ids` yra visi
+    rezultatai (ne tik jau parsiųsta dalis), todėl jų kiekis – tikras `total`.
+    """
+
+    search = filters.search
+    if allow_backend:
+        # Backend'ai neturi offset, todėl puslapiuojame lokaliai iš talpinamo
+        # sąrašo; daugiau rezultatų parsiunčiama tik prireikus.
+        result = ranked_recipe_ids(search, filters=filters, min_results=min_results)
+
+        # None reiškia: išjungta arba klaida -> darysim DB fallback.
+        if result is not None:
+            ranked_ids, prefiltered, exhausted = result
+            qs = qs.filter(id__in=ranked_ids) if ranked_ids else qs.none()
+            return qs, ranked_ids, prefiltered, exhausted
+
+    # Fallback (arba backend'o klaida / išjungtas): DB paieška per saugomą,
+    # sulankstytą tekstą (PostgreSQL – tsvector + GIN, su rangu).
+    return apply_fulltext_search(qs, search), None, False, True
+
+
+def _estimate_count(qs) -> int | None:
+    """PostgreSQL planuotojo eilučių įvertis (be realaus skenavimo).
+
+    Kitiems DB varikliams grąžina `None` – tada skaičiuojam tiksliai.
+    """
+
+    if connection.vendor != "postgresql":
+        return None
+    sql, params = qs.order_by().values("id").query.sql_with_params()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+    except Exception:  # pragma: no cover - gynybinis fallback
+        logger.exception("Nepavyko įvertinti receptų kiekio per EXPLAIN")
+        return None
+
+
+def _list_total(qs, filters: RecipeFilters, *, kind: str, exact) -> int | None:
+    """Sąrašo `total` pagal `count` režimą.
+
+    Tikslus kiekis skaičiuojamas iš „plikos“ užklausos (be prefetch/select_related)
+    ir laikomas talpykloje pagal normalizuotą filtrų kombinaciją.
+    """
+
+    if filters.count == "none":
+        return None
+
+    if filters.count == "estimate":
+        cached = listing_cache.get_cached(kind, filters)
+        if cached is not None:
+            return cached
+        estimate = _estimate_count(qs)
+        if estimate is not None:
+            return estimate
+
+    return listing_cache.get_or_compute(kind, filters, exact)
+
+
+def _recipes_in_order(page_ids: list[int], filters: RecipeFilters | None = None) -> list[Recipe]:
+    """Nuskaito puslapio receptus pagal ID ir išlaiko `page_ids` tvarką."""
+
+    if not page_ids:
+        return []
+    order = Case(
+        *[When(id=rid, then=pos) for pos, rid in enumerate(page_ids)],
+        output_field=IntegerField(),
     )
 
+    page_qs = Recipe.objects.filter(id__in=page_ids)
+    if filters is not None:
+        page_qs = apply_structured_filters(page_qs, filters)
+    page_qs = _with_rating_stats(page_qs)
+    page_qs = _prefetch_for_list(page_qs)
+    return list(page_qs.order_by(order))
 
-@router.get("/", response=RecipeListResponse)
-def list_recipes(request, filters: RecipeFilters = Query(...)):
+
+def _list_recipes(request, filters: RecipeFilters) -> RecipeListResponse:
     qs = Recipe.objects.all()
 
-    ranked_ids: list[int] | None = None
-    used_upstash = False
+    cursor: RecipeCursor | None = None
+    if filters.cursor:
+        try:
+            cursor = decode_cursor(filters.cursor)
+        except InvalidCursorError:
+            raise HttpError(400, "Netinkamas puslapiavimo cursor'is") from None
+
+    # Paieška turi savo rangą – `sort` taikomas tik sąrašui be paieškos.
+    score_sort = filters.sort if filters.sort != "newest" and not filters.search else None
+    if cursor is not None and not cursor.is_ranked and cursor.sort != score_sort:
+        raise HttpError(400, "Cursor'is neatitinka rikiavimo (sort)")
+
+    start = filters.offset
+    if cursor is not None and cursor.is_ranked:
+        start = cursor.position
+    keyset_cursor = (
+        cursor if cursor is not None and not cursor.is_ranked and not cursor.is_score else None
+    )
 
+    ranked_ids: list[int] | None = None
+    prefiltered = False
+    exhausted = True
     if filters.search:
-        if upstash_is_enabled() and filters.offset < 1000:
-            # Upstash Search API neturi offset, todėl puslapiuojame lokaliai.
-            # Kad neužsikrautume per daug, apsiribojame 1000 dokumentų.
-            ranked_ids = search_recipe_ids(filters.search, limit=1000)
-
-            # None reiškia: išjungta arba klaida -> darysim DB fallback.
-            if ranked_ids is not None:
-                used_upstash = True
-                qs = qs.filter(id__in=ranked_ids) if ranked_ids else qs.none()
-
-        if not used_upstash:
-            # Fallback (arba Upstash klaida / išjungtas): DB per icontains.
-            qs = qs.filter(
-                Q(title__icontains=filters.search)
-                | Q(description__icontains=filters.search)
-                | Q(description_html__icontains=filters.search)
-            )
-    if filters.tag:
-        qs = qs.filter(tags__slug=filters.tag)
-    if filters.category:
-        qs = qs.filter(categories__slug=filters.category)
-    if filters.cuisine:
-        qs = qs.filter(cuisines__slug=filters.cuisine)
-    if filters.meal_type:
-        qs = qs.filter(meal_types__slug=filters.meal_type)
-    if filters.difficulty:
-        qs = qs.filter(difficulty=filters.difficulty)
-
-    qs = _annotate_with_ratings(qs)
-    qs = qs.distinct()
-
-    total = qs.count()
-
-    if used_upstash:
-        page_ids = (ranked_ids or [])[
-            filters.offset: filters.offset + filters.limit]
-        if not page_ids:
-            recipes_batch = []
-        else:
-            order = Case(
-                *[When(id=rid, then=pos) for pos, rid in enumerate(page_ids)],
-                output_field=IntegerField(),
-            )
+        # Keyset cursor'is reiškia, kad ankstesnis puslapis atėjo iš DB kelio –
+        # tęsiame ten pat, kad rikiavimas nepasikeistų vidury sąrašo.
+        qs, ranked_ids, prefiltered, exhausted = _apply_search(
+            qs,
+            filters,
+            allow_backend=keyset_cursor is None,
+            min_results=start + filters.limit + 1,
+        )
+    used_backend = ranked_ids is not None
+    structured = has_structured_filters(filters) and not prefiltered
+
+    # Struktūrinius filtrus pirmiausia bandome išspręsti atmintyje (bitmap'ai);
+    # DB fallback – kai indeksas išjungtas ar paieška eina per icontains.
+    needs_index = structured if used_backend else not filters.search and score_sort is None
+    filter_index = get_filter_index() if needs_index else None
+    # PostgreSQL paieška rikiuoja pagal rangą – puslapiuojam pozicija, ne keyset.
+    db_ranked = bool(filters.search) and not used_backend and fulltext_is_enabled()
+    next_cursor: str | None = None
+
+    if filter_index is not None and not used_backend:
+        matches = filter_index.resolve(filters)
+        total = None if filters.count == "none" else len(matches)
+        page_ids = filter_index.page(
+            matches, limit=filters.limit + 1, offset=start, after=keyset_cursor
+        )
+        recipes_batch = _recipes_in_order(page_ids[: filters.limit])
+        if len(page_ids) > filters.limit and recipes_batch:
+            next_cursor = encode_keyset_cursor(recipes_batch[-1])
+    elif used_backend:
+        if structured and filter_index is not None:
+            matches = filter_index.resolve(filters)
+            ranked_ids = [rid for rid in ranked_ids if rid in matches]
+            structured = False
+        elif structured:
+            qs = apply_structured_filters(qs, filters)
+
+        def count_ranked() -> int:
+            if structured:
+                return qs.order_by().values("id").count()
+            # Backend'o ID sąrašas jau yra galutinis rezultatas – DB nereikia.
+            return len(ranked_ids)
+
+        # Kol backend'o sąrašas nepilnas (parsiųsta tik dalis chunk'ų), jo ilgis –
+        # tik apatinė riba: `total` nežinomas ir netalpinamas.
+        total = (
+            _list_total(qs, filters, kind="count-search", exact=count_ranked)
+            if exhausted
+            else None
+        )
 
-            page_qs = Recipe.objects.filter(id__in=page_ids)
-            if filters.tag:
-                page_qs = page_qs.filter(tags__slug=filters.tag)
-            if filters.category:
-                page_qs = page_qs.filter(categories__slug=filters.category)
-            if filters.cuisine:
-                page_qs = page_qs.filter(cuisines__slug=filters.cuisine)
-            if filters.meal_type:
-                page_qs = page_qs.filter(meal_types__slug=filters.meal_type)
-            if filters.difficulty:
-                page_qs = page_qs.filter(difficulty=filters.difficulty)
-
-            page_qs = _annotate_with_ratings(page_qs)
-            page_qs = _prefetch_for_list(page_qs)
-            page_qs = page_qs.order_by(order)
-
-            # Jei filtrai per M2M sukeltų duplikatus, dedupuojam Python'e pagal ID.
-            seen: set[int] = set()
-            recipes_batch = []
-            for recipe in page_qs:
-                if recipe.id in seen:
-                    continue
-                seen.add(recipe.id)
-                recipes_batch.append(recipe)
+        page_ids = ranked_ids[start: start + filters.limit]
+        if start + filters.limit < len(ranked_ids):
+            next_cursor = encode_ranked_cursor(start + filters.limit)
+        recipes_batch = _recipes_in_order(page_ids, filters if structured else None)
     else:
-        qs = qs.order_by("-published_at", "-updated_at", "-id")
+        qs = apply_structured_filters(qs, filters)
+        total = _list_total(
+            qs, filters, kind="count-db", exact=lambda: qs.order_by().values("id").count()
+        )
+        qs = _with_rating_stats(qs)
         qs = _prefetch_for_list(qs)
-        start = filters.offset
-        end = start + filters.limit
-        recipes_batch = list(qs[start:end])
+        if db_ranked:
+            qs = qs.order_by("-search_rank", *LIST_ORDERING)
+        elif score_sort is not None:
+            # Įvertis – iš `RecipePopularity` (perskaičiuoja `update_popularity`).
+            # Eilutę turi kiekvienas receptas, todėl INNER JOIN ir indekso tvarka.
+            qs = qs.filter(popularity__isnull=False)
+            qs = qs.annotate(sort_score=F(SCORE_FIELDS[score_sort]))
+            qs = qs.order_by(*score_ordering(score_sort))
+            if cursor is not None and cursor.is_score:
+                qs = qs.filter(score_keyset_filter(cursor))
+                start = 0
+        else:
+            qs = qs.order_by(*LIST_ORDERING)
+            if keyset_cursor is not None:
+                qs = qs.filter(keyset_filter(keyset_cursor))
+                start = 0
+        # Paimam vieną įrašą daugiau – taip žinome, ar yra kitas puslapis.
+        recipes_batch = list(qs[start: start + filters.limit + 1])
+        if len(recipes_batch) > filters.limit:
+            recipes_batch = recipes_batch[: filters.limit]
+            last = recipes_batch[-1]
+            if db_ranked:
+                next_cursor = encode_ranked_cursor(start + filters.limit)
+            elif score_sort is not None:
+                next_cursor = encode_score_cursor(score_sort, last.sort_score, last.id)
+            else:
+                next_cursor = encode_keyset_cursor(last)
 
     bookmarked_ids: set[int] = set()
     if request.user.is_authenticated and recipes_batch:
@@ -350,7 +562,37 @@ def list_recipes(request, filters: RecipeFilters = Query(...)):
         for recipe in recipes_batch
     ]
 
-    return RecipeListResponse(total=total, items=items)
+    return RecipeListResponse(total=total, items=items, next_cursor=next_cursor)
+
+
+@router.get("/", response=RecipeListResponse)
+def list_recipes(request, http_response: HttpResponse, filters: RecipeFilters = Query(...)):
+    # Versija iš talpyklos generacijų – 304 be jokio sąrašo skaičiavimo.
+    etag = make_etag("recipes", *list_etag_parts(request, filters))
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    http_response["ETag"] = etag
+
+    response = _list_recipes(request, filters)
+
+    # Tuščia pirmo puslapio paieška – greičiausiai rašybos klaida. Taisymas
+    # tik iš atmintyje laikomo žodyno, todėl kitų užklausų nelėtina.
+    if not filters.search or response.items or filters.cursor or filters.offset:
+        return response
+    corrected = suggest_correction(filters.search)
+    if corrected is None:
+        return response
+    if getattr(settings, "RECIPE_SEARCH_AUTOCORRECT", False):
+        corrected_response = _list_recipes(
+            request, filters.model_copy(update={"search": corrected})
+        )
+        if corrected_response.items:
+            corrected_response.did_you_mean = corrected
+            corrected_response.autocorrected = True
+            return corrected_response
+    response.did_you_mean = corrected
+    return response
 
 
 @router.get("/bookmarks", response=RecipeListResponse)
@@ -359,12 +601,11 @@ def list_bookmarks(request):
         raise HttpError(
             401, "Reikia prisijungti, kad matytumėte išsaugotus receptus")
 
-    qs = (
-        Recipe.objects.filter(bookmarks__user=request.user)
-        .order_by("-bookmarks__created_at")
-        .distinct()
+    # (user, recipe) unikalus, todėl JOIN per bookmarks dublikatų nesukuria.
+    qs = Recipe.objects.filter(bookmarks__user=request.user).order_by(
+        "-bookmarks__created_at"
     )
-    qs = _annotate_with_ratings(qs)
+    qs = _with_rating_stats(qs)
     qs = _prefetch_for_list(qs)
 
     recipes_batch = list(qs)
@@ -377,30 +618,216 @@ def list_bookmarks(request):
     return RecipeListResponse(total=len(items), items=items)
 
 
-@router.get("/{slug}", response=RecipeDetailSchema)
-def get_recipe_detail(request, slug: str):
+@router.get("/recommended", response=RecipeListResponse)
+def list_recommended(request, filters: RecommendedFilters = Query(...)):
+    if not request.user.is_authenticated:
+        raise HttpError(401, "Reikia prisijungti, kad matytumėte rekomendacijas")
+
+    # Kandidatai iš iš anksto paskaičiuotų kaimynų; DB – tik istorija ir kortelės.
+    page_ids = recommended_recipe_ids(request.user.id, limit=filters.limit)
+    recipes_batch = [
+        recipe for recipe in _recipes_in_order(page_ids) if recipe.published_at is not None
+    ]
+    items = [_serialize_recipe_summary(request, recipe, set()) for recipe in recipes_batch]
+    return RecipeListResponse(total=None, items=items)
+
+
+FACET_LOOKUPS = {
+    "tags": Tag,
+    "categories": RecipeCategory,
+    "cuisines": Cuisine,
+    "meal_types": MealType,
+}
+
+
+def _sorted_buckets(buckets) -> list[dict]:
+    return sorted(buckets, key=lambda item: (-item["count"], item["name"]))
+
+
+def _index_facets(index: RecipeFilterIndex, matches: BitMap) -> dict[str, list[dict]]:
+    """Kiekiai iš filtrų indekso bitmap'ų; DB – tik reikšmių pavadinimams."""
+
+    counts = index.facet_counts(matches)
+    facets: dict[str, list[dict]] = {}
+    for field, dimension in SLUG_FILTERS.items():
+        values = counts.get(field, {})
+        names = dict(
+            FACET_LOOKUPS[dimension]
+            .objects.filter(slug__in=list(values))
+            .values_list("slug", "name")
+        )
+        facets[dimension] = _sorted_buckets(
+            {"slug": slug, "name": names[slug], "count": count}
+            for slug, count in values.items()
+            if slug in names
+        )
+    labels = dict(Difficulty.choices)
+    facets["difficulties"] = _sorted_buckets(
+        {"slug": value, "name": labels.get(value, value), "count": count}
+        for value, count in counts.get("difficulty", {}).items()
+    )
+    return facets
+
+
+def _compute_facets(recipe_ids) -> dict[str, list[dict]]:
+    """Po vieną sugrupuotą užklausą kiekvienai dimensijai (kai indekso nėra)."""
+
+    facets: dict[str, list[dict]] = {}
+    for dimension, model in FACET_LOOKUPS.items():
+        rows = (
+            model.objects.filter(recipes__in=recipe_ids)
+            .annotate(count=Count("recipes"))
+            .order_by("-count", "name")
+            .values("slug", "name", "count")
+        )
+        facets[dimension] = list(rows)
+
+    labels = dict(Difficulty.choices)
+    difficulty_rows = (
+        Recipe.objects.filter(id__in=recipe_ids)
+        .order_by()
+        .values("difficulty")
+        .annotate(count=Count("id"))
+    )
+    facets["difficulties"] = _sorted_buckets(
+        {
+            "slug": row["difficulty"],
+            "name": labels.get(row["difficulty"], row["difficulty"]),
+            "count": row["count"],
+        }
+        for row in difficulty_rows
+    )
+    return facets
+
+
+@router.get("/suggest", response=SuggestResponse)
+def suggest(request, filters: SuggestFilters = Query(...)):
+    """Typeahead pasiūlymai iš atmintyje laikomo indekso (be DB užklausų)."""
+
+    index = get_suggest_index()
+    if index is None:
+        return SuggestResponse(items=[])
+    items = index.suggest(filters.q, limit=filters.limit, kinds=filters.kind)
+    return SuggestResponse(
+        items=[
+            SuggestItemSchema(kind=item.kind, id=item.id, label=item.label, slug=item.slug)
+            for item in items
+        ]
+    )
+
+
+def _pantry_allowed_ids(filters: PantryFilters) -> np.ndarray | None:
+    """Surikiuoti struktūrinius filtrus atitinkančių receptų ID (`None` – be filtrų)."""
+
+    if not has_structured_filters(filters):
+        return None
+    filter_index = get_filter_index()
+    if filter_index is not None:
+        return np.asarray(filter_index.resolve(filters).to_array(), dtype=np.int64)
+    ids = apply_structured_filters(Recipe.objects.order_by("id"), filters).values_list(
+        "id", flat=True
+    )
+    return np.fromiter(ids, dtype=np.int64)
+
+
+@router.get("/pantry", response=PantryResponse)
+def search_pantry(request, filters: PantryFilters = Query(...)):
+    """„Ką galiu pagaminti?“ – receptai pagal turimus ingredientus."""
+
+    index = get_pantry_index()
+    if index is None:
+        raise HttpError(503, "Paieška pagal ingredientus laikinai nepasiekiama")
+
+    slugs = set(filters.ingredient) | set(filters.exclude)
+    ingredient_ids = dict(Ingredient.objects.filter(slug__in=slugs).values_list("slug", "id"))
+    matches = index.search(
+        [ingredient_ids[slug] for slug in filters.ingredient if slug in ingredient_ids],
+        exclude_ids=[ingredient_ids[slug] for slug in filters.exclude if slug in ingredient_ids],
+        allowed=_pantry_allowed_ids(filters),
+        max_missing=filters.max_missing,
+        rank=filters.rank,
+    )
+
+    page = matches.page(filters.offset, filters.limit)
+    recipes_batch = _recipes_in_order([match.recipe_id for match in page])
+    bookmarked_ids: set[int] = set()
+    if request.user.is_authenticated and recipes_batch:
+        bookmarked_ids = set(
+            Bookmark.objects.filter(
+                user=request.user, recipe_id__in=[recipe.id for recipe in recipes_batch]
+            ).values_list("recipe_id", flat=True)
+        )
+    by_id = {match.recipe_id: match for match in page}
+    items = []
+    for recipe in recipes_batch:
+        match = by_id[recipe.id]
+        summary = _serialize_recipe_summary(request, recipe, bookmarked_ids)
+        items.append(
+            PantryRecipeSchema(
+                **summary.dict(),
+                matched=match.matched,
+                missing=match.missing,
+                coverage=round(match.coverage, 4),
+            )
+        )
+    return PantryResponse(total=len(matches), items=items)
+
+
+@router.get("/facets", response=RecipeFacetsResponse)
+def list_recipe_facets(request, filters: RecipeFilters = Query(...)):
+    """Filtrų reikšmių kiekiai (pvz., „Vegetariški (124)“) esamiems filtrams."""
+
+    qs = Recipe.objects.all()
+    ranked_ids: list[int] | None = None
+    prefiltered = False
+    truncated = False
+    if filters.search:
+        # Kiekiai skaičiuojami visai rezultatų aibei, ne tik pirmam chunk'ui –
+        # kitaip jie priklausytų nuo to, kurį puslapį kas nors atidarė pirmas.
+        limit = search_max_results()
+        qs, ranked_ids, prefiltered, _ = _apply_search(qs, filters, min_results=limit)
+        truncated = ranked_ids is not None and len(ranked_ids) >= limit
+
+    # DB paieškos (fallback) rezultato indeksas neišreiškia – tada GROUP BY.
+    filter_index = get_filter_index() if ranked_ids is not None or not filters.search else None
+    if filter_index is not None:
+        matches = filter_index.resolve(filters)
+        if ranked_ids is not None:
+            matches &= BitMap(ranked_ids)
+
+        def compute():
+            return _index_facets(filter_index, matches)
+
+    else:
+        if not prefiltered:
+            qs = apply_structured_filters(qs, filters)
+        recipe_ids = qs.order_by().values("id")
+
+        def compute():
+            return _compute_facets(recipe_ids)
+
+    kind = "facets-search" if ranked_ids is not None else "facets-db"
+    data = listing_cache.get_or_compute(kind, filters, compute)
+    return RecipeFacetsResponse(
+        truncated=truncated,
+        **{
+            dimension: [FacetBucketSchema(**bucket) for bucket in buckets]
+            for dimension, buckets in data.items()
+        },
+    )
+
+
+def _build_public_detail(request, slug: str) -> dict:
+    """Anoniminio žiūrovo detalė – be naudotojo laukų (žr. `recipes.detail_cache`)."""
+
     qs = Recipe.objects.filter(slug=slug)
-    qs = _annotate_with_ratings(qs)
+    qs = _with_rating_stats(qs)
     qs = _prefetch_for_detail(qs)
     recipe = get_object_or_404(qs)
 
-    user = request.user if request.user.is_authenticated else None
-    is_bookmarked = False
-    user_rating_value = None
-    if user:
-        is_bookmarked = Bookmark.objects.filter(
-            user=user, recipe=recipe).exists()
-        user_rating = Rating.objects.filter(user=user, recipe=recipe).first()
-        if user_rating:
-            user_rating_value = user_rating.value
-
-    summary = _serialize_recipe_summary(
-        request, recipe, {recipe.id} if is_bookmarked else set())
-    summary_data = summary.dict()
-    summary_data["is_bookmarked"] = is_bookmarked
-
+    summary = _serialize_recipe_summary(request, recipe, set())
     return RecipeDetailSchema(
-        **summary_data,
+        **summary.dict(),
         description=recipe.description or None,
         description_html=recipe.description_html or None,
         video_url=recipe.video_url or None,
@@ -412,8 +839,151 @@ def get_recipe_detail(request, slug: str):
                          for method in recipe.cooking_methods.all()],
         ingredients=_serialize_ingredients(recipe),
         steps=_serialize_steps(request, recipe),
-        comments=_serialize_comments(recipe.comments.all(), user),
-        user_rating=user_rating_value,
+        comments=_serialize_comments(recipe.comments.all(), None),
+        user_rating=None,
+        rating_distribution=_serialize_rating_distribution(recipe),
+    ).dict()
+
+
+def _viewer_state(recipe_id: int, user) -> dict:
+    """Naudotojo laukai detalei (dvi mažos užklausos); įeina ir į ETag'ą."""
+
+    viewer = (
+        Recipe.objects.filter(id=recipe_id)
+        .annotate(
+            viewer_bookmarked=Exists(Bookmark.objects.filter(user=user, recipe_id=recipe_id)),
+            viewer_rating=Subquery(
+                Rating.objects.filter(user=user, recipe_id=recipe_id).values("value")[:1]
+            ),
+        )
+        .values("viewer_bookmarked", "viewer_rating")
+        .first()
+    ) or {"viewer_bookmarked": False, "viewer_rating": None}
+    pending = Comment.objects.filter(
+        recipe_id=recipe_id, user=user, is_approved=False
+    ).select_related("user")
+    return {
+        "is_bookmarked": viewer["viewer_bookmarked"],
+        "user_rating": viewer["viewer_rating"],
+        "own_comments": [_serialize_comment(comment).dict() for comment in pending],
+    }
+
+
+def _apply_viewer_overlay(payload: dict, state: dict) -> dict:
+    payload = dict(payload)
+    payload["is_bookmarked"] = state["is_bookmarked"]
+    payload["user_rating"] = state["user_rating"]
+    if state["own_comments"]:
+        payload["comments"] = sorted(
+            [*payload["comments"], *state["own_comments"]],
+            key=lambda comment: comment["created_at"],
+            reverse=True,
+        )
+    return payload
+
+
+@router.get("/images/{kind}/{object_id}/{version}/{width}/{quality}/{fmt}", include_in_schema=False)
+def image_origin(
+    request,
+    kind: str,
+    object_id: int,
+    version: str,
+    width: int,
+    quality: int,
+    fmt: str,
+    s: str = "",
+):
+    # Pasirašytas origin (`recipes.image_origin`); atsakymas nekintamas – CDN'ui.
+    if not image_origin_service.is_enabled() or not image_origin_service.is_allowed(
+        width, quality, fmt
+    ):
+        raise HttpError(404, "Toks paveikslėlio variantas neleidžiamas")
+    if not image_origin_service.verify(s, kind, object_id, version, width, quality, fmt):
+        raise HttpError(403, "Neteisingas paveikslėlio parašas")
+    try:
+        data = image_origin_service.get_variant(kind, object_id, version, width, quality, fmt)
+    except image_origin_service.OriginBusyError:
+        response = HttpResponse("Paveikslėlis ruošiamas, bandykite vėliau", status=503)
+        response["Retry-After"] = "2"
+        response["Cache-Control"] = "no-store"
+        return response
+    if data is None:
+        raise HttpError(404, "Paveikslėlis nerastas")
+    response = HttpResponse(data, content_type=image_origin_service.ORIGIN_FORMATS[fmt][1])
+    response["Cache-Control"] = image_origin_service.CACHE_CONTROL
+    return response
+
+
+@router.get("/{slug}", response=RecipeDetailSchema)
+def get_recipe_detail(request, http_response: HttpResponse, slug: str):
+    # Anoniminė detalė talpinama (`recipes.detail_cache`); karštam receptui
+    # sunkių užklausų nėra, naudotojo laukai uždedami atskirai.
+    base_url = request.build_absolute_uri("/")
+    cached = detail_cache.get_cached_detail(slug, base_url)
+    if cached is None:
+        recipe_id = get_object_or_404(Recipe.objects.only("id"), slug=slug).id
+        version = detail_cache.detail_version(recipe_id)
+        payload = None
+    else:
+        recipe_id, version, payload = cached
+    # Tik proceso atmintyje – DB įrašoma periodiškai (`recipes.view_counter`).
+    record_view(recipe_id)
+
+    state = _viewer_state(recipe_id, request.user) if request.user.is_authenticated else None
+    etag = make_etag("recipe", base_url, slug, version, state)
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    http_response["ETag"] = etag
+
+    if payload is None:
+        payload = _build_public_detail(request, slug)
+        detail_cache.store_detail(slug, base_url, recipe_id, version, payload)
+    if state is not None:
+        payload = _apply_viewer_overlay(payload, state)
+    return payload
+
+
+@router.get("/{slug}/related", response=RelatedRecipesResponse)
+def list_related_recipes(request, slug: str, filters: RelatedFilters = Query(...)):
+    recipe = get_object_or_404(Recipe.objects.only("id"), slug=slug)
+
+    recipes_batch = _recipes_in_order(related_recipe_ids(recipe.id, limit=filters.limit))
+    bookmarked_ids: set[int] = set()
+    if request.user.is_authenticated and recipes_batch:
+        bookmarked_ids = set(
+            Bookmark.objects.filter(
+                user=request.user, recipe_id__in=[recipe.id for recipe in recipes_batch]
+            ).values_list("recipe_id", flat=True)
+        )
+    return RelatedRecipesResponse(
+        items=[
+            _serialize_recipe_summary(request, recipe, bookmarked_ids)
+            for recipe in recipes_batch
+        ]
+    )
+
+
+@router.get("/{slug}/views", response=RecipeViewStatsResponse)
+def get_recipe_views(request, slug: str, filters: RecipeViewStatsFilters = Query(...)):
+    recipe = get_object_or_404(Recipe.objects.only("id"), slug=slug)
+    since = timezone.localdate() - timedelta(days=filters.days - 1)
+    rows = list(
+        RecipeViewDaily.objects.filter(recipe=recipe, day__gte=since)
+        .order_by("day")
+        .values_list("day", "views")
+    )
+    # Dar neįrašytos šio proceso peržiūros priskiriamos šiandienai.
+    pending = pending_views(recipe.id)
+    if pending:
+        today = timezone.localdate()
+        if rows and rows[-1][0] == today:
+            rows[-1] = (today, rows[-1][1] + pending)
+        else:
+            rows.append((today, pending))
+    return RecipeViewStatsResponse(
+        total=sum(views for _, views in rows),
+        days=[RecipeViewDaySchema(day=day, views=views) for day, views in rows],
     )
 
 
@@ -457,9 +1027,5 @@ def upsert_rating(request, recipe_id: int, payload: RatingCreateSchema):
         raise HttpError(401, "Reikia prisijungti, kad vertintumėte receptą")
 
     recipe = get_object_or_404(Recipe, pk=recipe_id)
-    rating, _ = Rating.objects.update_or_create(
-        user=request.user,
-        recipe=recipe,
-        defaults={"value": payload.value},
-    )
-    return RatingSchema(value=rating.value)
+    value = set_user_rating(user=request.user, recipe_id=recipe.id, value=payload.value)
+    return RatingSchema(value=value)
@@ -0,0 +1,583 @@
+"""Įterptinis BM25 paieškos variklis – be tinklo kvietimų.
+
+Principai:
+- Dokumentai – tie patys `build_recipe_document` laukai kaip Upstash; tekstas
+  lankstomas `recipes.text.fold_terms`, todėl diakritikai nesvarbūs.
+  Pavadinimas ir tag'ai / ingredientai sveria daugiau nei aprašymas.
+- Indeksas – vienas segmento failas (surikiuotas terminų žodynas, posting'ai,
+  dokumentų masyvai), kurį kiekvienas worker'is `mmap`'ina: skaitymui failo
+  nereikia užsikrauti į atmintį, o OS puslapių talpykla dalijama tarp procesų.
+- Pakeitimai rašomi į žurnalą (JSON eilutės) šalia segmento; skaitytojai
+  prieš kiekvieną paiešką perskaito tik naujas žurnalo eilutes. Kai žurnalas
+  išauga (`RECIPE_SEARCH_BM25_JOURNAL_MAX_BYTES`), segmentas ir žurnalas
+  sulyginami į naują segmentą (compaction).
+- Rašymas (žurnalas, compaction, pilnas perstatymas) vyksta su failo užraktu;
+  naujas segmentas įrašomas į laikiną failą ir pakeičiamas `os.replace`.
+- Struktūriniai filtrai taikomi per `recipes.filter_index` bitmap'us.
+- Pilnas perstatymas – `python manage.py reindex_search`.
+"""
+
+from __future__ import annotations
+
+import bisect
+import fcntl
+import heapq
+import json
+import logging
+import math
+import mmap
+import os
+import sys
+import threading
+from array import array
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+from django.conf import settings
+
+from .filter_index import get_filter_index
+from .filtering import FILTER_FIELDS, filter_clauses
+from .text import fold_terms
+from .upstash_search import build_recipe_document, published_recipe_queryset
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"RBM25SG1"
+SEGMENT_NAME = "segment.bin"
+LOCK_NAME = "write.lock"
+
+# Dokumento laukų svoriai (kiek kartų skaičiuojamas kiekvienas termino
+# pasikartojimas). Filtrų `*_slugs` laukai į tekstą neįeina.
+FIELD_WEIGHTS = {
+    "title": 3,
+    "tags": 2,
+    "categories": 2,
+    "cuisines": 2,
+    "ingredients": 2,
+    "description": 1,
+}
+
+K1 = 1.2
+B = 0.75
+# Paskutinis užklausos žodis gali būti nebaigtas – išplečiam į tiek terminų.
+MAX_PREFIX_EXPANSIONS = 20
+
+SECTIONS = (
+    ("doc_ids", "q"),
+    ("doc_lens", "I"),
+    ("term_offsets", "I"),
+    ("term_blob", "B"),
+    ("posting_offsets", "I"),
+    ("posting_docs", "I"),
+    ("posting_tfs", "I"),
+)
+
+
+def document_terms(document: dict[str, Any]) -> dict[str, int]:
+    """Svertiniai terminų dažniai iš `build_recipe_document` rezultato."""
+
+    content = document["content"]
+    fields = dict(content)
+    # Aprašymo tekstas ir jo HTML versija dažniausiai sutampa – imam vieną.
+    fields["description"] = content.get("description") or content.get("description_html", "")
+
+    frequencies: dict[str, int] = {}
+    for field, weight in FIELD_WEIGHTS.items():
+        for term in fold_terms(fields.get(field)):
+            frequencies[term] = frequencies.get(term, 0) + weight
+    return frequencies
+
+
+# -- segmento failas -----------------------------------------------------------
+
+
+def _align(handle, boundary: int = 8) -> None:
+    padding = -handle.tell() % boundary
+    if padding:
+        handle.write(b"\0" * padding)
+
+
+def write_segment(
+    path: Path, docs: dict[int, tuple[int, dict[str, int]]], *, journal_id: int
+) -> None:
+    """Įrašo segmentą iš `{recipe_id: (ilgis, {terminas: tf})}` (atomiškai)."""
+
+    doc_ids = array("q", sorted(docs))
+    doc_index = {recipe_id: position for position, recipe_id in enumerate(doc_ids)}
+    doc_lens = array("I", (docs[recipe_id][0] for recipe_id in doc_ids))
+
+    postings: dict[str, list[tuple[int, int]]] = {}
+    for recipe_id in doc_ids:
+        for term, tf in docs[recipe_id][1].items():
+            postings.setdefault(term, []).append((doc_index[recipe_id], tf))
+
+    terms = sorted(postings)
+    term_offsets = array("I", [0])
+    blob = bytearray()
+    posting_offsets = array("I", [0])
+    posting_docs = array("I")
+    posting_tfs = array("I")
+    for term in terms:
+        blob += term.encode()
+        term_offsets.append(len(blob))
+        for position, tf in postings[term]:
+            posting_docs.append(position)
+            posting_tfs.append(tf)
+        posting_offsets.append(len(posting_docs))
+
+    arrays = {
+        "doc_ids": doc_ids,
+        "doc_lens": doc_lens,
+        "term_offsets": term_offsets,
+        "term_blob": array("B", blob),
+        "posting_offsets": posting_offsets,
+        "posting_docs": posting_docs,
+        "posting_tfs": posting_tfs,
+    }
+    header = {
+        "byteorder": sys.byteorder,
+        "journal": journal_id,
+        "docs": len(doc_ids),
+        "terms": len(terms),
+        "total_len": sum(doc_lens),
+        "sections": {},
+    }
+    # Sekcijų poslinkiai priklauso nuo antraštės ilgio, todėl antraštė
+    # rezervuojama fiksuoto dydžio bloku.
+    header_size = 4096
+    offset = len(MAGIC) + 4 + header_size
+    for name, _ in SECTIONS:
+        offset += -offset % 8
+        size = len(arrays[name]) * arrays[name].itemsize
+        header["sections"][name] = [offset, size]
+        offset += size
+    header_bytes = json.dumps(header).encode()
+    if len(header_bytes) > header_size:  # pragma: no cover - fiksuotas sekcijų sąrašas
+        raise ValueError("BM25 segmento antraštė per didelė")
+
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "wb") as handle:
+        handle.write(MAGIC)
+        handle.write(len(header_bytes).to_bytes(4, "little"))
+        handle.write(header_bytes.ljust(header_size, b"\0"))
+        for name, _ in SECTIONS:
+            _align(handle)
+            arrays[name].tofile(handle)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(tmp_path, path)
+
+
+class Segment:
+    """`mmap`'intas segmentas – tik skaitymui."""
+
+    def __init__(self, path: Path) -> None:
+        self._file = open(path, "rb")
+        stat = os.fstat(self._file.fileno())
+        self.identity = (stat.st_ino, stat.st_mtime_ns)
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[: len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError("Netinkamas BM25 segmento failas")
+        header_len = int.from_bytes(self._mmap[len(MAGIC): len(MAGIC) + 4], "little")
+        start = len(MAGIC) + 4
+        header = json.loads(bytes(self._mmap[start: start + header_len]))
+        if header["byteorder"] != sys.byteorder:
+            self.close()
+            raise ValueError("BM25 segmentas įrašytas kitos architektūros mašinoje")
+
+        self.journal_id: int = header["journal"]
+        self.doc_count: int = header["docs"]
+        self.term_count: int = header["terms"]
+        self.total_len: int = header["total_len"]
+        view = memoryview(self._mmap)
+        self._views = [view]
+        for name, typecode in SECTIONS:
+            offset, size = header["sections"][name]
+            section = view[offset: offset + size].cast(typecode)
+            self._views.append(section)
+            setattr(self, name, section)
+
+    def close(self) -> None:
+        # Pirma sekcijos, paskui bendras vaizdas – kitaip `mmap` neužsidarys.
+        for section in reversed(getattr(self, "_views", [])):
+            section.release()
+        self._views = []
+        self._mmap.close()
+        self._file.close()
+
+    def term_at(self, position: int) -> str:
+        start, end = self.term_offsets[position], self.term_offsets[position + 1]
+        return bytes(self.term_blob[start:end]).decode()
+
+    def find_term(self, term: str) -> int:
+        """Pirmoji pozicija, kur terminas >= `term` (dvejetainė paieška)."""
+
+        low, high = 0, self.term_count
+        while low < high:
+            middle = (low + high) // 2
+            if self.term_at(middle) < term:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def lookup(self, term: str) -> int | None:
+        position = self.find_term(term)
+        if position < self.term_count and self.term_at(position) == term:
+            return position
+        return None
+
+    def prefix_terms(self, prefix: str, limit: int) -> list[str]:
+        position = self.find_term(prefix)
+        found: list[str] = []
+        while position < self.term_count and len(found) < limit:
+            term = self.term_at(position)
+            if not term.startswith(prefix):
+                break
+            found.append(term)
+            position += 1
+        return found
+
+    def postings(self, position: int) -> Iterator[tuple[int, int]]:
+        """(recipe_id, tf) poros terminui."""
+
+        start, end = self.posting_offsets[position], self.posting_offsets[position + 1]
+        docs, tfs, doc_ids = self.posting_docs, self.posting_tfs, self.doc_ids
+        for index in range(start, end):
+            yield doc_ids[docs[index]], tfs[index]
+
+    def document_frequency(self, position: int) -> int:
+        return self.posting_offsets[position + 1] - self.posting_offsets[position]
+
+    def documents(self) -> dict[int, tuple[int, dict[str, int]]]:
+        """Visas segmentas kaip `{recipe_id: (ilgis, {terminas: tf})}` (compaction'ui)."""
+
+        docs = {recipe_id: (self.doc_lens[i], {}) for i, recipe_id in enumerate(self.doc_ids)}
+        for position in range(self.term_count):
+            term = self.term_at(position)
+            for recipe_id, tf in self.postings(position):
+                docs[recipe_id][1][term] = tf
+        return docs
+
+    def length_of(self, recipe_id: int) -> int | None:
+        position = bisect.bisect_left(self.doc_ids, recipe_id)
+        if position < self.doc_count and self.doc_ids[position] == recipe_id:
+            return self.doc_lens[position]
+        return None
+
+
+# -- indeksas: segmentas + žurnalas ------------------------------------------------
+
+
+class BM25Index:
+    """Vieno proceso skaitytuvas ir rašytojas vienam indekso katalogui."""
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = Path(directory)
+        self._lock = threading.RLock()
+        self._segment: Segment | None = None
+        self._journal_offset = 0
+        # Žurnale paminėti receptai: segmento įrašai jiems nebegalioja.
+        self._touched: set[int] = set()
+        self._overlay: dict[int, tuple[int, dict[str, int]]] = {}
+        self._overlay_postings: dict[str, dict[int, int]] = {}
+        self._overlay_len = 0
+        self._removed_docs = 0
+        self._removed_len = 0
+
+    # -- failai --
+
+    @property
+    def segment_path(self) -> Path:
+        return self.directory / SEGMENT_NAME
+
+    def journal_path(self, journal_id: int) -> Path:
+        return self.directory / f"journal-{journal_id}.jsonl"
+
+    @contextmanager
+    def _write_lock(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / LOCK_NAME, "a") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _current_journal_id(self) -> int | None:
+        try:
+            segment = Segment(self.segment_path)
+        except FileNotFoundError:
+            return None
+        try:
+            return segment.journal_id
+        finally:
+            segment.close()
+
+    # -- skaitymas --
+
+    def _reset_overlay(self) -> None:
+        self._journal_offset = 0
+        self._touched = set()
+        self._overlay = {}
+        self._overlay_postings = {}
+        self._overlay_len = 0
+        self._removed_docs = 0
+        self._removed_len = 0
+
+    def _apply_entry(self, entry: dict[str, Any]) -> None:
+        recipe_id = int(entry["id"])
+        previous = self._overlay.pop(recipe_id, None)
+        if previous is not None:
+            self._overlay_len -= previous[0]
+            for term in previous[1]:
+                postings = self._overlay_postings.get(term)
+                if postings is not None:
+                    postings.pop(recipe_id, None)
+                    if not postings:
+                        del self._overlay_postings[term]
+        elif recipe_id not in self._touched:
+            length = self._segment.length_of(recipe_id)
+            if length is not None:
+                self._removed_docs += 1
+                self._removed_len += length
+        self._touched.add(recipe_id)
+
+        if entry["op"] == "put":
+            terms = entry["tf"]
+            self._overlay[recipe_id] = (int(entry["len"]), terms)
+            self._overlay_len += int(entry["len"])
+            for term, tf in terms.items():
+                self._overlay_postings.setdefault(term, {})[recipe_id] = tf
+
+    def refresh(self) -> bool:
+        """Atnaujina būseną iš disko; grąžina `False`, jei segmento dar nėra."""
+
+        with self._lock:
+            try:
+                stat = os.stat(self.segment_path)
+            except FileNotFoundError:
+                return False
+            if self._segment is None or self._segment.identity != (stat.st_ino, stat.st_mtime_ns):
+                if self._segment is not None:
+                    self._segment.close()
+                self._segment = Segment(self.segment_path)
+                self._reset_overlay()
+
+            journal = self.journal_path(self._segment.journal_id)
+            try:
+                size = os.path.getsize(journal)
+            except FileNotFoundError:
+                return True
+            if size <= self._journal_offset:
+                return True
+            with open(journal, "rb") as handle:
+                handle.seek(self._journal_offset)
+                data = handle.read(size - self._journal_offset)
+            # Paskutinė eilutė gali būti dar nebaigta rašyti.
+            complete = data[: data.rfind(b"\n") + 1]
+            for line in complete.splitlines():
+                if line.strip():
+                    self._apply_entry(json.loads(line))
+            self._journal_offset += len(complete)
+            return True
+
+    def _stats(self) -> tuple[int, float]:
+        # Segmento dokumentai, pakeisti ar ištrinti žurnale, neskaičiuojami.
+        doc_count = self._segment.doc_count - self._removed_docs + len(self._overlay)
+        total_len = self._segment.total_len - self._removed_len + self._overlay_len
+        return doc_count, (total_len / doc_count) if doc_count else 0.0
+
+    def search(self, query: str, *, limit: int, allowed: Any = None) -> list[int] | None:
+        """Top `limit` receptų ID pagal BM25; `allowed` – leidžiamų ID aibė."""
+
+        if not self.refresh():
+            return None
+        terms = list(dict.fromkeys(fold_terms(query)))
+        if not terms:
+            return []
+
+        with self._lock:
+            segment = self._segment
+            doc_count, avgdl = self._stats()
+            if not doc_count:
+                return []
+
+            # Paskutinis žodis gali būti nebaigtas („saltibar“) – jei tikslaus
+            # termino nėra, išplečiam prefiksu.
+            last = terms[-1]
+            if segment.lookup(last) is None and last not in self._overlay_postings:
+                expansions = segment.prefix_terms(last, MAX_PREFIX_EXPANSIONS)
+                expansions += [
+                    term for term in self._overlay_postings if term.startswith(last)
+                ][:MAX_PREFIX_EXPANSIONS]
+                terms = terms[:-1] + sorted(set(expansions))
+
+            scores: dict[int, float] = {}
+
+            def add(recipe_id: int, idf: float, tf: int, length: int) -> None:
+                norm = K1 * (1 - B + B * length / avgdl)
+                score = idf * tf * (K1 + 1) / (tf + norm)
+                scores[recipe_id] = scores.get(recipe_id, 0.0) + score
+
+            for term in terms:
+                position = segment.lookup(term)
+                overlay = self._overlay_postings.get(term, {})
+                df = len(overlay)
+                if position is not None:
+                    df += segment.document_frequency(position)
+                if not df:
+                    continue
+                idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+
+                if position is not None:
+                    start = segment.posting_offsets[position]
+                    end = segment.posting_offsets[position + 1]
+                    for index in range(start, end):
+                        doc = segment.posting_docs[index]
+                        recipe_id = segment.doc_ids[doc]
+                        if recipe_id in self._touched:
+                            continue
+                        if allowed is not None and recipe_id not in allowed:
+                            continue
+                        add(recipe_id, idf, segment.posting_tfs[index], segment.doc_lens[doc])
+                for recipe_id, tf in overlay.items():
+                    if allowed is not None and recipe_id not in allowed:
+                        continue
+                    add(recipe_id, idf, tf, self._overlay[recipe_id][0])
+
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [recipe_id for recipe_id, _ in best]
+
+    # -- rašymas --
+
+    def append(self, entries: Iterable[dict[str, Any]]) -> bool:
+        """Prideda įrašus į žurnalą; grąžina `False`, jei segmento dar nėra."""
+
+        lines = b"".join(json.dumps(entry).encode() + b"\n" for entry in entries)
+        if not lines:
+            return True
+        with self._write_lock():
+            journal_id = self._current_journal_id()
+            if journal_id is None:
+                return False
+            with open(self.journal_path(journal_id), "ab") as handle:
+                handle.write(lines)
+            needs_compaction = os.path.getsize(self.journal_path(journal_id)) > _journal_max_bytes()
+            if needs_compaction:
+                self._compact_locked(journal_id)
+        return True
+
+    def _compact_locked(self, journal_id: int) -> None:
+        self.refresh()
+        with self._lock:
+            docs = self._segment.documents()
+            for recipe_id in self._touched:
+                docs.pop(recipe_id, None)
+            docs.update(self._overlay)
+        write_segment(self.segment_path, docs, journal_id=journal_id + 1)
+        self.journal_path(journal_id).unlink(missing_ok=True)
+        logger.info("BM25: segmentas sulygintas (%s dokumentų)", len(docs))
+
+    def compact(self) -> None:
+        with self._write_lock():
+            journal_id = self._current_journal_id()
+            if journal_id is not None:
+                self._compact_locked(journal_id)
+
+    def rebuild(self, docs: dict[int, tuple[int, dict[str, int]]]) -> None:
+        with self._write_lock():
+            previous = self._current_journal_id()
+            journal_id = (previous or 0) + 1
+            write_segment(self.segment_path, docs, journal_id=journal_id)
+            if previous is not None:
+                self.journal_path(previous).unlink(missing_ok=True)
+
+
+def _journal_max_bytes() -> int:
+    return getattr(settings, "RECIPE_SEARCH_BM25_JOURNAL_MAX_BYTES", 8 * 1024 * 1024)
+
+
+def _index_directory() -> Path:
+    return Path(getattr(settings, "RECIPE_SEARCH_BM25_PATH", settings.BASE_DIR / "var" / "search"))
+
+
+def _entry_for(recipe) -> dict[str, Any]:
+    terms = document_terms(build_recipe_document(recipe))
+    return {"op": "put", "id": recipe.id, "len": sum(terms.values()), "tf": terms}
+
+
+class BM25SearchBackend:
+    """`recipes.search_backend.SearchBackend` įgyvendinimas ant `BM25Index`."""
+
+    def __init__(self) -> None:
+        self.index = BM25Index(_index_directory())
+        self._warned_missing = False
+
+    def is_enabled(self) -> bool:
+        return True
+
+    def _entries(self, recipe_ids: Iterable[int]) -> list[dict[str, Any]]:
+        recipe_ids = set(recipe_ids)
+        entries = [
+            _entry_for(recipe)
+            for recipe in published_recipe_queryset().filter(id__in=recipe_ids)
+        ]
+        found = {entry["id"] for entry in entries}
+        entries += [{"op": "del", "id": recipe_id} for recipe_id in sorted(recipe_ids - found)]
+        return entries
+
+    def index_recipe(self, recipe_id: int) -> None:
+        try:
+            if not self.index.append(self._entries([recipe_id])) and not self._warned_missing:
+                self._warned_missing = True
+                logger.warning("BM25: indekso dar nėra – paleiskite `reindex_search`")
+        except Exception:
+            logger.exception("BM25: nepavyko indeksuoti recepto (recipe_id=%s)", recipe_id)
+
+    def delete_recipe(self, recipe_id: int) -> None:
+        try:
+            self.index.append([{"op": "del", "id": recipe_id}])
+        except Exception:
+            logger.exception("BM25: nepavyko pašalinti recepto (recipe_id=%s)", recipe_id)
+
+    def bulk_index(self, recipe_ids: Iterable[int] | None = None) -> int:
+        if recipe_ids is not None:
+            entries = self._entries(recipe_ids)
+            if self.index.append(entries):
+                return sum(1 for entry in entries if entry["op"] == "put")
+
+        docs: dict[int, tuple[int, dict[str, int]]] = {}
+        for recipe in published_recipe_queryset().order_by("id").iterator(chunk_size=500):
+            entry = _entry_for(recipe)
+            docs[recipe.id] = (entry["len"], entry["tf"])
+        self.index.rebuild(docs)
+        return len(docs)
+
+    def filter_key(self, filters: Any) -> str:
+        clauses = filter_clauses(filters) if filters is not None else {}
+        if not clauses or get_filter_index() is None:
+            return ""
+        return json.dumps(
+            {
+                field: [[list(c.values), c.negated] for c in clauses[field]]
+                for field in FILTER_FIELDS
+                if field in clauses
+            },
+            sort_keys=True,
+        )
+
+    def search(self, query: str, *, limit: int, filters: Any = None) -> list[int] | None:
+        allowed = None
+        if filters is not None and self.filter_key(filters):
+            filter_index = get_filter_index()
+            if filter_index is not None:
+                allowed = filter_index.resolve(filters)
+        try:
+            return self.index.search(query, limit=limit, allowed=allowed)
+        except Exception:
+            logger.exception("BM25: nepavyko atlikti paieškos")
+            return None
@@ -0,0 +1,110 @@
+"""Viešos (anoniminės) recepto detalės talpykla.
+
+Principai:
+- Anoniminis `RecipeDetailSchema` atsakymas talpinamas pagal slug'ą ir
+  absoliučių URL bazę (paveikslėlių nuorodos priklauso nuo host'o) kartu su
+  recepto ID ir versija, kuria buvo sudarytas.
+- Recepto versija didinama po commit'o, kai keičiasi receptas, jo M2M ryšiai,
+  ingredientai, žingsniai, komentarai ar įvertinimų suvestinė
+  (`recipes.signals`, `recipes.ratings`, admin veiksmai). Bendra generacija
+  didinama, kai keičiasi žodynai (tag'ai, ingredientai, vienetai ir pan.).
+- Senų įrašų trinti nereikia: versija nesutampa – įrašas tiesiog perstatomas,
+  nenaudojami išnyksta pagal TTL.
+- Versija nuskaitoma prieš sunkias DB užklausas, todėl pakeitimas sudarymo
+  metu palieka įrašą su sena versija ir kitas kreipinys jį perstato.
+- Naudotojo laukai (`is_bookmarked`, `user_rating`, savi nepatvirtinti
+  komentarai) talpykloje nelaikomi – uždedami iš atskiros mažos užklausos.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import time
+from collections.abc import Iterable
+from typing import Any
+
+from django.conf import settings
+from django.core.cache import cache
+
+GENERATION_KEY = "recipes:detail:generation"
+
+
+def _timeout() -> int:
+    return getattr(settings, "RECIPE_DETAIL_CACHE_TIMEOUT", 600)
+
+
+def is_enabled() -> bool:
+    return _timeout() > 0
+
+
+def _initial_version() -> int:
+    # Kaip `listing_cache`: išmesta versija neturi sutapti su senais įrašais.
+    return int(time.time() * 1000)
+
+
+def _version_key(recipe_id: int) -> str:
+    return f"recipes:detail:{recipe_id}:version"
+
+
+def _entry_key(slug: str, base_url: str) -> str:
+    digest = hashlib.sha1(f"{base_url}|{slug}".encode()).hexdigest()
+    return f"recipes:detail:entry:{digest}"
+
+
+def _get_or_init(key: str, value: Any) -> Any:
+    if value is None:
+        cache.add(key, _initial_version(), timeout=None)
+        value = cache.get(key, _initial_version())
+    return value
+
+
+def detail_version(recipe_id: int) -> tuple[int, int]:
+    """(bendra generacija, recepto versija) – nuskaityti prieš sudarant detalę."""
+
+    key = _version_key(recipe_id)
+    values = cache.get_many([GENERATION_KEY, key])
+    return (
+        int(_get_or_init(GENERATION_KEY, values.get(GENERATION_KEY))),
+        int(_get_or_init(key, values.get(key))),
+    )
+
+
+def get_cached_detail(slug: str, base_url: str) -> tuple[int, tuple[int, int], dict] | None:
+    """(recipe_id, versija, anoniminė detalė) arba `None`, jei įrašo nėra ar jis pasenęs."""
+
+    if not is_enabled():
+        return None
+    entry_key = _entry_key(slug, base_url)
+    values = cache.get_many([entry_key, GENERATION_KEY])
+    entry = values.get(entry_key)
+    if entry is None:
+        return None
+    version_key = _version_key(entry["recipe_id"])
+    current = (values.get(GENERATION_KEY), cache.get(version_key))
+    if tuple(entry["version"]) != current:
+        return None
+    return entry["recipe_id"], current, entry["payload"]
+
+
+def store_detail(
+    slug: str, base_url: str, recipe_id: int, version: tuple[int, int], payload: dict
+) -> None:
+    if not is_enabled():
+        return
+    cache.set(
+        _entry_key(slug, base_url),
+        {"recipe_id": recipe_id, "version": version, "payload": payload},
+        timeout=_timeout(),
+    )
+
+
+def bump_detail_versions(recipe_ids: Iterable[int] | None) -> None:
+    """Pasendina receptų detales; `None` – visas (pvz., pervadintas tag'as)."""
+
+    keys = [GENERATION_KEY] if recipe_ids is None else [_version_key(i) for i in set(recipe_ids)]
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Rakto nėra – ir talpinamų įrašų su juo nėra; sukurs `detail_version`.
+            pass
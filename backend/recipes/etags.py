@@ -0,0 +1,48 @@
+"""Receptų endpoint'ų ETag'ų versijų šaltiniai.
+
+Principai:
+- Sąrašas: sąrašo generacija (receptai, jų ryšiai, žodynai) + kortelių
+  generacija (`SUMMARY_CHANNEL` – įvertinimai ir populiarumo įverčiai,
+  kurie sąrašo aibės nekeičia) + paieškos atveju pasiūlymų / rašybos
+  generacija. Visos – talpyklos raktai, jokių DB užklausų.
+- Detalė: `recipes.detail_cache` versija (recepto ir žodynų).
+- Prisijungusio naudotojo atsakymuose yra jo žymės / įvertinimai, todėl
+  ETag'e – ir naudotojo būsena (viena maža užklausa).
+- Kaip ir `listing_cache`, keliems procesams reikia bendros talpyklos.
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+from django.db.models import Count, Max
+
+from . import listing_cache
+from .models import Bookmark
+from .suggest import SUGGEST_CHANNEL
+
+SUMMARY_CHANNEL = "summary"
+
+
+def bump_summary_generation() -> None:
+    listing_cache.bump_listing_generation((), channel=SUMMARY_CHANNEL)
+
+
+def _bookmarks_fingerprint(user) -> tuple[Any, int]:
+    stats = Bookmark.objects.filter(user=user).aggregate(
+        latest=Max("created_at"), total=Count("id")
+    )
+    return stats["latest"], stats["total"]
+
+
+def list_etag_parts(request, filters: Any) -> tuple:
+    parts: list[Any] = [
+        request.build_absolute_uri(),
+        listing_cache.listing_generation(),
+        listing_cache.listing_generation(SUMMARY_CHANNEL),
+    ]
+    if getattr(filters, "search", None):
+        parts.append(listing_cache.listing_generation(SUGGEST_CHANNEL))
+    if request.user.is_authenticated:
+        parts.extend([request.user.id, _bookmarks_fingerprint(request.user)])
+    return tuple(parts)
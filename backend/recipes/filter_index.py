@@ -0,0 +1,313 @@
+"""Atmintyje laikomas receptų filtrų indeksas (roaring bitmap'ai).
+
+Kiekvienai dimensijai (tag, category, cuisine, meal_type, difficulty) laikome
+`slug -> BitMap(recipe_id)`. AND/OR/NOT tarp kelių tos pačios dimensijos
+reikšmių tampa bitmap'ų sankirta / sąjunga / skirtumu, o `total` – tiesiog
+`len()`, o filtrų kiekiai (facets) – sankirtų kardinalumai. DB lieka tik
+galutinio puslapio receptų nuskaitymas pagal ID.
+
+Principai:
+- Indeksas vienas procesui; užkraunamas paleidžiant (`warm_filter_index`
+  iš `wsgi.py` / `asgi.py`) arba tingiai, pirmo kreipimosi metu.
+- Atnaujinamas inkrementiškai iš `recipes.signals`: signalai po commit'o
+  įrašo pasikeitusius receptus į `listing_cache` žurnalą, o indeksas prieš
+  kiekvieną užklausą perskaito tik tuos receptus.
+- Sąrašo rikiavimas (`-published_at, -updated_at, -id`) laikomas surikiuotu
+  raktų masyvu, todėl puslapiui nereikia rikiuoti DB pusėje.
+"""
+
+from __future__ import annotations
+
+import bisect
+import logging
+import threading
+from collections.abc import Iterable
+from datetime import UTC, datetime
+from typing import Any
+
+from django.conf import settings
+from django.db import connection
+from pyroaring import BitMap
+
+from . import listing_cache
+from .filtering import SLUG_FILTERS, filter_clauses
+from .models import Recipe
+from .pagination import RecipeCursor
+
+logger = logging.getLogger(__name__)
+
+DIMENSIONS = (*SLUG_FILTERS, "difficulty")
+
+_MIN_DATETIME = datetime.min.replace(tzinfo=UTC)
+
+
+def _null_rank(published_at: datetime | None) -> int:
+    # Rikiuojame taip pat, kaip DB: PostgreSQL NULL laiko didžiausia reikšme,
+    # SQLite – mažiausia.
+    if connection.features.nulls_order_largest:
+        return 1 if published_at is None else 0
+    return 0 if published_at is None else 1
+
+
+def sort_key(published_at: datetime | None, updated_at: datetime, recipe_id: int) -> tuple:
+    """Didėjantis raktas; sąrašas eina nuo galo (t.y. DESC)."""
+
+    return (_null_rank(published_at), published_at or _MIN_DATETIME, updated_at, recipe_id)
+
+
+class RecipeFilterIndex:
+    """Vieno proceso filtrų indeksas. Visi metodai saugūs gijoms."""
+
+    # Jei rezultatas mažas, pigiau surikiuoti jį patį, nei eiti visą tvarką.
+    SORT_MATCHES_RATIO = 8
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._generation: int | None = None
+        self._all = BitMap()
+        self._bitmaps: dict[str, dict[str, BitMap]] = {dim: {} for dim in DIMENSIONS}
+        self._values: dict[int, dict[str, tuple[str, ...]]] = {}
+        self._keys: dict[int, tuple] = {}
+        self._order: list[tuple] = []
+
+    # -- užkrovimas ir sinchronizacija ------------------------------------
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._generation is not None
+
+    def __len__(self) -> int:
+        return len(self._all)
+
+    def _fetch(self, recipe_ids: Iterable[int] | None = None) -> dict[int, dict[str, Any]]:
+        qs = Recipe.objects.order_by()
+        if recipe_ids is not None:
+            qs = qs.filter(id__in=list(recipe_ids))
+        rows: dict[int, dict[str, Any]] = {}
+        for recipe_id, difficulty, published_at, updated_at in qs.values_list(
+            "id", "difficulty", "published_at", "updated_at"
+        ).iterator(chunk_size=5000):
+            rows[recipe_id] = {
+                "key": sort_key(published_at, updated_at, recipe_id),
+                "difficulty": (difficulty,) if difficulty else (),
+            }
+
+        for dimension, relation in SLUG_FILTERS.items():
+            field = Recipe._meta.get_field(relation)
+            source = f"{field.m2m_field_name()}_id"
+            through_qs = field.remote_field.through.objects.order_by()
+            if recipe_ids is not None:
+                through_qs = through_qs.filter(**{f"{source}__in": list(rows)})
+            values: dict[int, list[str]] = {}
+            for recipe_id, slug in through_qs.values_list(
+                source, f"{field.m2m_reverse_field_name()}__slug"
+            ).iterator(chunk_size=5000):
+                values.setdefault(recipe_id, []).append(slug)
+            for recipe_id, row in rows.items():
+                row[dimension] = tuple(values.get(recipe_id, ()))
+        return rows
+
+    def _remove(self, recipe_id: int) -> None:
+        if recipe_id not in self._all:
+            return
+        self._all.discard(recipe_id)
+        for dimension, values in self._values.pop(recipe_id, {}).items():
+            bitmaps = self._bitmaps[dimension]
+            for value in values:
+                bitmap = bitmaps.get(value)
+                if bitmap is None:
+                    continue
+                bitmap.discard(recipe_id)
+                if not bitmap:
+                    del bitmaps[value]
+        key = self._keys.pop(recipe_id)
+        position = bisect.bisect_left(self._order, key)
+        if position < len(self._order) and self._order[position] == key:
+            del self._order[position]
+
+    def _add(self, recipe_id: int, row: dict[str, Any], *, keep_order: bool = True) -> None:
+        self._all.add(recipe_id)
+        values = {dim: row[dim] for dim in DIMENSIONS if row[dim]}
+        self._values[recipe_id] = values
+        for dimension, slugs in values.items():
+            bitmaps = self._bitmaps[dimension]
+            for slug in slugs:
+                bitmaps.setdefault(slug, BitMap()).add(recipe_id)
+        self._keys[recipe_id] = row["key"]
+        if keep_order:
+            bisect.insort(self._order, row["key"])
+
+    def load(self) -> None:
+        """Pilnas perkrovimas iš DB."""
+
+        generation = listing_cache.listing_generation()
+        rows = self._fetch()
+        with self._lock:
+            self._all = BitMap()
+            self._bitmaps = {dim: {} for dim in DIMENSIONS}
+            self._values = {}
+            self._keys = {}
+            for recipe_id, row in rows.items():
+                self._add(recipe_id, row, keep_order=False)
+            self._order = sorted(self._keys.values())
+            self._generation = generation
+
+    def refresh(self, recipe_ids: Iterable[int]) -> None:
+        """Perskaito nurodytus receptus (ištrintus pašalina)."""
+
+        recipe_ids = set(recipe_ids)
+        if not recipe_ids:
+            return
+        rows = self._fetch(recipe_ids)
+        with self._lock:
+            for recipe_id in recipe_ids:
+                self._remove(recipe_id)
+                row = rows.get(recipe_id)
+                if row is not None:
+                    self._add(recipe_id, row)
+
+    def sync(self) -> None:
+        """Pritaiko pakeitimus iš `listing_cache` žurnalo (arba perkrauna viską)."""
+
+        # Jei kita gija jau sinchronizuoja – nelaukiam, naudojam esamą būseną.
+        if not self._sync_lock.acquire(blocking=self._generation is None):
+            return
+        try:
+            if self._generation is None:
+                self.load()
+                return
+            generation, changed = listing_cache.changes_since(self._generation)
+            if generation == self._generation:
+                return
+            if changed is None:
+                self.load()
+                return
+            self.refresh(changed)
+            with self._lock:
+                self._generation = generation
+        finally:
+            self._sync_lock.release()
+
+    # -- užklausos ---------------------------------------------------------
+
+    def resolve(self, filters: Any) -> BitMap:
+        """Receptų ID, atitinkantys struktūrinius filtrus."""
+
+        with self._lock:
+            result = BitMap(self._all)
+            for field, clauses in filter_clauses(filters).items():
+                bitmaps = self._bitmaps[field]
+                for clause in clauses:
+                    present = [bitmaps[value] for value in clause.values if value in bitmaps]
+                    matching = BitMap.union(*present) if present else BitMap()
+                    if clause.negated:
+                        result -= matching
+                    else:
+                        result &= matching
+                if not result:
+                    break
+            return result
+
+    def facet_counts(self, matches: BitMap) -> dict[str, dict[str, int]]:
+        """`{dimensija: {reikšmė: kiek `matches` receptų ją turi}}` (be nulinių)."""
+
+        with self._lock:
+            counts: dict[str, dict[str, int]] = {}
+            for dimension, bitmaps in self._bitmaps.items():
+                counts[dimension] = {}
+                for value, bitmap in bitmaps.items():
+                    count = matches.intersection_cardinality(bitmap)
+                    if count:
+                        counts[dimension][value] = count
+            return counts
+
+    def page(
+        self,
+        matches: BitMap,
+        *,
+        limit: int,
+        offset: int = 0,
+        after: RecipeCursor | None = None,
+    ) -> list[int]:
+        """Iki `limit` ID pagal sąrašo rikiavimą, pradedant nuo `offset` arba po `after`."""
+
+        with self._lock:
+            end = len(self._order)
+            if after is not None:
+                end = bisect.bisect_left(
+                    self._order, sort_key(after.published_at, after.updated_at, after.id)
+                )
+                offset = 0
+
+            if len(matches) == len(self._all):
+                # Be filtrų – tiesiog pjūvis nuo galo.
+                stop = max(end - offset, 0)
+                start = max(stop - limit, 0)
+                return [key[-1] for key in reversed(self._order[start:stop])]
+
+            if len(matches) * self.SORT_MATCHES_RATIO < len(self._all):
+                keys = sorted((self._keys[rid] for rid in matches), reverse=True)
+                if after is not None:
+                    boundary = sort_key(after.published_at, after.updated_at, after.id)
+                    keys = [key for key in keys if key < boundary]
+                return [key[-1] for key in keys[offset: offset + limit]]
+
+            ids: list[int] = []
+            skipped = 0
+            for position in range(end - 1, -1, -1):
+                recipe_id = self._order[position][-1]
+                if recipe_id not in matches:
+                    continue
+                if skipped < offset:
+                    skipped += 1
+                    continue
+                ids.append(recipe_id)
+                if len(ids) >= limit:
+                    break
+            return ids
+
+
+_index: RecipeFilterIndex | None = None
+_index_lock = threading.Lock()
+
+
+def is_enabled() -> bool:
+    return getattr(settings, "RECIPE_FILTER_INDEX_ENABLED", True)
+
+
+def get_filter_index() -> RecipeFilterIndex | None:
+    """Sinchronizuotas proceso indeksas arba `None`, jei išjungtas / nepavyko."""
+
+    global _index
+    if not is_enabled():
+        return None
+    try:
+        if _index is None:
+            with _index_lock:
+                if _index is None:
+                    index = RecipeFilterIndex()
+                    index.sync()
+                    _index = index
+        _index.sync()
+        return _index
+    except Exception:
+        logger.exception("Filtrų indeksas: nepavyko užkrauti/sinchronizuoti, naudojam DB")
+        return None
+
+
+def warm_filter_index() -> None:
+    """Užkrauna indeksą paleidžiant procesą (kviečiama iš `wsgi.py` / `asgi.py`)."""
+
+    from django.db import connections
+
+    if not is_enabled():
+        return
+    try:
+        index = get_filter_index()
+        if index is not None:
+            logger.info("Filtrų indeksas: užkrauta %s receptų", len(index))
+    finally:
+        # Jei serveris fork'ina worker'ius (pvz., gunicorn --preload), DB jungtis
+        # negali būti paveldėta.
+        connections.close_all()
@@ -0,0 +1,90 @@
+"""Struktūrinių receptų filtrų (tag, category, cuisine, meal_type, difficulty) logika.
+
+Kiekvienas filtras priima kelias reikšmes:
+- pakartotas parametras – AND: `tag=vegan&tag=greita`;
+- `|` vienoje reikšmėje – OR: `tag=vegan|vegetariska`;
+- `!` priekyje – NOT: `tag=!astru` (arba `tag=!astru|riebu`).
+
+Tą pačią semantiką įgyvendina ir DB kelias (`apply_structured_filters`), ir
+atmintyje laikomas `recipes.filter_index`.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+from dataclasses import dataclass
+from typing import Any
+
+from django.db.models import Q
+
+from .models import Recipe
+
+# Filtro laukas -> Recipe M2M ryšys (visi lookup'ai turi `slug`).
+SLUG_FILTERS = {
+    "tag": "tags",
+    "category": "categories",
+    "cuisine": "cuisines",
+    "meal_type": "meal_types",
+}
+FILTER_FIELDS = (*SLUG_FILTERS, "difficulty")
+
+
+@dataclass(frozen=True)
+class FilterClause:
+    """Viena filtro sąlyga: bent vienas iš `values` (OR), galbūt paneigta."""
+
+    values: tuple[str, ...]
+    negated: bool = False
+
+
+def parse_clauses(raw_values: Iterable[str] | str | None) -> list[FilterClause]:
+    if not raw_values:
+        return []
+    if isinstance(raw_values, str):
+        raw_values = [raw_values]
+
+    clauses: list[FilterClause] = []
+    for raw in raw_values:
+        raw = (raw or "").strip()
+        negated = raw.startswith("!")
+        if negated:
+            raw = raw[1:]
+        values = tuple(sorted({value.strip() for value in raw.split("|") if value.strip()}))
+        if values:
+            clauses.append(FilterClause(values=values, negated=negated))
+    return clauses
+
+
+def filter_clauses(filters: Any) -> dict[str, list[FilterClause]]:
+    """Išparsuotos sąlygos kiekvienam filtro laukui (tušti praleidžiami)."""
+
+    result: dict[str, list[FilterClause]] = {}
+    for field in FILTER_FIELDS:
+        clauses = parse_clauses(getattr(filters, field, None))
+        if clauses:
+            result[field] = clauses
+    return result
+
+
+def has_structured_filters(filters: Any) -> bool:
+    return bool(filter_clauses(filters))
+
+
+def _matching_recipe_ids(relation: str, slugs: tuple[str, ...]):
+    # Tiesiai per M2M lentelę – be JOIN'o į `recipes_recipe` ir be dublikatų.
+    field = Recipe._meta.get_field(relation)
+    through = field.remote_field.through
+    return through.objects.filter(
+        **{f"{field.m2m_reverse_field_name()}__slug__in": slugs}
+    ).values(f"{field.m2m_field_name()}_id")
+
+
+def apply_structured_filters(qs, filters: Any):
+    for field, clauses in filter_clauses(filters).items():
+        for clause in clauses:
+            if field == "difficulty":
+                condition = Q(difficulty__in=clause.values)
+            else:
+                condition = Q(id__in=_matching_recipe_ids(SLUG_FILTERS[field], clause.values))
+            qs = qs.exclude(condition) if clause.negated else qs.filter(condition)
+    return qs
@@ -0,0 +1,89 @@
+"""DB paieška, kai Upstash išjungtas arba neveikia.
+
+Principai:
+- Receptas turi saugomą, jau sulankstytą paieškos tekstą (`search_document`):
+  pavadinimas, aprašymas be HTML, ingredientai ir tag'ai.
+- PostgreSQL papildomai laiko `search_vector` (tsvector, `simple` konfigūracija,
+  pavadinimas su svoriu A) su GIN indeksu; užklausa – prefiksiniai terminai,
+  rezultatai rikiuojami pagal `ts_rank`.
+- Kitose DB (SQLite dev aplinkoje) – paprastas `contains` per `search_document`.
+- Abu laukai atnaujinami iš `recipes.signals` po commit'o; pilnas
+  perskaičiavimas – `python manage.py rebuild_search_documents`.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import F, Value
+
+from .models import Recipe
+from .text import fold_terms, recipe_search_texts
+
+SEARCH_CONFIG = "simple"
+
+
+def is_enabled() -> bool:
+    """Ar DB palaiko `tsvector` paiešką (PostgreSQL) ir ji neišjungta."""
+
+    return connection.vendor == "postgresql" and getattr(
+        settings, "RECIPE_FULLTEXT_ENABLED", True
+    )
+
+
+def _search_texts(recipe: Recipe) -> tuple[str, str]:
+    return recipe_search_texts(
+        title=recipe.title,
+        description=recipe.description,
+        description_html=recipe.description_html,
+        ingredient_names=[ri.ingredient.name for ri in recipe.recipe_ingredients.all()],
+        tag_names=[tag.name for tag in recipe.tags.all()],
+    )
+
+
+def refresh_search_documents(
+    recipe_ids: Iterable[int] | None = None, *, chunk_size: int = 500
+) -> int:
+    """Perskaičiuoja receptų paieškos laukus; grąžina atnaujintų skaičių."""
+
+    qs = Recipe.objects.order_by("id").prefetch_related("recipe_ingredients__ingredient", "tags")
+    if recipe_ids is not None:
+        qs = qs.filter(id__in=list(recipe_ids))
+
+    use_vector = connection.vendor == "postgresql"
+    updated = 0
+    for recipe in qs.only("id", "title", "description", "description_html").iterator(
+        chunk_size=chunk_size
+    ):
+        title, body = _search_texts(recipe)
+        values = {"search_document": f"{title} {body}".strip()}
+        if use_vector:
+            values["search_vector"] = SearchVector(
+                Value(title), weight="A", config=SEARCH_CONFIG
+            ) + SearchVector(Value(body), weight="B", config=SEARCH_CONFIG)
+        # `update()` nekelia `post_save`, todėl signalai nesikartoja.
+        updated += Recipe.objects.filter(id=recipe.id).update(**values)
+    return updated
+
+
+def apply_fulltext_search(qs, query: str):
+    """Filtruoja pagal paiešką; PostgreSQL atveju prideda `search_rank` anotaciją."""
+
+    terms = fold_terms(query)
+    if not terms:
+        return qs
+
+    if is_enabled():
+        search_query = SearchQuery(
+            " & ".join(f"{term}:*" for term in terms), config=SEARCH_CONFIG, search_type="raw"
+        )
+        return qs.filter(search_vector=search_query).annotate(
+            search_rank=SearchRank(F("search_vector"), search_query)
+        )
+
+    for term in terms:
+        qs = qs.filter(search_document__contains=term)
+    return qs
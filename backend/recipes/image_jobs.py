@@ -0,0 +1,126 @@
+"""Paveikslėlių variantų generavimas už užklausos ribų (DB eilė).
+
+Principai:
+- `Recipe.save()` / `RecipeStep.save()` tik įtraukia darbą (`enqueue`) po
+  commit'o ir iškart grįžta; AVIF/WebP kodavimą atlieka
+  `python manage.py process_image_jobs` su procesų pool'u.
+- Darbas unikalus pagal (objektas, paveikslėlio vardas), todėl pakartotinis
+  įtraukimas tik grąžina jį į eilę, o pakeistas paveikslėlis – naujas darbas.
+- Vykdymas idempotentiškas: pasikeitęs ar jau apdorotas šaltinis tiesiog
+  praleidžiamas (`recipes.image_variants.generate_variants`).
+- Nepavykęs darbas kartojamas su eksponentiškai ilgėjančia pauze, kol
+  pasiekiamas `RECIPE_IMAGE_JOB_MAX_ATTEMPTS`. Užstrigę (nutrūkusio
+  worker'io) darbai po `STALE_AFTER` grąžinami į eilę.
+- Kol variantų nėra, API grąžina tik originalą (manifestas dar negalioja).
+"""
+
+from __future__ import annotations
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .image_variants import generate_variants, is_current
+from .models import ImageVariantJob, Recipe, RecipeStep
+
+logger = logging.getLogger(__name__)
+
+KIND_MODELS = {ImageVariantJob.Kind.RECIPE: Recipe, ImageVariantJob.Kind.STEP: RecipeStep}
+STALE_AFTER = timedelta(minutes=15)
+RETRY_BASE = timedelta(minutes=1)
+
+
+def is_enabled() -> bool:
+    return getattr(settings, "RECIPE_IMAGE_JOBS_ENABLED", True)
+
+
+def _max_attempts() -> int:
+    return getattr(settings, "RECIPE_IMAGE_JOB_MAX_ATTEMPTS", 5)
+
+
+def kind_of(obj) -> str:
+    return ImageVariantJob.Kind.RECIPE if isinstance(obj, Recipe) else ImageVariantJob.Kind.STEP
+
+
+def enqueue(obj) -> None:
+    """Įtraukia darbą po commit'o; be paveikslėlio manifestas išvalomas iškart."""
+
+    if not obj.image:
+        generate_variants(obj)
+        return
+    if is_current(obj):
+        return
+    job = ImageVariantJob(kind=kind_of(obj), object_id=obj.pk, source=obj.image.name)
+    # Tas pats šaltinis – tas pats darbas: grąžinamas į eilę, o ne dubliuojamas.
+    transaction.on_commit(
+        lambda: ImageVariantJob.objects.bulk_create(
+            [job],
+            update_conflicts=True,
+            unique_fields=["kind", "object_id", "source"],
+            update_fields=["status", "attempts", "run_after", "last_error", "updated_at"],
+        )
+    )
+
+
+def schedule_variants(obj) -> None:
+    """Iš `save()`: eilė arba (išjungus) sinchroninis generavimas."""
+
+    if is_enabled():
+        enqueue(obj)
+    else:
+        generate_variants(obj)
+
+
+def claim_jobs(limit: int) -> list[int]:
+    """Paima iki `limit` paruoštų darbų ir pažymi juos vykdomais."""
+
+    now = timezone.now()
+    with transaction.atomic():
+        ImageVariantJob.objects.filter(
+            status=ImageVariantJob.Status.RUNNING, locked_at__lt=now - STALE_AFTER
+        ).update(status=ImageVariantJob.Status.PENDING)
+        ids = list(
+            ImageVariantJob.objects.select_for_update(skip_locked=True)
+            .filter(status=ImageVariantJob.Status.PENDING, run_after__lte=now)
+            .order_by("run_after", "id")
+            .values_list("id", flat=True)[:limit]
+        )
+        ImageVariantJob.objects.filter(id__in=ids).update(
+            status=ImageVariantJob.Status.RUNNING, locked_at=now
+        )
+    return ids
+
+
+def run_job(job_id: int) -> str:
+    """Įvykdo vieną darbą (worker procese); grąžina galutinę būseną."""
+
+    job = ImageVariantJob.objects.get(id=job_id)
+    obj = KIND_MODELS[job.kind].objects.filter(pk=job.object_id).first()
+    try:
+        # Ištrintas objektas ar pakeistas paveikslėlis – darbas nebeaktualus.
+        if obj is not None and obj.image and obj.image.name == job.source:
+            generate_variants(obj)
+    except Exception as exc:
+        attempts = job.attempts + 1
+        failed = attempts >= _max_attempts()
+        ImageVariantJob.objects.filter(id=job_id).update(
+            status=ImageVariantJob.Status.FAILED if failed else ImageVariantJob.Status.PENDING,
+            attempts=attempts,
+            run_after=timezone.now() + RETRY_BASE * 2 ** (attempts - 1),
+            locked_at=None,
+            last_error=f"{type(exc).__name__}: {exc}"[:2000],
+            updated_at=timezone.now(),
+        )
+        logger.exception("Paveikslėlių darbas #%s nepavyko (bandymas %s)", job_id, attempts)
+        return ImageVariantJob.Status.FAILED if failed else ImageVariantJob.Status.PENDING
+    ImageVariantJob.objects.filter(id=job_id).update(
+        status=ImageVariantJob.Status.DONE,
+        attempts=job.attempts + 1,
+        locked_at=None,
+        last_error="",
+        updated_at=timezone.now(),
+    )
+    return ImageVariantJob.Status.DONE
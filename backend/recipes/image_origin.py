@@ -0,0 +1,204 @@
+"""Paveikslėlių „origin“: bet koks leistinas plotis / kokybė / formatas pagal poreikį.
+
+Principai:
+- URL: `{origin}/{width}/{quality}/{format}?s=<parašas>`, kur `origin`
+  = `/api/recipes/images/{kind}/{id}/{version}`, o `version` – šaltinio
+  failo vardo santrauka. Pakeitus paveikslėlį keičiasi URL, todėl atsakymai
+  nekintami (`Cache-Control: immutable`) ir prieš origin gali stovėti CDN.
+- Parametrai pasirašomi HMAC (`salted_hmac`) atskiru raktu
+  `RECIPE_IMAGE_ORIGIN_KEY` (ne `SECRET_KEY` – juo dalijamasi su SSR
+  frontend'u). Be rakto origin išjungtas: API negrąžina URL, endpoint'as – 404.
+  Be to, leidžiami tik `RECIPE_IMAGE_ORIGIN_WIDTHS`,
+  `RECIPE_IMAGE_ORIGIN_QUALITIES` ir `ORIGIN_FORMATS`.
+- API grąžina jau pasirašytus `srcset` kiekvienam formatui ir kokybei
+  (`sources`), tad frontend'ui rakto nereikia.
+- Pirmas kreipinys koduoja (`recipes.image_pipeline`, be didinimo) ir įrašo
+  rezultatą į saugyklą (`CACHE/origin/...`); kiti tik skaito.
+- Vienu metu koduojama ne daugiau kaip `RECIPE_IMAGE_ORIGIN_WORKERS`
+  užklausų; kai laisvos vietos nėra, iškart `OriginBusyError` (API grąžina 503
+  su `Retry-After`) – užklausos gija nelaukia, todėl šaltų kreipinių banga
+  neužima visų API worker'ių.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections.abc import Callable
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils.crypto import constant_time_compare, salted_hmac
+from pilkit.processors import ResizeToFit
+
+from .image_jobs import KIND_MODELS, kind_of
+from .image_pipeline import VariantSpec, render_variants
+
+SIGNATURE_SALT = "recipes.image_origin"
+ORIGIN_FORMATS = {
+    "avif": ("AVIF", "image/avif"),
+    "webp": ("WEBP", "image/webp"),
+    "jpeg": ("JPEG", "image/jpeg"),
+}
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+class OriginBusyError(Exception):
+    """Kodavimo pool'as pilnas – klientas turėtų pakartoti vėliau."""
+
+
+def _key() -> str:
+    return getattr(settings, "RECIPE_IMAGE_ORIGIN_KEY", "")
+
+
+def is_enabled() -> bool:
+    """Origin veikia tik sukonfigūravus atskirą parašo raktą."""
+
+    return bool(_key())
+
+
+def allowed_widths() -> tuple[int, ...]:
+    return tuple(getattr(settings, "RECIPE_IMAGE_ORIGIN_WIDTHS", (320, 640, 960, 1280)))
+
+
+def allowed_qualities() -> tuple[int, ...]:
+    return tuple(getattr(settings, "RECIPE_IMAGE_ORIGIN_QUALITIES", (75,)))
+
+
+def is_allowed(width: int, quality: int, fmt: str) -> bool:
+    return width in allowed_widths() and quality in allowed_qualities() and fmt in ORIGIN_FORMATS
+
+
+def source_version(name: str) -> str:
+    return hashlib.sha1(name.encode("utf-8")).hexdigest()[:12]
+
+
+def _base_path() -> str:
+    prefix = settings.NINJA_BASE_PATH.strip("/")
+    return f"/{prefix}/recipes/images" if prefix else "/recipes/images"
+
+
+def origin_path(obj) -> str | None:
+    """`/api/recipes/images/{kind}/{id}/{version}`.
+
+    `None` – paveikslėlio nėra ar origin išjungtas.
+    """
+
+    if not obj.image or not is_enabled():
+        return None
+    return f"{_base_path()}/{kind_of(obj)}/{obj.pk}/{source_version(obj.image.name)}"
+
+
+def _canonical(kind: str, object_id: int, version: str, width: int, quality: int, fmt: str) -> str:
+    return f"{kind}/{object_id}/{version}/{width}/{quality}/{fmt}"
+
+
+def sign(kind: str, object_id: int, version: str, width: int, quality: int, fmt: str) -> str:
+    value = _canonical(kind, object_id, version, width, quality, fmt)
+    return salted_hmac(SIGNATURE_SALT, value, secret=_key(), algorithm="sha256").hexdigest()[:32]
+
+
+def verify(
+    signature: str, kind: str, object_id: int, version: str, width: int, quality: int, fmt: str
+) -> bool:
+    if not is_enabled():
+        return False
+    return constant_time_compare(signature, sign(kind, object_id, version, width, quality, fmt))
+
+
+def signed_url(obj, width: int, fmt: str, quality: int | None = None) -> str | None:
+    """Pasirašytas (santykinis) origin URL; `None` – paveikslėlio nėra ar origin išjungtas."""
+
+    base = origin_path(obj)
+    if base is None:
+        return None
+    quality = quality or allowed_qualities()[-1]
+    signature = sign(kind_of(obj), obj.pk, source_version(obj.image.name), width, quality, fmt)
+    return f"{base}/{width}/{quality}/{fmt}?s={signature}"
+
+
+def sources(obj, absolute: Callable[[str], str] | None = None) -> list[dict]:
+    """Pasirašyti `srcset` kiekvienam formatui ir kokybei (`<picture><source>`).
+
+    `absolute` paverčia santykinį URL absoliučiu (API – `build_absolute_uri`).
+    """
+
+    base = origin_path(obj)
+    if base is None:
+        return []
+    if absolute is not None:
+        base = absolute(base)
+    kind, version = kind_of(obj), source_version(obj.image.name)
+    result = []
+    for fmt, (_, content_type) in ORIGIN_FORMATS.items():
+        for quality in allowed_qualities():
+            srcset = ", ".join(
+                f"{base}/{width}/{quality}/{fmt}"
+                f"?s={sign(kind, obj.pk, version, width, quality, fmt)} {width}w"
+                for width in allowed_widths()
+            )
+            result.append(
+                {"format": fmt, "type": content_type, "quality": quality, "srcset": srcset}
+            )
+    return result
+
+
+_slots: threading.BoundedSemaphore | None = None
+_slots_lock = threading.Lock()
+
+
+def _encoding_slots() -> threading.BoundedSemaphore:
+    global _slots
+    with _slots_lock:
+        if _slots is None:
+            _slots = threading.BoundedSemaphore(
+                max(1, getattr(settings, "RECIPE_IMAGE_ORIGIN_WORKERS", 2))
+            )
+        return _slots
+
+
+def _encode(source_name: str, storage, width: int, quality: int, fmt: str) -> bytes:
+    with storage.open(source_name, "rb") as handle:
+        source = handle.read()
+    spec = VariantSpec(
+        processors=[ResizeToFit(width=width, upscale=False)],
+        format=ORIGIN_FORMATS[fmt][0],
+        options={"quality": quality},
+    )
+    return render_variants(source, {fmt: spec}).variants[fmt]
+
+
+def _storage_name(
+    kind: str, object_id: int, version: str, width: int, quality: int, fmt: str
+) -> str:
+    return f"CACHE/origin/{kind}/{object_id}/{version}/{width}_{quality}.{fmt}"
+
+
+def get_variant(
+    kind: str, object_id: int, version: str, width: int, quality: int, fmt: str
+) -> bytes | None:
+    """Variantas iš saugyklos arba naujai užkoduotas; `None` – objekto / šaltinio nebėra."""
+
+    name = _storage_name(kind, object_id, version, width, quality, fmt)
+    if default_storage.exists(name):
+        with default_storage.open(name, "rb") as handle:
+            return handle.read()
+
+    model = KIND_MODELS.get(kind)
+    obj = model.objects.filter(pk=object_id).only("image").first() if model else None
+    # Senas URL (pakeistas paveikslėlis) nekoduojamas – turinys būtų kitas.
+    if obj is None or not obj.image or source_version(obj.image.name) != version:
+        return None
+
+    slots = _encoding_slots()
+    # Vietos nelaukiama – klientas (CDN, naršyklė) pakartos po `Retry-After`.
+    if not slots.acquire(blocking=False):
+        raise OriginBusyError
+    try:
+        data = _encode(obj.image.name, obj.image.storage, width, quality, fmt)
+    finally:
+        slots.release()
+    if not default_storage.exists(name):
+        default_storage.save(name, ContentFile(data))
+    return data
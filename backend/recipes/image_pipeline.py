@@ -0,0 +1,166 @@
+"""Visų paveikslėlio variantų kodavimas iš vieno dekodavimo.
+
+Principai:
+- Originalas nuskaitomas ir dekoduojamas vieną kartą visiems variantams, o ne
+  kiekvienam `ImageSpecField` atskirai (`ImageSpec.generate()` – 8 pilni
+  dekodavimai).
+- JPEG dekoduojamas sumažintu masteliu (`Image.draft`, DCT 1/2–1/8), jei
+  didžiausiam variantui pakanka mažesnio vaizdo.
+- Dydžiai mažinami laipsniškai nuo didžiausio: kiekvienas variantas
+  skaičiuojamas iš mažiausio jau turimo tarpinio vaizdo, kurio užtenka be
+  didinimo; abu formatai koduojami iš to paties apdoroto vaizdo.
+- Procesoriai ir kodavimo parinktys imami iš modelio spec'ų, todėl
+  `models.py` lieka vienintelis nustatymų šaltinis. Nežinomi procesoriai ar
+  didinimas – variantas skaičiuojamas iš pilno originalo, kaip `imagekit`.
+- Iš to paties dekodavimo apskaičiuojamas originalo aprašas: matmenys,
+  mažytis LQIP (base64 WebP data URI) ir dominuojanti spalva – frontend'as
+  iš jų rezervuoja vietą ir rodo užpildą, kol kraunasi variantas.
+"""
+
+from __future__ import annotations
+
+import base64
+import io
+import math
+from collections.abc import Hashable, Mapping
+from dataclasses import dataclass, field
+from typing import Any
+
+from PIL import Image, ImageOps
+from pilkit.processors import ProcessorPipeline, ResizeToFill, ResizeToFit
+from pilkit.utils import img_to_fobj
+
+LQIP_SIZE = 16
+COLOR_SAMPLE_SIZE = 64
+
+
+@dataclass(frozen=True)
+class VariantSpec:
+    """Spec'as be `ImageSpecField` (tie patys atributai, kuriuos naudoja pipeline'as)."""
+
+    processors: list
+    format: str
+    options: dict = field(default_factory=dict)
+    autoconvert: bool = True
+
+
+@dataclass(frozen=True)
+class RenderedImage:
+    variants: dict[Hashable, bytes]
+    original: dict[str, Any]
+
+
+def _processors_key(processors) -> str:
+    return repr([(type(p).__name__, sorted(vars(p).items())) for p in processors])
+
+
+def _scaled_size(processors, size: tuple[int, int]) -> tuple[int, int] | None:
+    """Iki kokio dydžio (proporcingai) spec'as sumažina vaizdą; `None` – nežinoma."""
+
+    if len(processors) != 1:
+        return None
+    processor = processors[0]
+    width, height = size
+    if isinstance(processor, ResizeToFit) and processor.mat_color is None:
+        ratios = [
+            target / current
+            for target, current in ((processor.width, width), (processor.height, height))
+            if target
+        ]
+        ratio = min(ratios) if ratios else 1
+    elif isinstance(processor, ResizeToFill) and processor.width and processor.height:
+        ratio = max(processor.width / width, processor.height / height)
+    else:
+        return None
+    if ratio >= 1:
+        return None
+    return math.ceil(width * ratio), math.ceil(height * ratio)
+
+
+def _keeps_aspect(processors) -> bool:
+    return (
+        len(processors) == 1
+        and isinstance(processors[0], ResizeToFit)
+        and processors[0].mat_color is None
+    )
+
+
+def _pick(intermediates: list[Image.Image], target: tuple[int, int] | None) -> Image.Image:
+    """Mažiausias tarpinis vaizdas, kurio pakanka `target`; `None` – originalas."""
+
+    if target is None:
+        return intermediates[0]
+    fitting = [
+        candidate
+        for candidate in intermediates
+        if candidate.width >= target[0] and candidate.height >= target[1]
+    ]
+    return min(
+        fitting, key=lambda candidate: candidate.width * candidate.height, default=intermediates[0]
+    )
+
+
+def describe_original(image: Image.Image, size: tuple[int, int]) -> dict[str, Any]:
+    """Originalo matmenys, LQIP ir dominuojanti spalva (iš jau dekoduoto vaizdo)."""
+
+    sample = ImageOps.contain(image, (COLOR_SAMPLE_SIZE, COLOR_SAMPLE_SIZE)).convert("RGB")
+    # Dažniausia spalva iš 8 spalvų paletės, o ne vidurkis (jis „purvinas“).
+    palette = sample.quantize(colors=8)
+    _, index = max(palette.getcolors())
+    red, green, blue = palette.getpalette()[index * 3 : index * 3 + 3]
+
+    preview = ImageOps.contain(sample, (LQIP_SIZE, LQIP_SIZE))
+    buffer = io.BytesIO()
+    preview.save(buffer, "WEBP", quality=40)
+    return {
+        "width": size[0],
+        "height": size[1],
+        "lqip": "data:image/webp;base64," + base64.b64encode(buffer.getvalue()).decode("ascii"),
+        "color": f"#{red:02x}{green:02x}{blue:02x}",
+    }
+
+
+def render_variants(source: bytes, generators: Mapping[Hashable, Any]) -> RenderedImage:
+    """Užkoduoja visus `generators` (imagekit spec'us) iš vieno `source` dekodavimo."""
+
+    groups: dict[str, list[Hashable]] = {}
+    for key, generator in generators.items():
+        groups.setdefault(_processors_key(generator.processors), []).append(key)
+
+    image = Image.open(io.BytesIO(source))
+    original_format, original_size = image.format, image.size
+    targets = {
+        group: _scaled_size(generators[keys[0]].processors, image.size)
+        for group, keys in groups.items()
+    }
+    sized = [target for target in targets.values() if target]
+    if len(sized) == len(targets):
+        # Visi variantai mažesni už originalą – JPEG pakanka dekoduoti mažesnį.
+        sized.append((COLOR_SAMPLE_SIZE, COLOR_SAMPLE_SIZE))
+        image.draft(None, (max(w for w, _ in sized), max(h for _, h in sized)))
+    image.load()
+    original = describe_original(image, original_size)
+
+    # Didžiausi pirmiau, kad mažesni būtų skaičiuojami iš jų.
+    decoded_size = image.size
+    order = sorted(groups, key=lambda group: -math.prod(targets[group] or decoded_size))
+    intermediates = [image]
+    del image
+    rendered: dict[Hashable, bytes] = {}
+    for index, group in enumerate(order):
+        keys = groups[group]
+        processors = generators[keys[0]].processors
+        processed = ProcessorPipeline(processors).process(_pick(intermediates, targets[group]))
+        if _keeps_aspect(processors):
+            intermediates.append(processed)
+        # Likusiems variantams per dideli tarpiniai vaizdai atlaisvinami dar prieš
+        # kodavimą (AVIF koduotuvui reikia daugiausia atminties).
+        remaining = [targets[later] for later in order[index + 1 :]]
+        needed = {id(_pick(intermediates, target)) for target in remaining}
+        intermediates = [candidate for candidate in intermediates if id(candidate) in needed]
+        for key in keys:
+            generator = generators[key]
+            fmt = generator.format or processed.format or original_format or "JPEG"
+            output = img_to_fobj(processed, fmt, generator.autoconvert, **(generator.options or {}))
+            rendered[key] = output.read()
+    return RenderedImage(variants=rendered, original=original)
@@ -0,0 +1,184 @@
+"""Paveikslėlių variantų manifestas (`image_variants` laukas).
+
+Principai:
+- Variantai (`SIZES` × `FORMATS`) aprašyti `ImageSpecField` spec'ais, bet
+  koduojami visi kartu iš vieno originalo dekodavimo
+  (`recipes.image_pipeline`), kai išsaugomas paveikslėlis. Tuo metu jų URL,
+  matmenys ir dydis baitais, o taip pat originalo matmenys, LQIP ir
+  dominuojanti spalva (`original`) įrašomi į modelio `image_variants` JSON
+  lauką – jokių skaičiavimų užklausos metu.
+- Serializuojant skaitomas tik manifestas – jokių saugyklos kreipinių.
+  Manifestas galioja tik šaltiniui (`source`), iš kurio sugeneruotas; kitaip
+  API grąžina tik originalą.
+- Manifestas įrašomas `update()` (be `save()` rekursijos ir signalų), todėl
+  viešos detalės ir sąrašo talpyklos pasendinamos čia pat.
+- Esamiems įrašams – `python manage.py backfill_image_manifests`; masiniam
+  perkodavimui (pakeitus kokybę, perkėlus saugyklą) –
+  `python manage.py regenerate_image_variants` (`regenerate_variants`).
+"""
+
+from __future__ import annotations
+
+import io
+from typing import Any
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image
+
+from . import detail_cache, listing_cache
+from .image_pipeline import RenderedImage, render_variants
+from .models import Recipe, RecipeStep
+
+SIZES = ("thumb", "small", "medium", "large")
+FORMATS = ("avif", "webp")
+
+
+def spec_field(size: str, fmt: str) -> str:
+    return f"image_{size}_{fmt}"
+
+
+def _current_manifest(obj) -> dict:
+    manifest = obj.image_variants or {}
+    if not obj.image or manifest.get("source") != obj.image.name:
+        return {}
+    return manifest
+
+
+def current_variants(obj) -> dict:
+    """`{size: {format: {...}}}` iš manifesto; tuščias, jei jis pasenęs."""
+
+    return _current_manifest(obj).get("variants", {})
+
+
+def current_original(obj) -> dict:
+    """Originalo `{width, height, lqip, color}` iš manifesto; tuščias, jei jo nėra."""
+
+    return _current_manifest(obj).get("original", {})
+
+
+def is_current(obj) -> bool:
+    """Manifestas atitinka dabartinį paveikslėlį ir yra pilnas (visi `SIZES` × `FORMATS`)."""
+
+    variants = current_variants(obj)
+    complete = all(fmt in variants.get(size, {}) for size in SIZES for fmt in FORMATS)
+    return complete and bool(current_original(obj))
+
+
+def _describe(spec, data: bytes | None = None) -> dict:
+    """Aprašas manifestui; `data` – naujai užkoduotas variantas, kitaip skaitomas esamas."""
+
+    storage, name = spec.storage, spec.name
+    if data is None:
+        with storage.open(name, "rb") as handle:
+            data = handle.read()
+    else:
+        if storage.exists(name):
+            storage.delete(name)
+        name = storage.save(name, ContentFile(data))
+    with Image.open(io.BytesIO(data)) as image:
+        width, height = image.size
+    return {
+        "name": name,
+        "url": storage.url(name),
+        "width": width,
+        "height": height,
+        "bytes": len(data),
+    }
+
+
+def _render(obj, keys: list[tuple[str, str]]) -> RenderedImage:
+    """Užkoduoja `(size, format)` variantus ir aprašo originalą vienu dekodavimu."""
+
+    with obj.image.storage.open(obj.image.name, "rb") as handle:
+        source = handle.read()
+    generators = {key: getattr(obj, spec_field(*key)).generator for key in keys}
+    return render_variants(source, generators)
+
+
+def build_manifest(obj, *, force: bool = False) -> dict:
+    specs = {(size, fmt): getattr(obj, spec_field(size, fmt)) for size in SIZES for fmt in FORMATS}
+    missing = [key for key, spec in specs.items() if force or not spec.storage.exists(spec.name)]
+    rendered = _render(obj, missing)
+    variants: dict[str, dict] = {}
+    for (size, fmt), spec in specs.items():
+        variants.setdefault(size, {})[fmt] = _describe(spec, rendered.variants.get((size, fmt)))
+    return {"source": obj.image.name, "original": rendered.original, "variants": variants}
+
+
+def regenerate_variants(
+    obj,
+    *,
+    sizes: tuple[str, ...] = SIZES,
+    formats: tuple[str, ...] = FORMATS,
+    only_missing: bool = False,
+) -> list[tuple[int | None, int]]:
+    """Perkoduoja pasirinktus variantus ir sulieja juos su galiojančiu manifestu.
+
+    Grąžina `(ankstesni baitai | None, nauji baitai)` kiekvienam perkoduotam
+    variantui. `only_missing` – tik tie, kurių nėra manifeste ar saugykloje.
+    Pasenęs ar nepilnas manifestas perrašomas visas, nepaisant `sizes` /
+    `formats` – kitaip liktų dalinis manifestas naujam šaltiniui.
+    """
+
+    if not obj.image:
+        return []
+    if not is_current(obj):
+        sizes, formats = SIZES, FORMATS
+    previous = current_variants(obj)
+    variants = {size: dict(entries) for size, entries in previous.items()}
+    pending: dict[tuple[str, str], Any] = {}
+    for size in sizes:
+        for fmt in formats:
+            spec = getattr(obj, spec_field(size, fmt))
+            old = previous.get(size, {}).get(fmt)
+            if only_missing and old and spec.storage.exists(old["name"]):
+                continue
+            pending[(size, fmt)] = spec
+    # Trūkstamam manifeste, bet esančiam saugykloje failui pakanka aprašo.
+    to_encode = [
+        key
+        for key, spec in pending.items()
+        if not only_missing or not spec.storage.exists(spec.name)
+    ]
+    # Originalo aprašo trūksta (senas manifestas) – jį reikia ir be kodavimo.
+    rendered = _render(obj, to_encode) if to_encode or not current_original(obj) else None
+    encoded: list[tuple[int | None, int]] = []
+    for (size, fmt), spec in pending.items():
+        old = previous.get(size, {}).get(fmt)
+        entry = _describe(spec, rendered.variants.get((size, fmt)) if rendered else None)
+        variants.setdefault(size, {})[fmt] = entry
+        encoded.append((old["bytes"] if old else None, entry["bytes"]))
+    if encoded or rendered:
+        original = rendered.original if rendered else current_original(obj)
+        save_manifest(obj, {"source": obj.image.name, "original": original, "variants": variants})
+    return encoded
+
+
+def save_manifest(obj, manifest: dict) -> None:
+    type(obj).objects.filter(pk=obj.pk).update(image_variants=manifest)
+    obj.image_variants = manifest
+
+    if isinstance(obj, Recipe):
+        recipe_id = obj.pk
+        # Kortelės paveikslėliai sąraše – pasendinam ir sąrašo generaciją.
+        transaction.on_commit(lambda: listing_cache.bump_listing_generation({recipe_id}))
+    elif isinstance(obj, RecipeStep):
+        recipe_id = obj.recipe_id
+    else:
+        return
+    transaction.on_commit(lambda: detail_cache.bump_detail_versions({recipe_id}))
+
+
+def generate_variants(obj, *, force: bool = False) -> bool:
+    """Sugeneruoja variantus ir manifestą; `False` – nieko nereikėjo daryti."""
+
+    if not obj.image:
+        if obj.image_variants:
+            save_manifest(obj, {})
+            return True
+        return False
+    if not force and is_current(obj):
+        return False
+    save_manifest(obj, build_manifest(obj, force=force))
+    return True
@@ -0,0 +1,17 @@
+"""DB indeksai, kurių Django neturi „iš dėžės“."""
+
+from django.contrib.postgres.indexes import GinIndex
+from django.db.models import Index
+
+
+class SearchVectorIndex(GinIndex):
+    """GIN indeksas `tsvector` laukui PostgreSQL'e.
+
+    Kitose DB (SQLite dev aplinkoje) `USING gin` sintaksės nėra, todėl ten
+    sukuriamas paprastas indeksas – migracijų būsena abiem atvejais ta pati.
+    """
+
+    def create_sql(self, model, schema_editor, using="", **kwargs):
+        if schema_editor.connection.vendor != "postgresql":
+            return Index.create_sql(self, model, schema_editor, using=using, **kwargs)
+        return super().create_sql(model, schema_editor, using=using, **kwargs)
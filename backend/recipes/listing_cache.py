@@ -0,0 +1,149 @@
+"""Receptų sąrašo skaičiavimų (total ir pan.) talpykla.
+
+Principai:
+- Raktas = sąrašo „generacija“ + normalizuota filtrų kombinacija.
+- Generacija didinama po bet kokio recepto ar jo tag'ų / kategorijų /
+  virtuvių / patiekalo tipų pakeitimo (`recipes.signals`), todėl senų raktų
+  trinti nereikia – jie tiesiog nebenaudojami ir išnyksta pagal TTL.
+- Kartu su generacija saugomas pasikeitusių receptų ID žurnalas, iš kurio
+  atmintyje laikomi indeksai (`recipes.filter_index`) atsinaujina inkrementiškai.
+- Tas pats mechanizmas turi atskirus „kanalus“ (`channel`) kitiems atmintyje
+  laikomiems indeksams, pvz. `recipes.suggest` – jų pakeitimai nekelia sąrašo
+  indekso perkrovimo.
+- Kelių procesų diegime `CACHES["default"]` turi būti bendras (pvz., Redis),
+  kitaip kiekvienas procesas turės savo generaciją.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import time
+from collections.abc import Callable, Hashable, Iterable
+from typing import Any
+
+from django.conf import settings
+from django.core.cache import cache
+
+LISTING_CHANNEL = "listing"
+CHANGES_TIMEOUT = 24 * 60 * 60
+# Jei atsiliekama daugiau – pigiau perkrauti viską, nei taikyti pakeitimus.
+MAX_TRACKED_CHANGES = 500
+
+# Laukai, kurie neturi įtakos rezultatų aibei (tik puslapiui ar tvarkai).
+PAGING_FIELDS = {"limit", "offset", "cursor", "count", "sort"}
+# Paieška nejautri registrui, o slugai lyginami tiksliai.
+CASE_INSENSITIVE_FIELDS = {"search"}
+
+
+def _timeout() -> int:
+    return getattr(settings, "RECIPE_LISTING_CACHE_TIMEOUT", 300)
+
+
+def _initial_generation() -> int:
+    # Jei raktas išmestas iš talpyklos, nepradedam nuo 1 – kitaip galėtume
+    # vėl pataikyti į senus, jau nebegaliojančius įrašus.
+    return int(time.time() * 1000)
+
+
+def _generation_key(channel: str) -> str:
+    return f"recipes:{channel}:generation"
+
+
+def _changes_prefix(channel: str) -> str:
+    return f"recipes:{channel}:changes"
+
+
+def listing_generation(channel: str = LISTING_CHANNEL) -> int:
+    key = _generation_key(channel)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, _initial_generation(), timeout=None)
+        generation = cache.get(key, _initial_generation())
+    return int(generation)
+
+
+def bump_listing_generation(
+    recipe_ids: Iterable[Hashable] | None = (), *, channel: str = LISTING_CHANNEL
+) -> int:
+    """Padidina generaciją ir įrašo, kurie receptai (ar kiti įrašai) pasikeitė.
+
+    `recipe_ids=None` reiškia „nežinoma, kurie“ – atmintyje laikomi indeksai
+    tada persikrauna visiškai.
+    """
+
+    key = _generation_key(channel)
+    try:
+        generation = cache.incr(key)
+    except ValueError:
+        cache.add(key, _initial_generation(), timeout=None)
+        return listing_generation(channel)
+    changed = None if recipe_ids is None else sorted(set(recipe_ids))
+    cache.set(f"{_changes_prefix(channel)}:{generation}", changed, timeout=CHANGES_TIMEOUT)
+    return generation
+
+
+def changes_since(
+    generation: int, *, channel: str = LISTING_CHANNEL
+) -> tuple[int, set[Hashable] | None]:
+    """Grąžina (dabartinė generacija, pasikeitę receptų ID nuo `generation`).
+
+    `None` vietoje ID aibės reiškia, kad tikslus pakeitimų sąrašas nežinomas
+    (per senas, išmestas iš talpyklos ar pilnas pakeitimas) – reikia pilno
+    perkrovimo.
+    """
+
+    current = listing_generation(channel)
+    if current == generation:
+        return current, set()
+    if current < generation or current - generation > MAX_TRACKED_CHANGES:
+        return current, None
+
+    prefix = _changes_prefix(channel)
+    keys = [f"{prefix}:{g}" for g in range(generation + 1, current + 1)]
+    found = cache.get_many(keys)
+    if len(found) != len(keys):
+        return current, None
+
+    changed: set[Hashable] = set()
+    for ids in found.values():
+        if ids is None:
+            return current, None
+        changed.update(ids)
+    return current, changed
+
+
+def normalize_filters(filters: Any) -> tuple[tuple[str, str], ...]:
+    """Filtrų kombinacija be puslapiavimo laukų ir nereikšmingų tarpų."""
+
+    data = filters.dict() if hasattr(filters, "dict") else dict(filters)
+    items: list[tuple[str, str]] = []
+    for name, value in data.items():
+        if name in PAGING_FIELDS or value in (None, "", [], ()):
+            continue
+        if isinstance(value, (list, tuple)):
+            value = ",".join(sorted(str(v).strip() for v in value))
+        else:
+            value = " ".join(str(value).split())
+        if name in CASE_INSENSITIVE_FIELDS:
+            value = value.lower()
+        items.append((name, value))
+    return tuple(sorted(items))
+
+
+def _key(kind: str, filters: Any) -> str:
+    normalized = repr(normalize_filters(filters)).encode()
+    digest = hashlib.sha1(normalized).hexdigest()
+    return f"recipes:listing:{kind}:{listing_generation()}:{digest}"
+
+
+def get_cached(kind: str, filters: Any) -> Any | None:
+    return cache.get(_key(kind, filters))
+
+
+def get_or_compute(kind: str, filters: Any, compute: Callable[[], Any]) -> Any:
+    key = _key(kind, filters)
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, timeout=_timeout())
+    return value
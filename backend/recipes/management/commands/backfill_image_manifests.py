@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.image_variants import generate_variants
+from recipes.models import Recipe, RecipeStep
+
+MODELS = {"recipe": Recipe, "step": RecipeStep}
+
+
+class Command(BaseCommand):
+    help = (
+        "Užpildyti receptų ir žingsnių paveikslėlių variantų manifestą (image_variants): "
+        "sugeneruoja trūkstamus variantus ir įrašo jų URL, matmenis bei dydžius."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--model",
+            choices=sorted(MODELS),
+            action="append",
+            help="Apdoroti tik nurodytą modelį (galima kartoti). Numatyta – visi.",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Perrašyti ir galiojančius manifestus.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=200,
+            help="Kiek įrašų nuskaityti vienu kartu.",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        for name in options["model"] or sorted(MODELS):
+            model = MODELS[name]
+            rows = model.objects.exclude(image="").exclude(image__isnull=True).order_by("pk")
+            updated = failed = 0
+            for obj in rows.iterator(chunk_size=max(1, options["chunk_size"])):
+                try:
+                    updated += generate_variants(obj, force=options["force"])
+                except Exception as exc:  # pragma: no cover - vienas sugedęs failas nestabdo darbo
+                    failed += 1
+                    self.stderr.write(f"{name} #{obj.pk}: {exc}")
+            self.stdout.write(
+                self.style.SUCCESS(f"{name}: atnaujinta {updated}, nepavyko {failed}")
+            )
+        self.stdout.write(f"Trukmė: {time.perf_counter() - started:.1f} s")
@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from recipes.filter_index import RecipeFilterIndex
+from recipes.filtering import SLUG_FILTERS, apply_structured_filters
+from recipes.models import Cuisine, Difficulty, MealType, Recipe, RecipeCategory, Tag
+from recipes.pagination import LIST_ORDERING
+from recipes.schemas import RecipeFilters
+
+LOOKUP_COUNTS = {"tag": 40, "category": 12, "cuisine": 15, "meal_type": 6}
+LOOKUP_MODELS = {"tag": Tag, "category": RecipeCategory, "cuisine": Cuisine, "meal_type": MealType}
+
+SCENARIOS = {
+    "be filtrų": {},
+    "1 tag": {"tag": ["bench-tag-1"]},
+    "2 tag (AND)": {"tag": ["bench-tag-1", "bench-tag-2"]},
+    "tag OR": {"tag": ["bench-tag-1|bench-tag-3|bench-tag-5"]},
+    "tag NOT": {"tag": ["!bench-tag-1"]},
+    "tag+cuisine+difficulty": {
+        "tag": ["bench-tag-2"],
+        "cuisine": ["bench-cuisine-1"],
+        "difficulty": ["easy|medium"],
+    },
+}
+
+
+class _RollbackError(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Palyginti atmintyje laikomo filtrų indekso ir SQL kelio greitį su sintetiniais "
+        "receptais. Duomenys kuriami transakcijoje ir atšaukiami."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            type=int,
+            nargs="+",
+            default=[10_000, 100_000],
+            help="Sintetinių receptų kiekiai.",
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=20, help="Kiek kartų kartoti kiekvieną matavimą."
+        )
+        parser.add_argument(
+            "--offset", type=int, default=2000, help="Gilaus puslapio offset'as."
+        )
+
+    def handle(self, *args, **options):
+        for size in options["sizes"]:
+            try:
+                with transaction.atomic():
+                    self._seed(size)
+                    self._run(size, options["repeat"], options["offset"])
+                    raise _RollbackError
+            except _RollbackError:
+                pass
+
+    def _seed(self, size: int) -> None:
+        rng = random.Random(size)
+        started = time.perf_counter()
+
+        lookups: dict[str, list] = {}
+        for field, count in LOOKUP_COUNTS.items():
+            model = LOOKUP_MODELS[field]
+            slug_prefix = f"bench-{field.replace('_', '-')}"
+            model.objects.bulk_create(
+                [model(name=f"{slug_prefix} {i}", slug=f"{slug_prefix}-{i}") for i in range(count)]
+            )
+            created = model.objects.filter(slug__startswith=f"{slug_prefix}-")
+            lookups[field] = list(created.values_list("id", flat=True))
+
+        now = timezone.now()
+        difficulties = [choice for choice, _ in Difficulty.choices]
+        Recipe.objects.bulk_create(
+            [
+                Recipe(
+                    title=f"Bench {i}",
+                    slug=f"bench-{size}-{i}",
+                    preparation_time=10,
+                    cooking_time=20,
+                    difficulty=rng.choice(difficulties),
+                    published_at=(
+                        now - timedelta(minutes=rng.randint(0, 500_000))
+                        if rng.random() > 0.05
+                        else None
+                    ),
+                )
+                for i in range(size)
+            ],
+            batch_size=2000,
+        )
+        recipe_ids = list(
+            Recipe.objects.filter(slug__startswith=f"bench-{size}-").values_list("id", flat=True)
+        )
+
+        for field, relation in SLUG_FILTERS.items():
+            m2m = Recipe._meta.get_field(relation)
+            through = m2m.remote_field.through
+            source = f"{m2m.m2m_field_name()}_id"
+            target = f"{m2m.m2m_reverse_field_name()}_id"
+            per_recipe = 3 if field == "tag" else 1
+            rows = []
+            for recipe_id in recipe_ids:
+                for lookup_id in rng.sample(lookups[field], rng.randint(1, per_recipe)):
+                    rows.append(through(**{source: recipe_id, target: lookup_id}))
+            through.objects.bulk_create(rows, batch_size=5000)
+
+        self.stdout.write(
+            f"\n== {size} receptų (paruošta per {time.perf_counter() - started:.1f} s) =="
+        )
+
+    def _measure(self, repeat: int, func) -> float:
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def _run(self, size: int, repeat: int, offset: int) -> None:
+        index = RecipeFilterIndex()
+        started = time.perf_counter()
+        index.load()
+        self.stdout.write(f"Indekso užkrovimas: {(time.perf_counter() - started) * 1000:.0f} ms")
+
+        header = f"{'scenarijus':<26}{'SQL p1':>10}{'SQL gilus':>11}{'idx p1':>10}{'idx gilus':>11}"
+        self.stdout.write(header)
+        for name, values in SCENARIOS.items():
+            filters = RecipeFilters(**values)
+
+            def sql_page(page_offset: int, filters=filters) -> None:
+                qs = apply_structured_filters(Recipe.objects.all(), filters)
+                qs.order_by().values("id").count()
+                list(
+                    qs.order_by(*LIST_ORDERING).values_list("id", flat=True)[
+                        page_offset: page_offset + 20
+                    ]
+                )
+
+            def index_page(page_offset: int, filters=filters) -> None:
+                matches = index.resolve(filters)
+                len(matches)
+                index.page(matches, limit=20, offset=page_offset)
+
+            results = [
+                self._measure(repeat, lambda: sql_page(0)),
+                self._measure(repeat, lambda: sql_page(offset)),
+                self._measure(repeat, lambda: index_page(0)),
+                self._measure(repeat, lambda: index_page(offset)),
+            ]
+            self.stdout.write(
+                f"{name:<26}" + "".join(f"{value:>10.2f} " for value in results).rstrip()
+            )
+        self.stdout.write("(mediana, ms; SQL = count + puslapio ID)")
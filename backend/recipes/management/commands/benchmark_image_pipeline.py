@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import io
+import multiprocessing
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from PIL import Image
+from pilkit.utils import process_image
+
+from recipes.image_pipeline import render_variants
+from recipes.image_variants import FORMATS, SIZES, spec_field
+from recipes.models import Recipe, RecipeStep
+
+MODELS = {"recipe": Recipe, "step": RecipeStep}
+
+
+def _generators(model_name: str, formats: tuple[str, ...]) -> dict:
+    obj = MODELS[model_name]()
+    return {
+        (size, fmt): getattr(obj, spec_field(size, fmt)).generator
+        for size in SIZES
+        for fmt in formats
+    }
+
+
+def _per_spec(source: bytes, generators: dict) -> dict:
+    # Kaip `ImageSpec.generate()`: kiekvienas spec'as atskirai atidaro ir dekoduoja originalą.
+    return {
+        key: process_image(
+            Image.open(io.BytesIO(source)),
+            processors=generator.processors,
+            format=generator.format,
+            autoconvert=generator.autoconvert,
+            options=generator.options,
+        ).read()
+        for key, generator in generators.items()
+    }
+
+
+def _pipeline(source: bytes, generators: dict) -> dict:
+    return render_variants(source, generators).variants
+
+
+RUNNERS = {"per-spec": _per_spec, "pipeline": _pipeline}
+
+
+def _reset_peak_rss() -> None:
+    # Pikas (VmHWM / ru_maxrss) paveldimas per fork/exec; Linux leidžia jį nunulinti.
+    try:
+        with open("/proc/self/clear_refs", "w") as handle:
+            handle.write("5")
+    except OSError:
+        pass
+
+
+def _peak_rss_kb() -> int:
+    try:
+        with open("/proc/self/status") as handle:
+            for line in handle:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _measure(
+    mode: str, source: bytes, model_name: str, formats: tuple[str, ...], repeat: int
+) -> dict:
+    generators = _generators(model_name, formats)
+    _reset_peak_rss()
+    baseline = _peak_rss_kb()
+    cpu, wall = time.process_time(), time.perf_counter()
+    for _ in range(repeat):
+        outputs = RUNNERS[mode](source, generators)
+    cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+    peak = _peak_rss_kb() - baseline
+    sizes = {}
+    for key, data in outputs.items():
+        with Image.open(io.BytesIO(data)) as image:
+            sizes[key] = image.size
+    return {
+        "cpu": cpu / repeat,
+        "wall": wall / repeat,
+        "peak_kb": peak,
+        "bytes": sum(len(data) for data in outputs.values()),
+        "sizes": sizes,
+    }
+
+
+def _synthetic_jpeg(width: int, height: int) -> bytes:
+    red = Image.linear_gradient("L").resize((width, height))
+    green = Image.radial_gradient("L").resize((width, height))
+    blue = Image.effect_noise((width, height), 24)
+    buffer = io.BytesIO()
+    Image.merge("RGB", (red, green, blue)).save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+class Command(BaseCommand):
+    help = (
+        "Palyginti paveikslėlių variantų kodavimą: kiekvienas ImageSpecField atskirai "
+        "(8 dekodavimai) prieš vieno dekodavimo pipeline'ą (recipes.image_pipeline). "
+        "Matuojamas CPU laikas ir atminties pikas atskiruose procesuose."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path",
+            help="Originalo failas. Numatyta – sintetinis JPEG (--width × --height).",
+        )
+        parser.add_argument("--width", type=int, default=4000)
+        parser.add_argument("--height", type=int, default=3000)
+        parser.add_argument(
+            "--model",
+            choices=sorted(MODELS),
+            default="recipe",
+            help="Kurio modelio spec'us naudoti.",
+        )
+        parser.add_argument(
+            "--formats",
+            nargs="+",
+            choices=FORMATS,
+            default=list(FORMATS),
+            help="Kuriuos formatus koduoti (numatyta – visi).",
+        )
+        parser.add_argument("--repeat", type=int, default=3, help="Pakartojimų skaičius.")
+
+    def handle(self, *args, **options):
+        if options["path"]:
+            with open(options["path"], "rb") as handle:
+                source = handle.read()
+        else:
+            source = _synthetic_jpeg(options["width"], options["height"])
+        with Image.open(io.BytesIO(source)) as image:
+            self.stdout.write(
+                f"Originalas: {image.format} {image.width}×{image.height}, "
+                f"{len(source) / 1024:.0f} KB; pakartojimų: {options['repeat']}"
+            )
+
+        results = {}
+        for mode in RUNNERS:
+            # Kiekvienas režimas – naujame procese, kad atminties pikas būtų atskiras.
+            context = multiprocessing.get_context("fork")
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                results[mode] = pool.submit(
+                    _measure,
+                    mode,
+                    source,
+                    options["model"],
+                    tuple(options["formats"]),
+                    max(1, options["repeat"]),
+                ).result()
+            result = results[mode]
+            self.stdout.write(
+                f"{mode:>9}: CPU {result['cpu']:.2f} s, laikas {result['wall']:.2f} s, "
+                f"atminties pikas +{result['peak_kb'] / 1024:.0f} MB, "
+                f"variantai {result['bytes'] / 1024:.0f} KB"
+            )
+
+        before, after = results["per-spec"], results["pipeline"]
+        mismatched = [
+            f"{size}/{fmt}: {before['sizes'][key]} ≠ {after['sizes'][key]}"
+            for key in before["sizes"]
+            if before["sizes"][key] != after["sizes"][key]
+            for size, fmt in [key]
+        ]
+        for line in mismatched:
+            self.stderr.write(f"Skiriasi matmenys – {line}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"CPU {before['cpu'] / max(after['cpu'], 1e-9):.1f}× mažiau, "
+                f"atminties pikas {before['peak_kb'] / max(after['peak_kb'], 1):.1f}× mažesnis"
+            )
+        )
@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.recommendations import get_recommendation_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Perskaičiuoti rekomendacijų kaimynus iš žymių ir įvertinimų "
+        "(RECIPE_RECOMMEND_PATH). Leisti periodiškai, pvz. kas naktį."
+    )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = get_recommendation_index().rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rekomendacijos: {count} receptų kaimynai per "
+                f"{time.perf_counter() - started:.1f} s"
+            )
+        )
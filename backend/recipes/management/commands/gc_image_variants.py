@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import time
+from collections.abc import Iterator
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from recipes.image_jobs import KIND_MODELS
+from recipes.image_origin import source_version
+from recipes.image_variants import FORMATS, SIZES, spec_field
+
+ORIGIN_PREFIX = "CACHE/origin"
+
+
+def _walk(storage, prefix: str):
+    """Visi failai po `prefix` (S3 – pagal prefiksą, FS – rekursyviai)."""
+
+    prefix = prefix.rstrip("/")
+    try:
+        dirs, files = storage.listdir(prefix)
+    except FileNotFoundError:
+        return
+    for name in files:
+        yield f"{prefix}/{name}"
+    for directory in dirs:
+        yield from _walk(storage, f"{prefix}/{directory}")
+
+
+def _s3_key(storage, name: str) -> str:
+    # `S3Storage.location` – viešas raktų prefiksas (`AWS_LOCATION`).
+    location = (storage.location or "").strip("/")
+    return f"{location}/{name}" if location else name
+
+
+def _list(storage, prefix: str) -> Iterator[tuple[str, datetime, int]]:
+    """`(vardas, modifikavimo laikas, dydis)` visiems failams po `prefix`."""
+
+    bucket = getattr(storage, "bucket", None)
+    if bucket is None:
+        # Failų sistema: `stat` pigus, atskiri kreipiniai nieko nekainuoja.
+        for name in _walk(storage, prefix):
+            yield name, storage.get_modified_time(name), storage.size(name)
+        return
+    # S3: `ListObjectsV2` puslapiais po 1000 – `LastModified` ir `Size` jau sąraše,
+    # be `HEAD` kreipinio kiekvienam objektui.
+    skip = len(_s3_key(storage, ""))
+    paginator = bucket.meta.client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket.name, Prefix=_s3_key(storage, f"{prefix}/")):
+        for item in page.get("Contents", []):
+            yield item["Key"][skip:], item["LastModified"], item["Size"]
+
+
+def _delete_batch(storage, names: list[str]) -> None:
+    bucket = getattr(storage, "bucket", None)
+    if bucket is not None:
+        # S3: vienas `DeleteObjects` kreipinys iki 1000 raktų vietoj kreipinio kiekvienam failui.
+        keys = [{"Key": _s3_key(storage, name)} for name in names]
+        bucket.delete_objects(Delete={"Objects": keys, "Quiet": True})
+        return
+    for name in names:
+        storage.delete(name)
+
+
+def _mb(value: int) -> str:
+    return f"{value / 1_048_576:.1f} MB"
+
+
+class Command(BaseCommand):
+    help = (
+        "Ištrinti saugykloje likusius paveikslėlių variantus (imagekit cache ir origin "
+        "endpoint'o failus), kurių nebenaudoja joks receptas ar žingsnis; su --originals – "
+        "ir nebenaudojamus originalus. Trinama dalimis."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Tik parodyti, kiek būtų ištrinta.",
+        )
+        parser.add_argument(
+            "--originals",
+            action="store_true",
+            help="Tikrinti ir įkeltų originalų katalogus (recipes/hero/, recipes/steps/).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Kiek failų ištrinti vienu kartu (S3 – iki 1000).",
+        )
+        parser.add_argument(
+            "--min-age-hours",
+            type=float,
+            default=24,
+            help="Netrinti jaunesnių failų (dar kuriamų variantų apsauga).",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        storage = default_storage
+        live, live_origins = self._live_names()
+        self.stdout.write(f"Naudojamų failų: {len(live)}, origin katalogų: {len(live_origins)}")
+
+        cache_dir = getattr(settings, "IMAGEKIT_CACHEFILE_DIR", "CACHE/images").rstrip("/")
+        upload_dirs = [model._meta.get_field("image").upload_to for model in KIND_MODELS.values()]
+        prefixes = [f"{cache_dir}/{upload_to}" for upload_to in upload_dirs] + [ORIGIN_PREFIX]
+        if options["originals"]:
+            prefixes += upload_dirs
+
+        batch_size = min(max(1, options["batch_size"]), 1000)
+        cutoff = timezone.now() - timedelta(hours=options["min_age_hours"])
+        scanned = orphans = freed = 0
+        batch: list[str] = []
+        for prefix in prefixes:
+            for name, modified, size in _list(storage, prefix.rstrip("/")):
+                scanned += 1
+                if name in live:
+                    continue
+                if name.startswith(f"{ORIGIN_PREFIX}/"):
+                    if tuple(name.split("/")[2:5]) in live_origins:
+                        continue
+                if modified > cutoff:
+                    continue
+                orphans += 1
+                freed += size
+                if options["dry_run"]:
+                    continue
+                batch.append(name)
+                if len(batch) >= batch_size:
+                    _delete_batch(storage, batch)
+                    batch = []
+        if batch:
+            _delete_batch(storage, batch)
+
+        verb = "būtų ištrinta" if options["dry_run"] else "ištrinta"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Peržiūrėta failų: {scanned}, {verb} {orphans} ({_mb(freed)}) per "
+                f"{time.perf_counter() - started:.1f} s"
+            )
+        )
+
+    def _live_names(self) -> tuple[set[str], set[tuple[str, str, str]]]:
+        """Failai, kuriuos naudoja gyvi įrašai: originalai, jų variantai ir origin katalogai."""
+
+        live: set[str] = set()
+        origins: set[tuple[str, str, str]] = set()
+        for kind, model in KIND_MODELS.items():
+            rows = model.objects.exclude(image="").exclude(image__isnull=True)
+            for obj in rows.only("pk", "image", "image_variants").iterator(chunk_size=1000):
+                live.add(obj.image.name)
+                origins.add((str(kind), str(obj.pk), source_version(obj.image.name)))
+                # Ir manifeste įrašyti, ir dabartinio šaltinio vardai (dar negeneruoti /
+                # manifestas pasenęs) – kad nenutrintume ką tik sukurtų failų.
+                for formats in (obj.image_variants or {}).get("variants", {}).values():
+                    live.update(entry["name"] for entry in formats.values())
+                for size in SIZES:
+                    for fmt in FORMATS:
+                        live.add(getattr(obj, spec_field(size, fmt)).name)
+        return live, origins
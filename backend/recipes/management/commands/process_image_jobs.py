@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from recipes.image_jobs import claim_jobs, run_job
+
+
+def _run_in_worker(job_id: int) -> str:
+    # Worker procesas paveldi tėvo nustatymus (`fork`), bet ne DB jungtis.
+    close_old_connections()
+    return run_job(job_id)
+
+
+class Command(BaseCommand):
+    help = (
+        "Vykdyti paveikslėlių variantų (AVIF/WebP) generavimo darbus iš DB eilės. "
+        "Leisti kaip nuolatinį procesą (supervisor/systemd) arba periodiškai su --once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Kodavimo procesų skaičius (numatyta – branduolių skaičius).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Kiek darbų paimti vienu kartu (numatyta – 2 × workers).",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Apdoroti esamą eilę ir baigti.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=2.0,
+            help="Pauzė (s), kai eilė tuščia.",
+        )
+
+    def handle(self, *args, **options):
+        workers = max(1, options["workers"])
+        batch_size = max(1, options["batch_size"] or 2 * workers)
+        totals: Counter[str] = Counter()
+        started = time.perf_counter()
+
+        # Jungtys uždaromos prieš `fork`, kad vaikai nesidalintų tėvo socket'u. `fork`
+        # nurodomas aiškiai: nuo Python 3.14 numatytasis – `forkserver`, kurio vaikai
+        # neturėtų sukonfigūruoto Django.
+        connections.close_all()
+        context = multiprocessing.get_context("fork")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            while True:
+                job_ids = claim_jobs(batch_size)
+                if not job_ids:
+                    if options["once"]:
+                        break
+                    close_old_connections()
+                    time.sleep(options["sleep"])
+                    continue
+                connections.close_all()
+                for status in pool.map(_run_in_worker, job_ids):
+                    totals[status] += 1
+
+        summary = ", ".join(f"{status}: {count}" for status, count in sorted(totals.items()))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Paveikslėlių darbai apdoroti ({summary or 'eilė tuščia'}) per "
+                f"{time.perf_counter() - started:.1f} s"
+            )
+        )
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.related import get_related_index, rebuild_related
+
+
+class Command(BaseCommand):
+    help = "Perskaičiuoti panašių receptų (MinHash/LSH) indeksą (RECIPE_RELATED_PATH)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--recipe-id",
+            type=int,
+            nargs="+",
+            default=None,
+            help="Jei nurodyta, perskaičiuojami tik šie receptai (indeksas turi egzistuoti).",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        recipe_ids = options.get("recipe_id")
+        if recipe_ids:
+            if not get_related_index().update(recipe_ids):
+                self.stdout.write(
+                    self.style.WARNING("Indekso dar nėra – paleiskite be --recipe-id")
+                )
+                return
+            count = len(recipe_ids)
+        else:
+            count = rebuild_related()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Panašūs receptai: perskaičiuota {count} receptų "
+                f"per {time.perf_counter() - started:.1f} s"
+            )
+        )
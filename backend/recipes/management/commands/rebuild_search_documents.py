@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from recipes.fulltext import refresh_search_documents
+
+
+class Command(BaseCommand):
+    help = "Perskaičiuoti receptų DB paieškos laukus (search_document, search_vector)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--recipe-id",
+            type=int,
+            default=None,
+            help="Jei nurodyta, perskaičiuojamas tik vienas receptas.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Kiek receptų nuskaityti vienu kartu.",
+        )
+
+    def handle(self, *args, **options):
+        recipe_id = options.get("recipe_id")
+        recipe_ids = [recipe_id] if recipe_id else None
+        updated = refresh_search_documents(recipe_ids, chunk_size=max(1, options["chunk_size"]))
+        self.stdout.write(self.style.SUCCESS(f"Paieškos laukai: atnaujinta {updated} receptų"))
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+from recipes.ratings import reconcile_rating_stats
+
+
+class Command(BaseCommand):
+    help = "Sutikrinti ir pataisyti denormalizuotas receptų įvertinimų suvestines."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--recipe-id",
+            type=int,
+            default=None,
+            help="Jei nurodyta, tikrinamas tik vienas receptas.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Kiek receptų tikrinti vienu kartu.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Tik parodyti, kiek suvestinių nukrypę, nieko nekeičiant.",
+        )
+
+    def handle(self, *args, **options):
+        recipe_id = options.get("recipe_id")
+        chunk_size = max(1, options["chunk_size"])
+        dry_run = options["dry_run"]
+
+        if recipe_id:
+            repaired = reconcile_rating_stats([recipe_id], dry_run=dry_run)
+            self.stdout.write(self.style.SUCCESS(f"Rating stats: nukrypusių {repaired}"))
+            return
+
+        repaired = 0
+        processed = 0
+        chunk: list[int] = []
+        ids = Recipe.objects.order_by("id").values_list("id", flat=True)
+        for recipe_pk in ids.iterator(chunk_size=chunk_size):
+            chunk.append(int(recipe_pk))
+            if len(chunk) >= chunk_size:
+                repaired += reconcile_rating_stats(chunk, dry_run=dry_run)
+                processed += len(chunk)
+                chunk = []
+                self.stdout.write(f"Rating stats: {processed}...")
+        if chunk:
+            repaired += reconcile_rating_stats(chunk, dry_run=dry_run)
+            processed += len(chunk)
+
+        verb = "rasta nukrypusių" if dry_run else "pataisyta"
+        self.stdout.write(
+            self.style.SUCCESS(f"Rating stats: done ({processed} receptų, {verb} {repaired})")
+        )
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+
+from recipes.image_variants import FORMATS, SIZES, regenerate_variants
+from recipes.models import Recipe, RecipeStep
+
+MODELS = {"recipe": Recipe, "step": RecipeStep}
+
+
+def _regenerate(task: tuple) -> tuple[list[tuple[int | None, int]], str]:
+    # Worker procesas paveldi tėvo nustatymus (`fork`), bet ne DB jungtis.
+    close_old_connections()
+    model_name, pk, sizes, formats, only_missing = task
+    obj = MODELS[model_name].objects.filter(pk=pk).first()
+    if obj is None:
+        return [], ""
+    try:
+        encoded = regenerate_variants(obj, sizes=sizes, formats=formats, only_missing=only_missing)
+    except Exception as exc:  # pragma: no cover - vienas sugedęs failas nestabdo darbo
+        return [], f"{model_name} #{pk}: {type(exc).__name__}: {exc}"
+    return encoded, ""
+
+
+def _mb(value: int) -> str:
+    return f"{value / 1_048_576:.1f} MB"
+
+
+class Command(BaseCommand):
+    help = (
+        "Masiškai (per)generuoti receptų ir žingsnių paveikslėlių variantus (AVIF/WebP) "
+        "procesų pool'u, pvz. pakeitus kokybės nustatymus ar perkėlus saugyklą. "
+        "Progresas saugomas checkpoint faile – nutrūkus tęsti su --resume."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--model",
+            choices=sorted(MODELS),
+            action="append",
+            help="Apdoroti tik nurodytą modelį (galima kartoti). Numatyta – visi.",
+        )
+        parser.add_argument(
+            "--sizes",
+            nargs="+",
+            choices=SIZES,
+            default=list(SIZES),
+            help="Kuriuos dydžius generuoti (numatyta – visi).",
+        )
+        parser.add_argument(
+            "--formats",
+            nargs="+",
+            choices=FORMATS,
+            default=list(FORMATS),
+            help="Kuriuos formatus generuoti (numatyta – visi).",
+        )
+        parser.add_argument(
+            "--only-missing",
+            action="store_true",
+            help="Generuoti tik variantus, kurių nėra manifeste ar saugykloje.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Kodavimo procesų skaičius (numatyta – branduolių skaičius).",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=100,
+            help="Kiek paveikslėlių apdoroti tarp checkpoint'ų.",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            default=str(settings.BASE_DIR / "var" / "image_regeneration.json"),
+            help="Checkpoint failo kelias.",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Tęsti nuo checkpoint'e įrašyto paskutinio įrašo.",
+        )
+
+    def handle(self, *args, **options):
+        sizes = tuple(size for size in SIZES if size in options["sizes"])
+        formats = tuple(fmt for fmt in FORMATS if fmt in options["formats"])
+        only_missing = options["only_missing"]
+        signature = {"sizes": list(sizes), "formats": list(formats), "only_missing": only_missing}
+        checkpoint = Path(options["checkpoint"])
+        progress = self._load_checkpoint(checkpoint, signature) if options["resume"] else {}
+
+        workers = max(1, options["workers"])
+        chunk_size = max(1, options["chunk_size"])
+        images = variants = written = saved = failed = 0
+        started = time.perf_counter()
+
+        # Jungtys uždaromos prieš `fork`, kad vaikai nesidalintų tėvo socket'u. `fork`
+        # nurodomas aiškiai: nuo Python 3.14 numatytasis – `forkserver`, kurio vaikai
+        # neturėtų sukonfigūruoto Django.
+        connections.close_all()
+        context = multiprocessing.get_context("fork")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            for name in options["model"] or sorted(MODELS):
+                rows = (
+                    MODELS[name]
+                    .objects.exclude(image="")
+                    .exclude(image__isnull=True)
+                    .order_by("pk")
+                )
+                last_pk = progress.get(name, 0)
+                model_images = 0
+                while True:
+                    pks = list(
+                        rows.filter(pk__gt=last_pk).values_list("pk", flat=True)[:chunk_size]
+                    )
+                    if not pks:
+                        break
+                    connections.close_all()
+                    tasks = [(name, pk, sizes, formats, only_missing) for pk in pks]
+                    for encoded, error in pool.map(_regenerate, tasks):
+                        if error:
+                            failed += 1
+                            self.stderr.write(error)
+                            continue
+                        variants += len(encoded)
+                        written += sum(new for _, new in encoded)
+                        saved += sum(old - new for old, new in encoded if old is not None)
+                    images += len(pks)
+                    model_images += len(pks)
+                    last_pk = progress[name] = pks[-1]
+                    self._save_checkpoint(checkpoint, signature, progress)
+                self.stdout.write(f"{name}: apdorota {model_images} paveikslėlių")
+
+        checkpoint.unlink(missing_ok=True)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Paveikslėliai: {images} ({images / elapsed if elapsed else 0:.1f}/s), "
+                f"variantų: {variants}, įrašyta {_mb(written)}, "
+                f"sutaupyta {_mb(saved)} (lyginant su ankstesniais variantais), "
+                f"nepavyko {failed}, per {elapsed:.1f} s"
+            )
+        )
+
+    def _load_checkpoint(self, path: Path, signature: dict) -> dict[str, int]:
+        if not path.exists():
+            return {}
+        data = json.loads(path.read_text())
+        if data.get("options") != signature:
+            raise CommandError(
+                f"Checkpoint'as {path} sukurtas su kitais parametrais ({data.get('options')}); "
+                "paleiskite be --resume arba su tais pačiais parametrais."
+            )
+        progress = {name: int(pk) for name, pk in data.get("progress", {}).items()}
+        self.stdout.write(f"Tęsiama nuo checkpoint'o: {progress}")
+        return progress
+
+    def _save_checkpoint(self, path: Path, signature: dict, progress: dict[str, int]) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"options": signature, "progress": progress}))
+        # Atominis pakeitimas – nutrūkus rašymui lieka ankstesnis checkpoint'as.
+        os.replace(tmp, path)
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipes.search_backend import bulk_index, get_search_backend
+
+
+class Command(BaseCommand):
+    help = (
+        "Perindeksuoti receptus nustatymuose parinktame paieškos backend'e "
+        "(RECIPE_SEARCH_BACKEND)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--recipe-id",
+            type=int,
+            nargs="+",
+            default=None,
+            help="Jei nurodyta, perindeksuojami tik šie receptai.",
+        )
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        if not backend.is_enabled():
+            self.stdout.write(self.style.WARNING("Paieškos backend'as išjungtas – nieko nedaryta"))
+            return
+
+        started = time.perf_counter()
+        indexed = bulk_index(options.get("recipe_id"))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{settings.RECIPE_SEARCH_BACKEND}: suindeksuota {indexed} receptų "
+                f"per {time.perf_counter() - started:.1f} s"
+            )
+        )
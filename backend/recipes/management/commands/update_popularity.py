@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.popularity import update_scores
+
+
+class Command(BaseCommand):
+    help = (
+        "Atnaujinti receptų trending/popular įverčius iš naujų žymių, įvertinimų ir "
+        "patvirtintų komentarų. Leisti periodiškai (pvz., kas 10 min.)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Perskaičiuoti iš visos istorijos (pvz., pakeitus pusėjimo laiką).",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        processed = update_scores(rebuild=options["rebuild"])
+        summary = ", ".join(f"{source}: {count}" for source, count in processed.items())
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Populiarumas atnaujintas ({summary}) per {time.perf_counter() - started:.1f} s"
+            )
+        )
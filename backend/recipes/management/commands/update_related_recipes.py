@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from recipes.related import process_related_updates
+
+
+class Command(BaseCommand):
+    help = (
+        "Pritaikyti panašių receptų indekso pakeitimus iš DB eilės partijomis. "
+        "Leisti kaip nuolatinį procesą (supervisor/systemd) arba periodiškai su --once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Kiek eilės įrašų pritaikyti vienu indekso perrašymu.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Apdoroti esamą eilę ir baigti.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=10.0,
+            help="Pauzė (s), kai eilė tuščia.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options["batch_size"])
+        processed = 0
+        started = time.perf_counter()
+
+        while True:
+            count = process_related_updates(batch_size)
+            if count is None:
+                self.stdout.write(
+                    self.style.WARNING("Indekso dar nėra – paleiskite `rebuild_related_recipes`")
+                )
+                return
+            processed += count
+            if count:
+                continue
+            if options["once"]:
+                break
+            close_old_connections()
+            time.sleep(options["sleep"])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Panašūs receptai: pritaikyta {processed} pakeitimų "
+                f"per {time.perf_counter() - started:.1f} s"
+            )
+        )
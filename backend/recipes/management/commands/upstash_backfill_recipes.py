@@ -3,6 +3,7 @@ from __future__ import annotations
 from django.core.management.base import BaseCommand
 
 from recipes.models import Recipe
+from recipes.search_backend import bump_search_generation
 from recipes.upstash_search import upsert_recipe
 
 
@@ -30,6 +31,7 @@ class Command(BaseCommand):
         if recipe_id:
             self.stdout.write(f"Upstash backfill: recipe_id={recipe_id}")
             upsert_recipe(recipe_id)
+            bump_search_generation()
             self.stdout.write(self.style.SUCCESS("OK"))
             return
 
@@ -51,5 +53,6 @@ class Command(BaseCommand):
             if processed % 100 == 0:
                 self.stdout.write(f"Upstash backfill: {processed}...")
 
+        bump_search_generation()
         self.stdout.write(self.style.SUCCESS(
             f"Upstash backfill: done ({processed})"))
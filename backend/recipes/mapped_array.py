@@ -0,0 +1,76 @@
+"""`numpy` masyvo failas, kurį dalijasi visi worker'iai.
+
+Principai:
+- Masyvas saugomas `.npy` formatu ir skaitomas `np.load(..., mmap_mode="r")`:
+  duomenys nekopijuojami į proceso atmintį, OS puslapių talpykla bendra.
+- Rašoma į laikiną failą tame pačiame kataloge ir pakeičiama `os.replace`,
+  todėl skaitytojas visada mato pilną senos arba naujos versijos failą.
+  Skaitytojai naują versiją pastebi pagal `inode`/`mtime`.
+- Rašytojai (signalai, komandos, keli procesai) serializuojami failo užraktu.
+"""
+
+from __future__ import annotations
+
+import fcntl
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+
+class MappedArrayFile:
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._data: np.ndarray | None = None
+        self._identity: tuple[int, int] | None = None
+
+    @contextmanager
+    def write_lock(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path.with_suffix(".lock"), "a") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def write(self, data: np.ndarray) -> None:
+        """Atomiškai pakeičia failą; kviesti laikant `write_lock()`."""
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=self.path.parent, suffix=".npy.tmp")
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                np.save(handle, data, allow_pickle=False)
+                handle.flush()
+                os.fsync(handle.fileno())
+            os.replace(tmp_name, self.path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+
+    def load(self) -> np.ndarray | None:
+        """Keičiama kopija rašytojui; `None` – failo dar nėra."""
+
+        try:
+            return np.load(self.path, allow_pickle=False)
+        except FileNotFoundError:
+            return None
+
+    def current(self) -> np.ndarray | None:
+        """`mmap`'intas masyvas skaitymui; atnaujinamas, jei failas pakeistas."""
+
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        identity = (stat.st_ino, stat.st_mtime_ns)
+        with self._lock:
+            if self._data is None or self._identity != identity:
+                self._data = np.load(self.path, mmap_mode="r", allow_pickle=False)
+                self._identity = identity
+            return self._data
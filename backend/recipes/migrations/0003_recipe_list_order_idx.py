@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0002_recipe_description_html_recipe_meta_description_and_more"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["-published_at", "-updated_at", "-id"], name="recipe_list_order_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def populate_rating_stats(apps, schema_editor):  # pragma: no cover - duomenų migracija
+    Rating = apps.get_model("recipes", "Rating")
+    RecipeRatingStats = apps.get_model("recipes", "RecipeRatingStats")
+    histogram = {f"rating_{value}": Count("id", filter=Q(value=value)) for value in range(1, 6)}
+    rows = (
+        Rating.objects.values("recipe_id")
+        .order_by("recipe_id")
+        .annotate(rating_sum=Sum("value"), rating_count=Count("id"), **histogram)
+    )
+    RecipeRatingStats.objects.bulk_create(
+        [RecipeRatingStats(**row) for row in rows.iterator()], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0003_recipe_list_order_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RecipeRatingStats",
+            fields=[
+                (
+                    "recipe",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="rating_stats",
+                        serialize=False,
+                        to="recipes.recipe",
+                    ),
+                ),
+                ("rating_sum", models.PositiveIntegerField(default=0)),
+                ("rating_count", models.PositiveIntegerField(default=0)),
+                ("rating_1", models.PositiveIntegerField(default=0)),
+                ("rating_2", models.PositiveIntegerField(default=0)),
+                ("rating_3", models.PositiveIntegerField(default=0)),
+                ("rating_4", models.PositiveIntegerField(default=0)),
+                ("rating_5", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "verbose_name": "Recepto įvertinimų suvestinė",
+                "verbose_name_plural": "Receptų įvertinimų suvestinės",
+            },
+        ),
+        migrations.RunPython(populate_rating_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:18
+
+import django.contrib.postgres.search
+import unicodedata
+
+from django.db import migrations, models
+from django.utils.html import strip_tags
+
+import recipes.indexes
+
+
+def fold_text(value):
+    # `recipes.text.fold_text` kopija: migracija neturi priklausyti nuo kintančio app kodo.
+    decomposed = unicodedata.normalize("NFKD", value or "")
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(stripped.casefold().split())
+
+
+def populate_search_documents(apps, schema_editor):  # pragma: no cover - duomenų migracija
+    Recipe = apps.get_model("recipes", "Recipe")
+    use_vector = schema_editor.connection.vendor == "postgresql"
+    table = schema_editor.quote_name(Recipe._meta.db_table)
+    qs = Recipe.objects.order_by("id").prefetch_related("recipe_ingredients__ingredient", "tags")
+    with schema_editor.connection.cursor() as cursor:
+        for recipe in qs.iterator(chunk_size=500):
+            plain_description = recipe.description or strip_tags(recipe.description_html or "")
+            title = fold_text(recipe.title)
+            body = fold_text(" ".join([
+                plain_description,
+                *(ri.ingredient.name for ri in recipe.recipe_ingredients.all()),
+                *(tag.name for tag in recipe.tags.all()),
+            ]))
+            document = f"{title} {body}".strip()
+            if use_vector:
+                cursor.execute(
+                    f"UPDATE {table} SET search_document = %s, search_vector = "
+                    "setweight(to_tsvector('simple', %s), 'A') || "
+                    "setweight(to_tsvector('simple', %s), 'B') WHERE id = %s",
+                    [document, title, body, recipe.id],
+                )
+            else:
+                Recipe.objects.filter(id=recipe.id).update(search_document=document)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0004_reciperatingstats"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="search_document",
+            field=models.TextField(blank=True, default="", editable=False),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                blank=True, editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(populate_search_documents, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=recipes.indexes.SearchVectorIndex(
+                fields=["search_vector"], name="recipe_search_vector_gin"
+            ),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0005_recipe_search_document"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PopularityCheckpoint",
+            fields=[
+                ("source", models.CharField(max_length=20, primary_key=True, serialize=False)),
+                ("last_id", models.BigIntegerField(default=0)),
+                ("pending_ids", models.JSONField(blank=True, default=list)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Populiarumo žyma",
+                "verbose_name_plural": "Populiarumo žymos",
+            },
+        ),
+        migrations.CreateModel(
+            name="RecipePopularity",
+            fields=[
+                (
+                    "recipe",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="popularity",
+                        serialize=False,
+                        to="recipes.recipe",
+                    ),
+                ),
+                ("trending_score", models.FloatField(blank=True, null=True)),
+                ("popular_score", models.PositiveIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Recepto populiarumas",
+                "verbose_name_plural": "Receptų populiarumas",
+                "indexes": [
+                    models.Index(fields=["-trending_score", "-recipe"], name="recipe_trending_idx"),
+                    models.Index(fields=["-popular_score", "-recipe"], name="recipe_popular_idx"),
+                ],
+            },
+        ),
+    ]
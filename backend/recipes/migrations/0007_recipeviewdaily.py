@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0006_recipepopularity"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RecipeViewDaily",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("views", models.PositiveBigIntegerField(default=0)),
+                (
+                    "recipe",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_views",
+                        to="recipes.recipe",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Recepto peržiūros per dieną",
+                "verbose_name_plural": "Receptų peržiūros per dieną",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("recipe", "day"), name="recipe_view_daily_unique"
+                    )
+                ],
+            },
+        ),
+    ]
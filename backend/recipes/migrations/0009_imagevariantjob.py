@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:45
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0008_image_variants"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImageVariantJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("recipe", "Receptas"), ("step", "Žingsnis")], max_length=20
+                    ),
+                ),
+                ("object_id", models.PositiveBigIntegerField()),
+                ("source", models.CharField(max_length=255)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Laukia"),
+                            ("running", "Vykdoma"),
+                            ("done", "Atlikta"),
+                            ("failed", "Nepavyko"),
+                        ],
+                        default="pending",
+                        max_length=20,
+                    ),
+                ),
+                ("attempts", models.PositiveSmallIntegerField(default=0)),
+                ("run_after", models.DateTimeField(default=django.utils.timezone.now)),
+                ("locked_at", models.DateTimeField(blank=True, null=True)),
+                ("last_error", models.TextField(blank=True)),
+            ],
+            options={
+                "verbose_name": "Paveikslėlio variantų darbas",
+                "verbose_name_plural": "Paveikslėlių variantų darbai",
+                "indexes": [
+                    models.Index(fields=["status", "run_after"], name="image_variant_job_queue_idx")
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("kind", "object_id", "source"), name="image_variant_job_unique"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0009_imagevariantjob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RelatedRecipeUpdate",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("recipe_id", models.PositiveBigIntegerField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "verbose_name": "Panašių receptų indekso pakeitimas",
+                "verbose_name_plural": "Panašių receptų indekso pakeitimai",
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:38
+
+from django.db import migrations, models
+
+
+def fill_popularity_rows(apps, schema_editor):  # pragma: no cover - duomenų migracija
+    Recipe = apps.get_model("recipes", "Recipe")
+    RecipePopularity = apps.get_model("recipes", "RecipePopularity")
+    # Eilutės be įvykių: `trending_score` NULL -> 0 (tada ir `popular_score` = 0).
+    RecipePopularity.objects.filter(trending_score__isnull=True).update(trending_score=0.0)
+    missing = Recipe.objects.filter(popularity__isnull=True).values_list("id", flat=True)
+    RecipePopularity.objects.bulk_create(
+        [RecipePopularity(recipe_id=recipe_id, trending_score=0.0) for recipe_id in missing],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0010_relatedrecipeupdate"),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_popularity_rows, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="recipepopularity",
+            name="trending_score",
+            field=models.FloatField(default=0.0),
+        ),
+    ]
@@ -3,12 +3,16 @@
 from uuid import uuid4
 
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.utils import timezone
 from django.utils.text import slugify
 from imagekit.models import ImageSpecField
 from imagekit.processors import ResizeToFill, ResizeToFit
 
+from .indexes import SearchVectorIndex
+
 
 def _generate_unique_slug(instance: models.Model, value: str, *, field_name: str = "slug") -> str:
     """Sugeneruoja unikalų slug lauką, kad vengti dublikatų."""
@@ -35,6 +39,39 @@ class TimeStampedModel(models.Model):
         abstract = True
 
 
+class TrackedImageMixin:
+    """Prisimena iš DB įkelto `image` vardą.
+
+    Variantai planuojami tik pasikeitus šaltiniui – kitų laukų redagavimas
+    nekelia jokių saugyklos ar eilės kreipinių.
+    """
+
+    _UNKNOWN = object()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Atidėtas (`only()`/`defer()`) laukas – būsena nežinoma.
+        instance._loaded_image = instance.__dict__.get("image", cls._UNKNOWN)
+        return instance
+
+    def image_changed(self) -> bool:
+        loaded = getattr(self, "_loaded_image", None)
+        if loaded is self._UNKNOWN:
+            return True
+        current = self.image.name if self.image else ""
+        return current != (loaded or "")
+
+    def _generate_image_variants(self) -> None:
+        if not self.image_changed():
+            return
+        # Kodavimas – `process_image_jobs` worker'yje (`recipes.image_jobs`).
+        from .image_jobs import schedule_variants
+
+        schedule_variants(self)
+        self._loaded_image = self.image.name if self.image else ""
+
+
 class NamedSluggedModel(TimeStampedModel):
     """Pagalbinė bazė modeliams su `name` ir `slug`."""
 
@@ -151,7 +188,7 @@ class Tag(NamedSluggedModel):
     pass
 
 
-class Recipe(TimeStampedModel):
+class Recipe(TrackedImageMixin, TimeStampedModel):
     """Pagrindinis recepto objektas."""
 
     title = models.CharField(max_length=255)
@@ -214,8 +251,13 @@ class Recipe(TimeStampedModel):
         format="WEBP",
         options={"quality": 85},
     )
+    # Sugeneruotų variantų URL / matmenys / dydžiai (`recipes.image_variants`).
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     video_url = models.URLField(blank=True)
     published_at = models.DateTimeField(null=True, blank=True)
+    # Paieškos laukai palaikomi `recipes.fulltext` (signalais), ne ranka.
+    search_document = models.TextField(blank=True, default="", editable=False)
+    search_vector = SearchVectorField(null=True, blank=True, editable=False)
 
     categories = models.ManyToManyField(
         RecipeCategory, blank=True, related_name="recipes")
@@ -234,6 +276,15 @@ class Recipe(TimeStampedModel):
 
     class Meta:
         ordering = ["-published_at", "title"]
+        indexes = [
+            # Atitinka `list_recipes` rikiavimą – keyset puslapiavimas eina indeksu.
+            models.Index(
+                fields=["-published_at", "-updated_at", "-id"],
+                name="recipe_list_order_idx",
+            ),
+            # `recipes.fulltext` paieška PostgreSQL'e (GIN; SQLite – paprastas indeksas).
+            SearchVectorIndex(fields=["search_vector"], name="recipe_search_vector_gin"),
+        ]
 
     IMAGE_VARIANT_FIELDS = [
         "image_thumb_avif",
@@ -257,14 +308,6 @@ class Recipe(TimeStampedModel):
     def __str__(self) -> str:  # pragma: no cover
         return self.title
 
-    def _generate_image_variants(self) -> None:
-        if not self.image:
-            return
-        for field_name in self.IMAGE_VARIANT_FIELDS:
-            spec = getattr(self, field_name, None)
-            if hasattr(spec, "generate"):
-                spec.generate()
-
 
 class RecipeIngredient(TimeStampedModel):
     """Sujungimas tarp recepto ir ingrediento su kiekiu."""
@@ -286,7 +329,7 @@ class RecipeIngredient(TimeStampedModel):
         return f"{self.recipe}: {self.amount} {self.unit.short_name} {self.ingredient.name}"
 
 
-class RecipeStep(TimeStampedModel):
+class RecipeStep(TrackedImageMixin, TimeStampedModel):
     """Chronologinis žingsnis recepto ruošimui."""
 
     recipe = models.ForeignKey(
@@ -345,6 +388,8 @@ class RecipeStep(TimeStampedModel):
         format="WEBP",
         options={"quality": 85},
     )
+    # Sugeneruotų variantų URL / matmenys / dydžiai (`recipes.image_variants`).
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     duration = models.PositiveIntegerField(
         null=True, blank=True, help_text="Trukmė minutėmis")
     video_url = models.URLField(blank=True)
@@ -371,14 +416,6 @@ class RecipeStep(TimeStampedModel):
         super().save(*args, **kwargs)
         self._generate_image_variants()
 
-    def _generate_image_variants(self) -> None:
-        if not self.image:
-            return
-        for field_name in self.IMAGE_VARIANT_FIELDS:
-            spec = getattr(self, field_name, None)
-            if hasattr(spec, "generate"):
-                spec.generate()
-
 
 class Bookmark(TimeStampedModel):
     """Naudotojo išsaugotas receptas."""
@@ -409,6 +446,52 @@ class Rating(TimeStampedModel):
         unique_together = ("user", "recipe")
 
 
+class RecipeRatingStats(models.Model):
+    """Denormalizuota recepto įvertinimų suvestinė.
+
+    Palaikoma rašant (`recipes.ratings`), todėl skaitymo užklausos nebeturi
+    jungti `Rating` lentelės. Nukrypimus sutvarko `reconcile_rating_stats`.
+    """
+
+    recipe = models.OneToOneField(
+        Recipe,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name="rating_stats",
+    )
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
+
+    HISTOGRAM_FIELDS = {
+        1: "rating_1",
+        2: "rating_2",
+        3: "rating_3",
+        4: "rating_4",
+        5: "rating_5",
+    }
+
+    class Meta:
+        verbose_name = "Recepto įvertinimų suvestinė"
+        verbose_name_plural = "Receptų įvertinimų suvestinės"
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"{self.recipe_id}: {self.rating_count} įvertinimų"
+
+    @property
+    def rating_average(self) -> float | None:
+        if not self.rating_count:
+            return None
+        return self.rating_sum / self.rating_count
+
+    def histogram(self) -> dict[int, int]:
+        return {value: getattr(self, field) for value, field in self.HISTOGRAM_FIELDS.items()}
+
+
 class Comment(TimeStampedModel):
     """Naudotojo komentaras prie recepto."""
 
@@ -424,3 +507,126 @@ class Comment(TimeStampedModel):
 
     def __str__(self) -> str:  # pragma: no cover
         return f"Komentaras #{self.pk}"
+
+
+class RecipePopularity(models.Model):
+    """Recepto „Populiaru dabar“ ir „Populiariausi“ įverčiai.
+
+    Perskaičiuojami periodiškai tik iš naujų įvykių (`recipes.popularity`,
+    `update_popularity` komanda). `trending_score` laikomas logaritmine
+    skale nuo fiksuotos epochos, todėl seni įverčiai nepernaudojami – nauji
+    įvykiai tik pridedami, o rikiavimas atitinka eksponentiškai blėstantį
+    įvertį. Eilutė yra kiekvienam receptui (sukuriama kartu su receptu), todėl
+    `sort=trending|popular` eina vien šios lentelės indeksais.
+    """
+
+    recipe = models.OneToOneField(
+        Recipe,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name="popularity",
+    )
+    # 0 – įvykių dar nebuvo (tuomet ir `popular_score` lygus 0).
+    trending_score = models.FloatField(default=0.0)
+    popular_score = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Recepto populiarumas"
+        verbose_name_plural = "Receptų populiarumas"
+        indexes = [
+            models.Index(fields=["-trending_score", "-recipe"], name="recipe_trending_idx"),
+            models.Index(fields=["-popular_score", "-recipe"], name="recipe_popular_idx"),
+        ]
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"{self.recipe_id}: {self.popular_score}"
+
+
+class PopularityCheckpoint(models.Model):
+    """Iki kur jau apdoroti kiekvieno šaltinio (žymės, įvertinimai, komentarai) įvykiai."""
+
+    source = models.CharField(max_length=20, primary_key=True)
+    last_id = models.BigIntegerField(default=0)
+    # Dar nepatvirtinti komentarai (`id <= last_id`) – patikrinami kitą kartą.
+    pending_ids = models.JSONField(default=list, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Populiarumo žyma"
+        verbose_name_plural = "Populiarumo žymos"
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"{self.source}: {self.last_id}"
+
+
+class RecipeViewDaily(models.Model):
+    """Recepto peržiūrų skaičius per dieną (kaupiamas `recipes.view_counter`)."""
+
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name="daily_views")
+    day = models.DateField()
+    views = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Recepto peržiūros per dieną"
+        verbose_name_plural = "Receptų peržiūros per dieną"
+        constraints = [
+            models.UniqueConstraint(fields=["recipe", "day"], name="recipe_view_daily_unique"),
+        ]
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"{self.recipe_id} {self.day}: {self.views}"
+
+
+class ImageVariantJob(TimeStampedModel):
+    """Paveikslėlio variantų generavimo darbas (vykdo `process_image_jobs`)."""
+
+    class Kind(models.TextChoices):
+        RECIPE = "recipe", "Receptas"
+        STEP = "step", "Žingsnis"
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "Laukia"
+        RUNNING = "running", "Vykdoma"
+        DONE = "done", "Atlikta"
+        FAILED = "failed", "Nepavyko"
+
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    object_id = models.PositiveBigIntegerField()
+    # Paveikslėlio vardas įtraukimo metu – pakeitus paveikslėlį kuriamas naujas darbas.
+    source = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        verbose_name = "Paveikslėlio variantų darbas"
+        verbose_name_plural = "Paveikslėlių variantų darbai"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["kind", "object_id", "source"], name="image_variant_job_unique"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["status", "run_after"], name="image_variant_job_queue_idx"),
+        ]
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"{self.kind} #{self.object_id}: {self.status}"
+
+
+class RelatedRecipeUpdate(models.Model):
+    """Panašių receptų indekso laukiantis pakeitimas (apdoroja `update_related_recipes`)."""
+
+    # Ne ForeignKey – ištrinto recepto pakeitimas irgi turi pasiekti indeksą.
+    recipe_id = models.PositiveBigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Panašių receptų indekso pakeitimas"
+        verbose_name_plural = "Panašių receptų indekso pakeitimai"
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"{self.recipe_id} ({self.created_at:%Y-%m-%d %H:%M})"
@@ -0,0 +1,170 @@
+"""Keyset (cursor) puslapiavimas receptų sąrašams.
+
+Cursor'is yra nepermatomas (base64url JSON) ir turi vieną iš dviejų formų:
+- `{"k": [published_at, updated_at, id]}` – DB keliui, pagal rikiavimą
+  `-published_at, -updated_at, -id`. Kitas puslapis imamas per `WHERE`
+  sąlygą, todėl 500-as puslapis kainuoja tiek pat, kiek pirmas.
+- `{"r": pozicija}` – rangu surikiuotam ID sąrašui (pvz., Upstash rezultatams).
+- `{"s": [rikiavimas, įvertis, id]}` – `sort=trending|popular` keliui, pagal
+  `-įvertis, -recipe_id` (`RecipePopularity` indeksai).
+
+Frontendas cursor'io turinio neinterpretuoja – tiesiog grąžina `next_cursor`.
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from datetime import datetime
+
+from django.db import connection
+from django.db.models import Q
+
+LIST_ORDERING = ("-published_at", "-updated_at", "-id")
+# `sort` reikšmė -> `RecipePopularity` laukas per `Recipe.popularity`.
+SCORE_FIELDS = {"trending": "popularity__trending_score", "popular": "popularity__popular_score"}
+# Antras rikiavimo raktas – tos pačios lentelės stulpelis, kad tiktų indeksas.
+SCORE_TIEBREAK = "popularity__recipe_id"
+
+
+class InvalidCursorError(ValueError):
+    """Išmetama, kai cursor'io nepavyksta iškoduoti."""
+
+
+@dataclass(frozen=True)
+class RecipeCursor:
+    """Iškoduotas cursor'is: arba rikiavimo raktas, arba pozicija range."""
+
+    published_at: datetime | None = None
+    updated_at: datetime | None = None
+    id: int | None = None
+    position: int | None = None
+    sort: str | None = None
+    score: float | None = None
+
+    @property
+    def is_ranked(self) -> bool:
+        return self.position is not None
+
+    @property
+    def is_score(self) -> bool:
+        return self.sort is not None
+
+
+def _encode(payload: dict) -> str:
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def encode_keyset_cursor(recipe) -> str:
+    """Cursor'is, rodantis į įrašą po `recipe` pagal sąrašo rikiavimą."""
+
+    published_at = recipe.published_at.isoformat() if recipe.published_at else None
+    return _encode({"k": [published_at, recipe.updated_at.isoformat(), recipe.id]})
+
+
+def encode_ranked_cursor(position: int) -> str:
+    """Cursor'is, rodantis į poziciją rangu surikiuotame ID sąraše."""
+
+    return _encode({"r": position})
+
+
+def encode_score_cursor(sort: str, score: float, recipe_id: int) -> str:
+    """Cursor'is, rodantis į įrašą po (`score`, `recipe_id`) pagal `sort`."""
+
+    return _encode({"s": [sort, score, recipe_id]})
+
+
+def decode_cursor(value: str) -> RecipeCursor:
+    padded = value + "=" * (-len(value) % 4)
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError) as exc:
+        raise InvalidCursorError(value) from exc
+
+    if not isinstance(payload, dict):
+        raise InvalidCursorError(value)
+
+    if "r" in payload:
+        position = payload["r"]
+        if not isinstance(position, int) or position < 0:
+            raise InvalidCursorError(value)
+        return RecipeCursor(position=position)
+
+    if "s" in payload:
+        key = payload["s"]
+        if not isinstance(key, list) or len(key) != 3:
+            raise InvalidCursorError(value)
+        sort, score, recipe_id = key
+        if (
+            sort not in SCORE_FIELDS
+            or not isinstance(score, (int, float))
+            or not isinstance(recipe_id, int)
+        ):
+            raise InvalidCursorError(value)
+        return RecipeCursor(sort=sort, score=score, id=recipe_id)
+
+    key = payload.get("k")
+    if not isinstance(key, list) or len(key) != 3:
+        raise InvalidCursorError(value)
+    published_raw, updated_raw, recipe_id = key
+    try:
+        published_at = datetime.fromisoformat(published_raw) if published_raw else None
+        updated_at = datetime.fromisoformat(updated_raw)
+    except (TypeError, ValueError) as exc:
+        raise InvalidCursorError(value) from exc
+    if not isinstance(recipe_id, int):
+        raise InvalidCursorError(value)
+    return RecipeCursor(published_at=published_at, updated_at=updated_at, id=recipe_id)
+
+
+def keyset_filter(cursor: RecipeCursor) -> Q:
+    """`WHERE` sąlyga įrašams, einantiems po cursor'io pagal `LIST_ORDERING`.
+
+    `published_at` gali būti NULL. PostgreSQL NULL laiko didžiausia reikšme
+    (DESC rikiuojant jie eina pirmi), SQLite – mažiausia (eina paskutiniai),
+    todėl sąlyga priklauso nuo `nulls_order_largest`.
+
+    Prie kiekvieno OR sąrašo pridedamas ribojantis konjunktas (`<=`), kad
+    planuotojas galėtų naudoti indekso intervalą, o ne filtruoti visą lentelę.
+    """
+
+    nulls_first = connection.features.nulls_order_largest
+    same_group_tail = Q(updated_at__lte=cursor.updated_at) & (
+        Q(updated_at__lt=cursor.updated_at) | Q(updated_at=cursor.updated_at, id__lt=cursor.id)
+    )
+
+    if cursor.published_at is None:
+        condition = Q(published_at__isnull=True) & same_group_tail
+        if nulls_first:
+            condition |= Q(published_at__isnull=False)
+        return condition
+
+    condition = Q(published_at__lte=cursor.published_at) & (
+        Q(published_at__lt=cursor.published_at)
+        | (Q(published_at=cursor.published_at) & same_group_tail)
+    )
+    if not nulls_first:
+        condition |= Q(published_at__isnull=True)
+    return condition
+
+
+def score_ordering(sort: str) -> tuple:
+    """Rikiavimas `sort=trending|popular` – atitinka `RecipePopularity` indeksus."""
+
+    return (f"-{SCORE_FIELDS[sort]}", f"-{SCORE_TIEBREAK}")
+
+
+def score_keyset_filter(cursor: RecipeCursor) -> Q:
+    """`WHERE` sąlyga įrašams, einantiems po cursor'io pagal `score_ordering`.
+
+    Kaip ir `keyset_filter`, su ribojančiu `<=` konjunktu indekso intervalui.
+    """
+
+    field = SCORE_FIELDS[cursor.sort]
+    return Q(**{f"{field}__lte": cursor.score}) & (
+        Q(**{f"{field}__lt": cursor.score})
+        | Q(**{field: cursor.score, f"{SCORE_TIEBREAK}__lt": cursor.id})
+    )
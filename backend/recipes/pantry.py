@@ -0,0 +1,287 @@
+"""„Ką galiu pagaminti?“ – receptų paieška pagal turimus ingredientus.
+
+Principai:
+- Atmintyje laikomas atvirkštinis indeksas `ingredientas -> recepto eilučių
+  masyvas` (`numpy`) ir kiekvieno recepto skirtingų ingredientų skaičius.
+  Tik publikuoti receptai.
+- Užklausa – vienas vektorinis žingsnis: turimų ingredientų posting'ai
+  sujungiami ir suskaičiuojami `np.bincount`, iš to – kiek ingredientų
+  sutampa, kiek trūksta ir padengimas. Neįtraukiami ingredientai (alergijos)
+  atmeta receptus tuo pačiu būdu, struktūriniai filtrai – per
+  `recipes.filter_index` bitmap'ą.
+- Eilutės receptams priskiriamos visam proceso gyvavimui (ištrinto recepto
+  eilutė tik deaktyvuojama), todėl inkrementinis atnaujinimas keičia tik
+  paliestų ingredientų masyvus.
+- Indeksas atnaujinamas iš `recipes.signals` per atskirą `listing_cache`
+  kanalą, kaip ir filtrų indeksas.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+import numpy as np
+from django.conf import settings
+
+from . import listing_cache
+from .models import RecipeIngredient
+
+logger = logging.getLogger(__name__)
+
+PANTRY_CHANNEL = "pantry"
+RANKINGS = ("coverage", "missing")
+
+
+@dataclass(frozen=True)
+class PantryMatch:
+    recipe_id: int
+    matched: int
+    missing: int
+
+    @property
+    def coverage(self) -> float:
+        total = self.matched + self.missing
+        return self.matched / total if total else 0.0
+
+
+@dataclass(frozen=True)
+class PantryResult:
+    """Surikiuoti atitikmenys masyvais; `PantryMatch` kuriami tik puslapiui."""
+
+    recipe_ids: np.ndarray
+    matched: np.ndarray
+    missing: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.recipe_ids)
+
+    def page(self, offset: int, limit: int) -> list[PantryMatch]:
+        window = slice(offset, offset + limit)
+        return [
+            PantryMatch(int(recipe_id), int(matched), int(missing))
+            for recipe_id, matched, missing in zip(
+                self.recipe_ids[window], self.matched[window], self.missing[window], strict=True
+            )
+        ]
+
+
+class PantryIndex:
+    """Vieno proceso ingredientų indeksas. Visi metodai saugūs gijoms."""
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._generation: int | None = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self._count = 0
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._sizes = np.zeros(0, dtype=np.int32)
+        self._row_of: dict[int, int] = {}
+        self._ingredients_of: dict[int, tuple[int, ...]] = {}
+        self._postings: dict[int, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self._ingredients_of)
+
+    # -- užkrovimas ----------------------------------------------------------
+
+    def _fetch(self, recipe_ids: Iterable[int] | None = None) -> dict[int, tuple[int, ...]]:
+        rows = RecipeIngredient.objects.filter(recipe__published_at__isnull=False).order_by()
+        if recipe_ids is not None:
+            rows = rows.filter(recipe_id__in=list(recipe_ids))
+        ingredients: dict[int, set[int]] = {}
+        for recipe_id, ingredient_id in rows.values_list("recipe_id", "ingredient_id").iterator(
+            chunk_size=5000
+        ):
+            ingredients.setdefault(recipe_id, set()).add(ingredient_id)
+        return {recipe_id: tuple(sorted(ids)) for recipe_id, ids in ingredients.items()}
+
+    def _row_for(self, recipe_id: int) -> int:
+        row = self._row_of.get(recipe_id)
+        if row is not None:
+            return row
+        if self._count == len(self._ids):
+            capacity = max(1024, 2 * len(self._ids))
+            self._ids = np.resize(self._ids, capacity)
+            self._sizes = np.resize(self._sizes, capacity)
+            self._sizes[self._count :] = 0
+        row = self._count
+        self._count += 1
+        self._ids[row] = recipe_id
+        self._row_of[recipe_id] = row
+        return row
+
+    def _remove(self, recipe_id: int) -> None:
+        ingredient_ids = self._ingredients_of.pop(recipe_id, None)
+        if ingredient_ids is None:
+            return
+        row = self._row_of[recipe_id]
+        self._sizes[row] = 0
+        for ingredient_id in ingredient_ids:
+            postings = self._postings[ingredient_id]
+            postings = postings[postings != row]
+            if len(postings):
+                self._postings[ingredient_id] = postings
+            else:
+                del self._postings[ingredient_id]
+
+    def _add(self, recipe_id: int, ingredient_ids: tuple[int, ...]) -> None:
+        row = self._row_for(recipe_id)
+        self._ingredients_of[recipe_id] = ingredient_ids
+        self._sizes[row] = len(ingredient_ids)
+        for ingredient_id in ingredient_ids:
+            postings = self._postings.get(ingredient_id)
+            row_array = np.array([row], dtype=np.int32)
+            self._postings[ingredient_id] = (
+                row_array if postings is None else np.concatenate([postings, row_array])
+            )
+
+    def load(self) -> None:
+        generation = listing_cache.listing_generation(PANTRY_CHANNEL)
+        recipes = self._fetch()
+        with self._lock:
+            self._reset()
+            by_ingredient: dict[int, list[int]] = {}
+            for recipe_id, ingredient_ids in recipes.items():
+                row = self._row_for(recipe_id)
+                self._ingredients_of[recipe_id] = ingredient_ids
+                self._sizes[row] = len(ingredient_ids)
+                for ingredient_id in ingredient_ids:
+                    by_ingredient.setdefault(ingredient_id, []).append(row)
+            self._postings = {
+                ingredient_id: np.asarray(rows, dtype=np.int32)
+                for ingredient_id, rows in by_ingredient.items()
+            }
+            self._generation = generation
+
+    def refresh(self, recipe_ids: Iterable[int]) -> None:
+        recipe_ids = {int(recipe_id) for recipe_id in recipe_ids}
+        if not recipe_ids:
+            return
+        recipes = self._fetch(recipe_ids)
+        with self._lock:
+            for recipe_id in recipe_ids:
+                self._remove(recipe_id)
+                ingredient_ids = recipes.get(recipe_id)
+                if ingredient_ids:
+                    self._add(recipe_id, ingredient_ids)
+
+    def sync(self) -> None:
+        if not self._sync_lock.acquire(blocking=self._generation is None):
+            return
+        try:
+            if self._generation is None:
+                self.load()
+                return
+            generation, changed = listing_cache.changes_since(
+                self._generation, channel=PANTRY_CHANNEL
+            )
+            if generation == self._generation:
+                return
+            if changed is None:
+                self.load()
+                return
+            self.refresh(changed)
+            with self._lock:
+                self._generation = generation
+        finally:
+            self._sync_lock.release()
+
+    # -- užklausos -----------------------------------------------------------
+
+    def _rows_with(self, ingredient_ids: Iterable[int]) -> np.ndarray:
+        arrays = [self._postings[i] for i in ingredient_ids if i in self._postings]
+        return np.concatenate(arrays) if arrays else np.zeros(0, dtype=np.int32)
+
+    def search(
+        self,
+        ingredient_ids: Iterable[int],
+        *,
+        exclude_ids: Iterable[int] = (),
+        allowed: np.ndarray | None = None,
+        max_missing: int | None = None,
+        rank: str = "coverage",
+    ) -> PantryResult:
+        """Visi receptai su bent vienu turimu ingredientu, surikiuoti pagal `rank`.
+
+        `allowed` – surikiuotas leidžiamų receptų ID masyvas (struktūriniai
+        filtrai); `None` – be apribojimų.
+        """
+
+        with self._lock:
+            count = self._count
+            ids = self._ids[:count]
+            sizes = self._sizes[:count]
+            matched = np.bincount(self._rows_with(set(ingredient_ids)), minlength=count)
+            candidate = matched > 0
+            excluded = self._rows_with(set(exclude_ids))
+            if len(excluded):
+                candidate[excluded] = False
+            if allowed is not None:
+                positions = np.minimum(np.searchsorted(allowed, ids), max(len(allowed) - 1, 0))
+                candidate &= (allowed[positions] == ids) if len(allowed) else False
+
+            rows = np.flatnonzero(candidate)
+            row_ids = ids[rows]
+            row_matched = matched[rows]
+            row_missing = sizes[rows] - row_matched
+
+        if max_missing is not None:
+            keep = row_missing <= max_missing
+            row_ids, row_matched, row_missing = row_ids[keep], row_matched[keep], row_missing[keep]
+        if rank == "missing":
+            order = np.lexsort((row_ids, -row_matched, row_missing))
+        else:
+            coverage = row_matched / (row_matched + row_missing)
+            order = np.lexsort((row_ids, row_missing, -coverage))
+        return PantryResult(row_ids[order], row_matched[order], row_missing[order])
+
+
+_index: PantryIndex | None = None
+_index_lock = threading.Lock()
+
+
+def is_enabled() -> bool:
+    return getattr(settings, "RECIPE_PANTRY_INDEX_ENABLED", True)
+
+
+def get_pantry_index() -> PantryIndex | None:
+    """Sinchronizuotas proceso indeksas arba `None`, jei išjungtas / nepavyko."""
+
+    global _index
+    if not is_enabled():
+        return None
+    try:
+        if _index is None:
+            with _index_lock:
+                if _index is None:
+                    index = PantryIndex()
+                    index.sync()
+                    _index = index
+        _index.sync()
+        return _index
+    except Exception:
+        logger.exception("Ingredientų indeksas: nepavyko užkrauti/sinchronizuoti")
+        return None
+
+
+def warm_pantry_index() -> None:
+    """Užkrauna indeksą paleidžiant procesą (kviečiama iš `wsgi.py` / `asgi.py`)."""
+
+    from django.db import connections
+
+    try:
+        index = get_pantry_index()
+        if index is not None:
+            logger.info("Ingredientų indeksas: užkrauta %s receptų", len(index))
+    finally:
+        connections.close_all()
+
+
+def bump_pantry_generation(recipe_ids: Iterable[int] | None) -> None:
+    listing_cache.bump_listing_generation(recipe_ids, channel=PANTRY_CHANNEL)
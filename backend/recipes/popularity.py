@@ -0,0 +1,170 @@
+"""„Populiaru dabar“ (trending) ir „Populiariausi“ (popular) įverčiai.
+
+Principai:
+- Įvykiai – žymės, įvertinimai ir patvirtinti komentarai, kiekvienas su
+  svoriu (`EVENT_WEIGHTS`). `popular_score` – visų laikų svertinė suma.
+- `trending_score` – eksponentiškai blėstanti suma (pusėjimo laikas
+  `RECIPE_TRENDING_HALF_LIFE_HOURS`), saugoma kaip
+  `log Σ w · exp(λ · (t − EPOCH))`. Senų įverčių mažinti nereikia: visi
+  receptai blėsta vienodai, todėl rikiavimas pagal saugomą reikšmę yra toks
+  pat kaip pagal dabartinį įvertį. Logaritmas apsaugo nuo perpildymo.
+- `update_scores()` apdoroja tik naujus įvykius: kiekvienam šaltiniui
+  saugomas paskutinis apdorotas `id` (`PopularityCheckpoint`). Komentarai,
+  kurie dar laukia patvirtinimo, įsimenami ir patikrinami kitą kartą.
+- Pašalintos žymės / komentarai įverčių nemažina (trending vis tiek
+  išblėsta); pilnas perskaičiavimas – `update_popularity --rebuild`.
+- Kiekvienas receptas turi `RecipePopularity` eilutę su nuliniais įverčiais
+  (sukuriama signalu, o receptams iš `bulk_create` – `ensure_rows()`), todėl
+  rikiavimas pagal įvertį ir `recipe_id` eina indeksu, be NULL atvejų.
+"""
+
+from __future__ import annotations
+
+import math
+from collections import defaultdict
+from datetime import UTC, datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .etags import bump_summary_generation
+from .models import Bookmark, Comment, PopularityCheckpoint, Rating, Recipe, RecipePopularity
+
+EPOCH = datetime(2024, 1, 1, tzinfo=UTC)
+EVENT_WEIGHTS = {"rating": 1, "bookmark": 2, "comment": 3}
+SOURCES = {"rating": Rating, "bookmark": Bookmark, "comment": Comment}
+CHUNK_SIZE = 2000
+
+
+def _decay_rate() -> float:
+    half_life_hours = getattr(settings, "RECIPE_TRENDING_HALF_LIFE_HOURS", 72)
+    return math.log(2) / (half_life_hours * 3600)
+
+
+def log_add(left: float | None, right: float) -> float:
+    """`log(exp(left) + exp(right))`; `None` – įvykių dar nebuvo."""
+
+    if left is None:
+        return right
+    high, low = max(left, right), min(left, right)
+    return high + math.log1p(math.exp(low - high))
+
+
+def event_score(weight: float, created_at: datetime) -> float:
+    return math.log(weight) + _decay_rate() * (created_at - EPOCH).total_seconds()
+
+
+def current_trending(score: float | None, now: datetime) -> float:
+    """Saugomas įvertis, perskaičiuotas į „dabar“ (Σ w · 2^(−amžius / pusėjimas))."""
+
+    if score is None:
+        return 0.0
+    return math.exp(score - _decay_rate() * (now - EPOCH).total_seconds())
+
+
+class _Deltas:
+    def __init__(self) -> None:
+        self.trending: dict[int, float] = {}
+        self.popular: dict[int, int] = defaultdict(int)
+
+    def add(self, recipe_id: int, weight: int, created_at: datetime) -> None:
+        self.trending[recipe_id] = log_add(
+            self.trending.get(recipe_id), event_score(weight, created_at)
+        )
+        self.popular[recipe_id] += weight
+
+
+def _collect(source: str, checkpoint: PopularityCheckpoint, deltas: _Deltas) -> int:
+    """Prideda naujus šaltinio įvykius prie `deltas`; grąžina jų skaičių."""
+
+    model = SOURCES[source]
+    weight = EVENT_WEIGHTS[source]
+    is_comment = source == "comment"
+    fields = ["id", "recipe_id", "created_at"] + (["is_approved"] if is_comment else [])
+
+    rows = model.objects.filter(id__gt=checkpoint.last_id)
+    if is_comment and checkpoint.pending_ids:
+        rows = rows | model.objects.filter(id__in=checkpoint.pending_ids)
+    rows = rows.order_by("id").values_list(*fields)
+
+    processed = 0
+    pending: list[int] = []
+    for row in rows.iterator(chunk_size=CHUNK_SIZE):
+        event_id, recipe_id, created_at = row[:3]
+        checkpoint.last_id = max(checkpoint.last_id, event_id)
+        if is_comment and not row[3]:
+            pending.append(event_id)
+            continue
+        deltas.add(recipe_id, weight, created_at)
+        processed += 1
+    if is_comment:
+        checkpoint.pending_ids = pending
+    return processed
+
+
+def _apply(deltas: _Deltas) -> None:
+    now = timezone.now()
+    existing = RecipePopularity.objects.in_bulk(list(deltas.popular))
+    changed: list[RecipePopularity] = []
+    created: list[RecipePopularity] = []
+    for recipe_id, popular in deltas.popular.items():
+        row = existing.get(recipe_id)
+        if row is None:
+            row = RecipePopularity(recipe_id=recipe_id)
+            created.append(row)
+        else:
+            changed.append(row)
+        # Nulinė eilutė (`popular_score == 0`) įvykių dar neturėjo.
+        previous = row.trending_score if row.popular_score else None
+        row.trending_score = log_add(previous, deltas.trending[recipe_id])
+        row.popular_score += popular
+        row.updated_at = now
+
+    # Įvykiai ištrintiems receptams: FK nebėra – praleidžiam.
+    alive = set(
+        Recipe.objects.filter(id__in=[row.recipe_id for row in created]).values_list(
+            "id", flat=True
+        )
+    )
+    RecipePopularity.objects.bulk_create(
+        [row for row in created if row.recipe_id in alive], batch_size=500
+    )
+    RecipePopularity.objects.bulk_update(
+        changed, ["trending_score", "popular_score", "updated_at"], batch_size=500
+    )
+
+
+def ensure_rows() -> int:
+    """Sukuria nulines eilutes receptams, kurie jų dar neturi."""
+
+    missing = Recipe.objects.filter(popularity__isnull=True).values_list("id", flat=True)
+    rows = [RecipePopularity(recipe_id=recipe_id) for recipe_id in missing.iterator()]
+    RecipePopularity.objects.bulk_create(rows, batch_size=500, ignore_conflicts=True)
+    return len(rows)
+
+
+def update_scores(*, rebuild: bool = False) -> dict[str, int]:
+    """Apdoroja naujus įvykius; grąžina apdorotų įvykių skaičių pagal šaltinį."""
+
+    with transaction.atomic():
+        if rebuild:
+            RecipePopularity.objects.all().delete()
+            PopularityCheckpoint.objects.all().delete()
+        for source in SOURCES:
+            PopularityCheckpoint.objects.get_or_create(source=source)
+        # Užraktas – dvi lygiagrečios komandos nesuskaičiuotų tų pačių įvykių.
+        checkpoints = {
+            checkpoint.source: checkpoint
+            for checkpoint in PopularityCheckpoint.objects.select_for_update()
+        }
+
+        deltas = _Deltas()
+        processed = {source: _collect(source, checkpoints[source], deltas) for source in SOURCES}
+        _apply(deltas)
+        for checkpoint in checkpoints.values():
+            checkpoint.save()
+        ensure_rows()
+        # Pasikeitė `trending` / `popular` rikiavimas – sąrašų ETag'ai nebegalioja.
+        transaction.on_commit(bump_summary_generation)
+    return processed
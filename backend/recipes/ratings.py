@@ -0,0 +1,152 @@
+"""Įvertinimų rašymas ir denormalizuotos `RecipeRatingStats` suvestinės palaikymas.
+
+Principai:
+- Suvestinė keičiama delta atnaujinimu (`F() + n`), ne perskaičiuojant.
+- Naudotojo įvertis įrašomas vienu insert-on-conflict, o suvestinės eilutė
+  užrakinama, kad lygiagretūs balsai to paties recepto neprarastų deltų.
+- Admin'o `save()`/`delete()` ir kaskadinis trynimas suvestinę koreguoja per
+  signalus (`recipes.signals`). `QuerySet.update()` / `bulk_update()` /
+  neapdorotas SQL ant `Rating` signalų nekelia, todėl suvestinės nepakeičia –
+  po tokių pakeitimų paleiskite `python manage.py reconcile_rating_stats`.
+- Bet kokį nukrypimą (pvz., po rankinių DB pakeitimų) sutvarko
+  `reconcile_rating_stats` komanda.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+from .detail_cache import bump_detail_versions
+from .etags import bump_summary_generation
+from .models import Rating, RecipeRatingStats
+
+HISTOGRAM_FIELDS = RecipeRatingStats.HISTOGRAM_FIELDS
+
+
+def _ensure_stats_row(recipe_id: int) -> None:
+    RecipeRatingStats.objects.bulk_create(
+        [RecipeRatingStats(recipe_id=recipe_id)], ignore_conflicts=True
+    )
+
+
+def apply_rating_delta(recipe_id: int, old_value: int | None, new_value: int | None) -> None:
+    """Pritaiko vieno įverčio pasikeitimą (`old` -> `new`) recepto suvestinei.
+
+    `None` reiškia „įverčio nebuvo“ (naujas balsas) arba „įvertis pašalintas“.
+    Eilutės nesukuria – tai daro `set_user_rating`; trinant receptą kaskada
+    suvestinė jau būna pašalinta ir atnaujinimas tiesiog nieko nepaliečia.
+    """
+
+    deltas: dict[str, int] = {}
+    if old_value is not None:
+        deltas["rating_sum"] = deltas.get("rating_sum", 0) - old_value
+        deltas["rating_count"] = deltas.get("rating_count", 0) - 1
+        field = HISTOGRAM_FIELDS[old_value]
+        deltas[field] = deltas.get(field, 0) - 1
+    if new_value is not None:
+        deltas["rating_sum"] = deltas.get("rating_sum", 0) + new_value
+        deltas["rating_count"] = deltas.get("rating_count", 0) + 1
+        field = HISTOGRAM_FIELDS[new_value]
+        deltas[field] = deltas.get(field, 0) + 1
+
+    updates = {name: F(name) + delta for name, delta in deltas.items() if delta}
+    if not updates:
+        return
+    RecipeRatingStats.objects.filter(recipe_id=recipe_id).update(**updates)
+    # Detalė rodo vidurkį ir pasiskirstymą, sąrašo kortelės – vidurkį.
+    transaction.on_commit(lambda: bump_detail_versions({recipe_id}))
+    transaction.on_commit(bump_summary_generation)
+
+
+def set_user_rating(*, user, recipe_id: int, value: int) -> int:
+    """Įrašo (arba atnaujina) naudotojo įvertį ir atomiškai pakoreguoja suvestinę."""
+
+    with transaction.atomic():
+        _ensure_stats_row(recipe_id)
+        # Užrakinam suvestinę – balsai tam pačiam receptui vyksta nuosekliai,
+        # todėl senos reikšmės nuskaitymas ir delta yra suderinti.
+        RecipeRatingStats.objects.select_for_update().filter(recipe_id=recipe_id).exists()
+
+        old_value = (
+            Rating.objects.filter(user=user, recipe_id=recipe_id)
+            .values_list("value", flat=True)
+            .first()
+        )
+        if old_value == value:
+            return value
+
+        Rating.objects.bulk_create(
+            [Rating(user=user, recipe_id=recipe_id, value=value)],
+            update_conflicts=True,
+            unique_fields=["user", "recipe"],
+            update_fields=["value", "updated_at"],
+        )
+        apply_rating_delta(recipe_id, old_value, value)
+    return value
+
+
+def _actual_stats(recipe_ids: Iterable[int] | None = None):
+    qs = Rating.objects.all()
+    if recipe_ids is not None:
+        qs = qs.filter(recipe_id__in=list(recipe_ids))
+    histogram = {
+        field: Count("id", filter=Q(value=value)) for value, field in HISTOGRAM_FIELDS.items()
+    }
+    return (
+        qs.values("recipe_id")
+        .order_by("recipe_id")
+        .annotate(rating_sum=Sum("value"), rating_count=Count("id"), **histogram)
+    )
+
+
+STATS_FIELDS = ["rating_sum", "rating_count", *HISTOGRAM_FIELDS.values()]
+
+
+def reconcile_rating_stats(
+    recipe_ids: Iterable[int] | None = None, *, dry_run: bool = False
+) -> int:
+    """Palygina suvestines su `Rating` lentele ir pataiso nukrypusias.
+
+    Grąžina pataisytų (arba, kai `dry_run`, rastų nukrypusių) receptų skaičių.
+    """
+
+    actual = {row["recipe_id"]: row for row in _actual_stats(recipe_ids)}
+
+    stored_qs = RecipeRatingStats.objects.all()
+    if recipe_ids is not None:
+        stored_qs = stored_qs.filter(recipe_id__in=list(recipe_ids))
+    stored = {stats.recipe_id: stats for stats in stored_qs}
+
+    to_create: list[RecipeRatingStats] = []
+    to_update: list[RecipeRatingStats] = []
+
+    for recipe_id, row in actual.items():
+        stats = stored.get(recipe_id)
+        if stats is None:
+            to_create.append(
+                RecipeRatingStats(recipe_id=recipe_id, **{f: row[f] for f in STATS_FIELDS})
+            )
+            continue
+        if any(getattr(stats, f) != row[f] for f in STATS_FIELDS):
+            for f in STATS_FIELDS:
+                setattr(stats, f, row[f])
+            to_update.append(stats)
+
+    # Suvestinės be jokių įverčių turi būti nulinės.
+    for recipe_id, stats in stored.items():
+        if recipe_id in actual:
+            continue
+        if any(getattr(stats, f) for f in STATS_FIELDS):
+            for f in STATS_FIELDS:
+                setattr(stats, f, 0)
+            to_update.append(stats)
+
+    if not dry_run:
+        with transaction.atomic():
+            RecipeRatingStats.objects.bulk_create(to_create, ignore_conflicts=True)
+            RecipeRatingStats.objects.bulk_update(to_update, STATS_FIELDS, batch_size=500)
+
+    return len(to_create) + len(to_update)
@@ -0,0 +1,219 @@
+"""Asmeninės rekomendacijos („Rekomenduojame jums“) iš žymių ir įvertinimų.
+
+Principai:
+- Periodinis darbas (`python manage.py build_recommendations`) sudaro
+  naudotojų × receptų matricą (`scipy.sparse`): žymė sveria 1, įvertinimas –
+  pagal reikšmę (`rating_weight`), kiekviena sąveika blėsta eksponentiškai
+  pagal amžių (`RECIPE_RECOMMEND_HALF_LIFE_DAYS`).
+- Receptų × receptų bendro pasitaikymo matrica `XᵀX` normalizuojama kosinusu;
+  kiekvienam receptui išsaugoma `TOP_N` kaimynų į `recommend.npy`
+  (`recipes.mapped_array`, mmap'inama visų worker'ių).
+- Užklausos metu – viena maža DB užklausa naudotojo istorijai (žymės ir
+  įvertinimai kartu), kandidatų įverčiai susumuojami vienu vektoriniu
+  žingsniu; jau matyti receptai praleidžiami.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import threading
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.db.models import F, IntegerField, Value
+from django.utils import timezone
+from scipy import sparse
+
+from .mapped_array import MappedArrayFile
+from .models import Bookmark, Rating
+
+logger = logging.getLogger(__name__)
+
+INDEX_NAME = "recommend.npy"
+TOP_N = 50
+# Žymė neturi įvertinimo – `value` vietoje naudojamas 0.
+BOOKMARK_VALUE = 0
+
+DTYPE = np.dtype(
+    [
+        ("id", "<i8"),
+        ("neighbours", "<i8", (TOP_N,)),
+        ("scores", "<f4", (TOP_N,)),
+    ]
+)
+
+
+def _half_life_days() -> float:
+    return float(getattr(settings, "RECIPE_RECOMMEND_HALF_LIFE_DAYS", 180))
+
+
+def rating_weight(value: np.ndarray) -> np.ndarray:
+    """Žymė (0) ir 5★ – 1; 4★ – ⅔; 3★ – ⅓; prastesni – 0 (nerodo skonio)."""
+
+    weights = np.clip((value.astype(np.float32) - 2.0) / 3.0, 0.0, 1.0)
+    return np.where(value == BOOKMARK_VALUE, 1.0, weights).astype(np.float32)
+
+
+def decay(created_at: np.ndarray, now: datetime) -> np.ndarray:
+    """`created_at` – UNIX sekundės; grąžina svorio daugiklį (0, 1]."""
+
+    age_days = np.maximum(now.timestamp() - created_at, 0.0) / 86400.0
+    return np.exp(-math.log(2) * age_days / _half_life_days()).astype(np.float32)
+
+
+def _interactions(queryset_filter: dict) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """(user_id, recipe_id, value, created_at) masyvai – viena DB užklausa."""
+
+    # Abi pusės – tie patys pavadinti stulpeliai ta pačia tvarka: Django < 5.2
+    # anotacijas SELECT'e deda po laukų, todėl `Value(...)` tiesiai `values_list`
+    # sąraše UNION'e atsidurtų kitoje vietoje nei `value`.
+    columns = ("user_id", "recipe_id", "interaction_value", "created_at")
+    bookmarks = (
+        Bookmark.objects.filter(**queryset_filter)
+        .annotate(interaction_value=Value(BOOKMARK_VALUE, output_field=IntegerField()))
+        .values_list(*columns)
+    )
+    ratings = (
+        Rating.objects.filter(**queryset_filter)
+        .annotate(interaction_value=F("value"))
+        .values_list(*columns)
+    )
+    rows = list(bookmarks.order_by().union(ratings.order_by(), all=True))
+    if not rows:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty, np.zeros(0, dtype=np.float64)
+    users, recipes, values, created = zip(*rows, strict=True)
+    return (
+        np.asarray(users, dtype=np.int64),
+        np.asarray(recipes, dtype=np.int64),
+        np.asarray(values, dtype=np.int64),
+        np.asarray([moment.timestamp() for moment in created], dtype=np.float64),
+    )
+
+
+def _interaction_weights(values: np.ndarray, created: np.ndarray, now: datetime) -> np.ndarray:
+    return rating_weight(values) * decay(created, now)
+
+
+def build_index(now: datetime | None = None) -> np.ndarray:
+    now = now or timezone.now()
+    users, recipes, values, created = _interactions({"recipe__published_at__isnull": False})
+    weights = _interaction_weights(values, created, now)
+    keep = weights > 0
+    users, recipes, weights = users[keep], recipes[keep], weights[keep]
+
+    recipe_ids, recipe_index = np.unique(recipes, return_inverse=True)
+    _, user_index = np.unique(users, return_inverse=True)
+    data = np.zeros(len(recipe_ids), dtype=DTYPE)
+    data["id"] = recipe_ids
+    data["neighbours"] = -1
+    if not len(recipe_ids):
+        return data
+
+    # Žymė ir įvertinimas tam pačiam receptui sumuojami (COO → CSR sudeda).
+    matrix = sparse.csr_matrix(
+        (weights, (user_index, recipe_index)),
+        shape=(user_index.max() + 1, len(recipe_ids)),
+        dtype=np.float32,
+    )
+    cooccurrence = (matrix.T @ matrix).tocsr()
+    norms = np.sqrt(cooccurrence.diagonal())
+    norms[norms == 0] = 1.0
+    cooccurrence.setdiag(0)
+    cooccurrence.eliminate_zeros()
+    # Kosinusas: C_ij / (‖i‖ · ‖j‖).
+    scaled = sparse.diags(1.0 / norms) @ cooccurrence @ sparse.diags(1.0 / norms)
+    scaled = scaled.tocsr()
+
+    for row in range(len(recipe_ids)):
+        start, end = scaled.indptr[row], scaled.indptr[row + 1]
+        columns, scores = scaled.indices[start:end], scaled.data[start:end]
+        if len(columns) > TOP_N:
+            best = np.argpartition(-scores, TOP_N - 1)[:TOP_N]
+            columns, scores = columns[best], scores[best]
+        order = np.lexsort((recipe_ids[columns], -scores))
+        count = len(order)
+        data["neighbours"][row][:count] = recipe_ids[columns[order]]
+        data["scores"][row][:count] = scores[order]
+    return data
+
+
+class RecommendationIndex:
+    def __init__(self, directory: Path) -> None:
+        self.store = MappedArrayFile(Path(directory) / INDEX_NAME)
+
+    def __len__(self) -> int:
+        data = self.store.current()
+        return 0 if data is None else len(data)
+
+    def rebuild(self, now: datetime | None = None) -> int:
+        data = build_index(now)
+        with self.store.write_lock():
+            self.store.write(data)
+        return len(data)
+
+    def recommend(
+        self, user_id: int, *, limit: int, now: datetime | None = None
+    ) -> list[int] | None:
+        """Rekomenduojamų receptų ID; `None` – indekso dar nėra."""
+
+        data = self.store.current()
+        if data is None:
+            return None
+        _, recipes, values, created = _interactions({"user_id": user_id})
+        if not len(recipes):
+            return []
+
+        weights = _interaction_weights(values, created, now or timezone.now())
+        ids = data["id"]
+        rows = np.searchsorted(ids, recipes)
+        known = (rows < len(ids)) & (ids[np.minimum(rows, len(ids) - 1)] == recipes)
+        known &= weights > 0
+        if not known.any():
+            return []
+
+        neighbours = data["neighbours"][rows[known]].ravel()
+        scores = (data["scores"][rows[known]] * weights[known][:, None]).ravel()
+        valid = (neighbours >= 0) & ~np.isin(neighbours, recipes)
+        if not valid.any():
+            return []
+        candidates, inverse = np.unique(neighbours[valid], return_inverse=True)
+        totals = np.bincount(inverse, weights=scores[valid])
+        order = np.lexsort((candidates, -totals))[:limit]
+        return [int(recipe_id) for recipe_id in candidates[order]]
+
+
+def _index_directory() -> Path:
+    return Path(getattr(settings, "RECIPE_RECOMMEND_PATH", settings.BASE_DIR / "var" / "recommend"))
+
+
+_index: RecommendationIndex | None = None
+_index_lock = threading.Lock()
+_warned_missing = False
+
+
+def get_recommendation_index() -> RecommendationIndex:
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = RecommendationIndex(_index_directory())
+    return _index
+
+
+def recommended_recipe_ids(user_id: int, *, limit: int) -> list[int]:
+    global _warned_missing
+    try:
+        ids = get_recommendation_index().recommend(user_id, limit=limit)
+    except Exception:
+        logger.exception("Rekomendacijos: nepavyko apskaičiuoti (user_id=%s)", user_id)
+        return []
+    if ids is None:
+        if not _warned_missing:
+            _warned_missing = True
+            logger.warning("Rekomendacijos: indekso dar nėra – paleiskite `build_recommendations`")
+        return []
+    return ids
@@ -0,0 +1,386 @@
+"""Panašūs receptai („Jums gali patikti“) iš iš anksto paskaičiuoto indekso.
+
+Principai:
+- Receptas aprašomas ingredientų ir tag'ų aibe; panašumas – Jaccard
+  koeficientas, įvertintas MinHash parašais (`NUM_PERM` maišos funkcijų).
+- Kandidatai randami LSH: parašas suskaidytas į `BANDS` juostų, receptai su
+  bent viena sutampančia juosta lyginami tarpusavyje. Kiekvienam receptui
+  iš anksto išsaugoma `TOP_K` artimiausių kaimynų.
+- Indeksas – vienas `numpy` struktūrinis masyvas (`related.npy`, surikiuotas
+  pagal recepto ID), kurį kiekvienas worker'is `mmap`'ina; užklausa –
+  `searchsorted` + viena eilutė, DB nepaliečiama.
+- Pakeitimai iš `recipes.signals` tik įrašomi į DB eilę
+  (`RelatedRecipeUpdate`); `python manage.py update_related_recipes`
+  worker'is juos apdoroja partijomis – perskaičiuoja tik paliestas eilutes ir
+  failą (atomiškai, `recipes.mapped_array`) perrašo kartą partijai, o ne
+  kiekvienam išsaugojimui admin'e. `RECIPE_RELATED_UPDATES_QUEUED=False` –
+  atnaujinama iškart po commit'o (pvz., lokaliai be worker'io).
+- Inkrementinis atnaujinimas taiko tas pačias taisykles kaip pilnas
+  perstatymas (ir `MAX_BUCKET_SIZE`), todėl rezultatai sutampa. Kandidatai
+  ieškomi per surikiuotus juostų raktus (`searchsorted`), ne lyginant
+  kiekvieną eilutę su visu masyvu.
+- Pilnas perstatymas – `python manage.py rebuild_related_recipes`.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from collections.abc import Iterable
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+
+from .mapped_array import MappedArrayFile
+from .models import Recipe, RecipeIngredient, RelatedRecipeUpdate
+
+logger = logging.getLogger(__name__)
+
+INDEX_NAME = "related.npy"
+
+NUM_PERM = 64
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+TOP_K = 12
+# Žemesnio įverčio kaimynai nesaugomi – per mažai bendro.
+MIN_SCORE = 0.1
+# Per didelės LSH juostos (pvz., receptai vien su „druska“) praleidžiamos –
+# jose kandidatų kokybė menka.
+MAX_BUCKET_SIZE = 500
+
+# Mersenne pirminis skaičius: `a * x` telpa į uint64, parašai – į uint32.
+PRIME = (1 << 31) - 1
+SEED = 20240613
+
+_rng = np.random.default_rng(SEED)
+HASH_A = _rng.integers(1, PRIME, size=NUM_PERM, dtype=np.uint64)
+HASH_B = _rng.integers(0, PRIME, size=NUM_PERM, dtype=np.uint64)
+
+DTYPE = np.dtype(
+    [
+        ("id", "<i8"),
+        ("signature", "<u4", (NUM_PERM,)),
+        ("bands", "<u8", (BANDS,)),
+        ("neighbours", "<i8", (TOP_K,)),
+        ("scores", "<f4", (TOP_K,)),
+    ]
+)
+
+
+def recipe_features(recipe_ids: Iterable[int] | None = None) -> dict[int, np.ndarray]:
+    """Publikuotų receptų požymiai: ingredientas `2 * id`, tag'as `2 * id + 1`."""
+
+    ingredient_rows = RecipeIngredient.objects.filter(recipe__published_at__isnull=False)
+    tag_rows = Recipe.tags.through.objects.filter(recipe__published_at__isnull=False)
+    if recipe_ids is not None:
+        recipe_ids = list(recipe_ids)
+        ingredient_rows = ingredient_rows.filter(recipe_id__in=recipe_ids)
+        tag_rows = tag_rows.filter(recipe_id__in=recipe_ids)
+
+    features: dict[int, set[int]] = {}
+    for recipe_id, ingredient_id in ingredient_rows.values_list("recipe_id", "ingredient_id"):
+        features.setdefault(recipe_id, set()).add(2 * ingredient_id)
+    for recipe_id, tag_id in tag_rows.values_list("recipe_id", "tag_id"):
+        features.setdefault(recipe_id, set()).add(2 * tag_id + 1)
+    return {
+        recipe_id: np.fromiter(values, dtype=np.uint64, count=len(values))
+        for recipe_id, values in features.items()
+    }
+
+
+def minhash_signature(features: np.ndarray) -> np.ndarray:
+    hashed = (HASH_A[:, None] * (features[None, :] % PRIME) + HASH_B[:, None]) % PRIME
+    return hashed.min(axis=1).astype(np.uint32)
+
+
+def band_keys(signatures: np.ndarray) -> np.ndarray:
+    """Kiekvienos juostos `ROWS` reikšmės sujungtos į vieną uint64 raktą."""
+
+    rows = signatures.reshape(*signatures.shape[:-1], BANDS, ROWS).astype(np.uint64)
+    keys = np.zeros(rows.shape[:-1], dtype=np.uint64)
+    for position in range(ROWS):
+        # Reikšmės < 2^31, todėl dvi telpa be susidūrimų; daugiau – maišom.
+        keys = keys * np.uint64(PRIME) + rows[..., position]
+    return keys
+
+
+def _top_neighbours(
+    data: np.ndarray, row: int, candidates: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    candidates = candidates[candidates != row]
+    neighbours = np.full(TOP_K, -1, dtype=np.int64)
+    scores = np.zeros(TOP_K, dtype=np.float32)
+    if not len(candidates):
+        return neighbours, scores
+    similarity = (data["signature"][candidates] == data["signature"][row]).mean(axis=1)
+    keep = similarity >= MIN_SCORE
+    candidates, similarity = candidates[keep], similarity[keep]
+    if len(candidates) > TOP_K:
+        best = np.argpartition(-similarity, TOP_K - 1)[:TOP_K]
+        candidates, similarity = candidates[best], similarity[best]
+    # Lygūs įverčiai – pagal ID, kad rezultatas būtų stabilus.
+    order = np.lexsort((data["id"][candidates], -similarity))
+    count = len(order)
+    neighbours[:count] = data["id"][candidates[order]]
+    scores[:count] = similarity[order]
+    return neighbours, scores
+
+
+def _bucket_index(bands: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Kiekvienai juostai surikiuoti raktai ir jų eilutės: `(keys, rows)`, abu `(BANDS, n)`.
+
+    Grupė (juosta, raktas) randama `searchsorted`, todėl eilutės kandidatams
+    nereikia lyginti su visu masyvu.
+    """
+
+    rows = np.argsort(bands, axis=0, kind="stable")
+    keys = np.take_along_axis(bands, rows, axis=0)
+    return keys.T.copy(), rows.T.copy()
+
+
+def _candidates(
+    data: np.ndarray, buckets: tuple[np.ndarray, np.ndarray], row: int
+) -> np.ndarray:
+    """Eilutės su bent viena bendra juosta, kaip `build_index`: be per didelių juostų."""
+
+    keys, rows = buckets
+    found = []
+    for band, key in enumerate(data["bands"][row]):
+        start = np.searchsorted(keys[band], key, side="left")
+        end = np.searchsorted(keys[band], key, side="right")
+        if 2 <= end - start <= MAX_BUCKET_SIZE:
+            found.append(rows[band, start:end])
+    if not found:
+        return np.empty(0, dtype=np.int64)
+    return np.unique(np.concatenate(found))
+
+
+def _recompute_rows(
+    data: np.ndarray, buckets: tuple[np.ndarray, np.ndarray], rows: Iterable[int]
+) -> None:
+    for row in rows:
+        data["neighbours"][row], data["scores"][row] = _top_neighbours(
+            data, row, _candidates(data, buckets, row)
+        )
+
+
+def build_index(features: dict[int, np.ndarray]) -> np.ndarray:
+    """Pilnas indeksas; kandidatai – per LSH juostų grupes."""
+
+    recipe_ids = sorted(features)
+    data = np.zeros(len(recipe_ids), dtype=DTYPE)
+    data["neighbours"] = -1
+    if not recipe_ids:
+        return data
+    data["id"] = recipe_ids
+    data["signature"] = np.stack([minhash_signature(features[rid]) for rid in recipe_ids])
+    data["bands"] = band_keys(data["signature"])
+
+    candidates: list[set[int]] = [set() for _ in recipe_ids]
+    for band in range(BANDS):
+        keys = data["bands"][:, band]
+        order = np.argsort(keys, kind="stable")
+        boundaries = np.flatnonzero(np.diff(keys[order])) + 1
+        for bucket in np.split(order, boundaries):
+            if len(bucket) < 2 or len(bucket) > MAX_BUCKET_SIZE:
+                continue
+            members = bucket.tolist()
+            for row in members:
+                candidates[row].update(members)
+
+    for row, rows in enumerate(candidates):
+        data["neighbours"][row], data["scores"][row] = _top_neighbours(
+            data, row, np.fromiter(rows, dtype=np.int64, count=len(rows))
+        )
+    return data
+
+
+def apply_changes(
+    data: np.ndarray, features: dict[int, np.ndarray], changed: set[int]
+) -> np.ndarray:
+    """Nauja masyvo versija po `changed` receptų pasikeitimo.
+
+    `features` – tik tų `changed` receptų, kurie vis dar publikuoti ir turi
+    požymių; kiti pašalinami.
+    """
+
+    changed_array = np.fromiter(changed, dtype=np.int64, count=len(changed))
+    data = data[~np.isin(data["id"], changed_array)]
+
+    added = np.zeros(len(features), dtype=DTYPE)
+    added["neighbours"] = -1
+    if features:
+        added["id"] = sorted(features)
+        added["signature"] = np.stack([minhash_signature(features[rid]) for rid in added["id"]])
+        added["bands"] = band_keys(added["signature"])
+    data = np.concatenate([data, added])
+    data = data[np.argsort(data["id"], kind="stable")]
+
+    # Perskaičiuojam pakeistus receptus ir tuos, kurių sąraše jie buvo.
+    buckets = _bucket_index(data["bands"])
+    referencing = np.isin(data["neighbours"], changed_array).any(axis=1)
+    changed_rows = np.flatnonzero(np.isin(data["id"], changed_array))
+    _recompute_rows(
+        data, buckets, sorted(set(np.flatnonzero(referencing).tolist()) | set(changed_rows))
+    )
+
+    # Kitiems kandidatams pakeistas receptas tik įterpiamas, jei patenka į top-K.
+    for row in changed_rows:
+        recipe_id = data["id"][row]
+        for other in _candidates(data, buckets, row):
+            if other == row or recipe_id in data["neighbours"][other]:
+                continue
+            score = (data["signature"][other] == data["signature"][row]).mean()
+            if score < MIN_SCORE or score <= data["scores"][other][-1]:
+                continue
+            neighbours = np.append(data["neighbours"][other], recipe_id)
+            scores = np.append(data["scores"][other], np.float32(score))
+            order = np.lexsort(
+                (np.where(neighbours < 0, np.iinfo(np.int64).max, neighbours), -scores)
+            )
+            data["neighbours"][other] = neighbours[order][:TOP_K]
+            data["scores"][other] = scores[order][:TOP_K]
+    return data
+
+
+class RelatedIndex:
+    """Panašių receptų indeksas vienam katalogui (skaitymas ir rašymas)."""
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = Path(directory)
+        self.store = MappedArrayFile(self.directory / INDEX_NAME)
+
+    @property
+    def path(self) -> Path:
+        return self.store.path
+
+    def __len__(self) -> int:
+        data = self.store.current()
+        return 0 if data is None else len(data)
+
+    def related(self, recipe_id: int, *, limit: int = TOP_K) -> list[int] | None:
+        """Panašiausių receptų ID; `None` – indekso dar nėra."""
+
+        data = self.store.current()
+        if data is None:
+            return None
+        ids = data["id"]
+        row = int(np.searchsorted(ids, recipe_id))
+        if row >= len(ids) or ids[row] != recipe_id:
+            return []
+        neighbours = data["neighbours"][row][:limit]
+        return [int(rid) for rid in neighbours if rid >= 0]
+
+    def rebuild(self, features: dict[int, np.ndarray]) -> int:
+        data = build_index(features)
+        with self.store.write_lock():
+            self.store.write(data)
+        return len(data)
+
+    def update(self, recipe_ids: Iterable[int]) -> bool:
+        """Perskaičiuoja nurodytus receptus; `False` – indekso dar nėra."""
+
+        changed = set(recipe_ids)
+        if not changed:
+            return True
+        with self.store.write_lock():
+            data = self.store.load()
+            if data is None:
+                return False
+            self.store.write(apply_changes(data, recipe_features(changed), changed))
+        return True
+
+
+def _index_directory() -> Path:
+    return Path(getattr(settings, "RECIPE_RELATED_PATH", settings.BASE_DIR / "var" / "related"))
+
+
+_index: RelatedIndex | None = None
+_index_lock = threading.Lock()
+_warned_missing = False
+
+
+def get_related_index() -> RelatedIndex:
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = RelatedIndex(_index_directory())
+    return _index
+
+
+def related_recipe_ids(recipe_id: int, *, limit: int = TOP_K) -> list[int]:
+    try:
+        ids = get_related_index().related(recipe_id, limit=limit)
+    except Exception:
+        logger.exception("Panašūs receptai: nepavyko nuskaityti indekso")
+        return []
+    return ids or []
+
+
+def update_related(recipe_ids: Iterable[int]) -> None:
+    """Inkrementinis atnaujinimas iškart; klaidos neturi blokuoti įrašymo."""
+
+    global _warned_missing
+    recipe_ids = set(recipe_ids)
+    try:
+        if not get_related_index().update(recipe_ids) and not _warned_missing:
+            _warned_missing = True
+            logger.warning(
+                "Panašūs receptai: indekso dar nėra – paleiskite `rebuild_related_recipes`"
+            )
+    except Exception:
+        logger.exception(
+            "Panašūs receptai: nepavyko atnaujinti (recipe_ids=%s)", sorted(recipe_ids)
+        )
+
+
+def is_queued() -> bool:
+    return getattr(settings, "RECIPE_RELATED_UPDATES_QUEUED", True)
+
+
+def schedule_related_update(recipe_ids: Iterable[int]) -> None:
+    """Iš signalų (jau po commit'o): į eilę arba, išjungus eilę, iškart."""
+
+    recipe_ids = set(recipe_ids)
+    if not recipe_ids:
+        return
+    if not is_queued():
+        update_related(recipe_ids)
+        return
+    RelatedRecipeUpdate.objects.bulk_create(
+        [RelatedRecipeUpdate(recipe_id=recipe_id) for recipe_id in sorted(recipe_ids)]
+    )
+
+
+def process_related_updates(limit: int) -> int | None:
+    """Pritaiko iki `limit` eilės įrašų vienu indekso perrašymu.
+
+    Grąžina apdorotų įrašų skaičių; `None` – indekso dar nėra (eilė
+    paliekama, ją išvalys `rebuild_related`).
+    """
+
+    with transaction.atomic():
+        rows = list(
+            RelatedRecipeUpdate.objects.select_for_update(skip_locked=True)
+            .order_by("id")
+            .values_list("id", "recipe_id")[:limit]
+        )
+        if not rows:
+            return 0
+        if not get_related_index().update({recipe_id for _, recipe_id in rows}):
+            return None
+        RelatedRecipeUpdate.objects.filter(id__in=[row_id for row_id, _ in rows]).delete()
+    return len(rows)
+
+
+def rebuild_related() -> int:
+    # Iki perstatymo pradžios įrašyti pakeitimai jame jau atsispindi.
+    last_id = RelatedRecipeUpdate.objects.aggregate(last=Max("id"))["last"]
+    count = get_related_index().rebuild(recipe_features())
+    if last_id is not None:
+        RelatedRecipeUpdate.objects.filter(id__lte=last_id).delete()
+    return count
@@ -1,7 +1,7 @@
 """Ninja schemos receptų API."""
 
-from datetime import datetime
-from typing import Optional
+from datetime import date, datetime
+from typing import Literal, Optional
 
 from ninja import Field, Schema
 
@@ -9,10 +9,30 @@ from ninja import Field, Schema
 class ImageVariantSchema(Schema):
     avif: Optional[str] = None
     webp: Optional[str] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    avif_bytes: Optional[int] = None
+    webp_bytes: Optional[int] = None
+
+
+class ImageSourceSchema(Schema):
+    format: str
+    type: str
+    quality: int
+    srcset: str
 
 
 class ImageSetSchema(Schema):
     original: Optional[str] = None
+    # Originalo matmenys ir užpildas (LQIP data URI, dominuojanti spalva) – iš manifesto.
+    width: Optional[int] = None
+    height: Optional[int] = None
+    lqip: Optional[str] = None
+    color: Optional[str] = None
+    # Origin endpoint'o bazė ir jau pasirašyti `srcset` kiekvienam formatui / kokybei;
+    # `null` / tuščia, kai origin išjungtas (nėra `RECIPE_IMAGE_ORIGIN_KEY`).
+    origin: Optional[str] = None
+    sources: list[ImageSourceSchema] = []
     thumb: Optional[ImageVariantSchema] = None
     small: Optional[ImageVariantSchema] = None
     medium: Optional[ImageVariantSchema] = None
@@ -68,6 +88,11 @@ class RatingSchema(Schema):
     value: int
 
 
+class RatingBucketSchema(Schema):
+    value: int
+    count: int
+
+
 class RecipeSummarySchema(Schema):
     id: int
     title: str
@@ -96,24 +121,136 @@ class RecipeDetailSchema(RecipeSummarySchema):
     steps: list[RecipeStepSchema]
     comments: list[CommentSchema]
     user_rating: Optional[int] = None
+    rating_distribution: list[RatingBucketSchema] = []
 
 
 class RecipeListResponse(Schema):
-    total: int
+    total: Optional[int] = None
     items: list[RecipeSummarySchema]
+    next_cursor: Optional[str] = None
+    # Paieška be rezultatų: pataisyta užklausa; `autocorrected` – rezultatai jau jos.
+    did_you_mean: Optional[str] = None
+    autocorrected: bool = False
+
+
+class FacetBucketSchema(Schema):
+    slug: str
+    name: str
+    count: int
+
+
+class SuggestItemSchema(Schema):
+    kind: Literal["recipe", "ingredient", "tag", "cuisine"]
+    id: int
+    label: str
+    slug: str
+
+
+class SuggestResponse(Schema):
+    items: list[SuggestItemSchema]
+
+
+class RecipeFacetsResponse(Schema):
+    tags: list[FacetBucketSchema]
+    categories: list[FacetBucketSchema]
+    cuisines: list[FacetBucketSchema]
+    meal_types: list[FacetBucketSchema]
+    difficulties: list[FacetBucketSchema]
+    # Paieškos rezultatų daugiau nei `RECIPE_SEARCH_MAX_RESULTS` – suskaičiuota tik jiems.
+    truncated: bool = False
 
 
 class RecipeFilters(Schema):
     search: Optional[str] = Field(
         default=None, description="Paieška pavadinime ar apraše")
-    tag: Optional[str] = Field(default=None, description="Tag'o slugas")
-    category: Optional[str] = Field(
-        default=None, description="Kategorijos slugas")
-    cuisine: Optional[str] = None
-    meal_type: Optional[str] = None
-    difficulty: Optional[str] = None
+    # Kartojamas parametras – AND, `a|b` – OR, `!a` – NOT (žr. `recipes.filtering`).
+    tag: list[str] = Field(default=[], description="Tag'o slugas")
+    category: list[str] = Field(default=[], description="Kategorijos slugas")
+    cuisine: list[str] = Field(default=[], description="Virtuvės slugas")
+    meal_type: list[str] = Field(default=[], description="Patiekalo tipo slugas")
+    difficulty: list[str] = Field(default=[], description="Sudėtingumas (easy|medium|hard)")
     limit: int = Field(default=20, ge=1, le=100)
     offset: int = Field(default=0, ge=0)
+    cursor: Optional[str] = Field(
+        default=None,
+        description="`next_cursor` iš ankstesnio atsakymo; kai nurodytas, `offset` ignoruojamas",
+    )
+    count: Literal["exact", "estimate", "none"] = Field(
+        default="exact",
+        description="`total` skaičiavimas: tikslus, apytikslis arba jokio (infinite scroll)",
+    )
+    sort: Literal["newest", "trending", "popular"] = Field(
+        default="newest",
+        description="Rikiavimas be paieškos: naujausi, populiaru dabar arba populiariausi",
+    )
+
+
+class PantryFilters(Schema):
+    ingredient: list[str] = Field(
+        ..., min_length=1, description="Turimo ingrediento slugas (kartojamas parametras)"
+    )
+    exclude: list[str] = Field(
+        default=[], description="Ingrediento slugas, kurio receptai atmetami (alergijos)"
+    )
+    tag: list[str] = Field(default=[], description="Tag'o slugas")
+    category: list[str] = Field(default=[], description="Kategorijos slugas")
+    cuisine: list[str] = Field(default=[], description="Virtuvės slugas")
+    meal_type: list[str] = Field(default=[], description="Patiekalo tipo slugas")
+    difficulty: list[str] = Field(default=[], description="Sudėtingumas (easy|medium|hard)")
+    rank: Literal["coverage", "missing"] = Field(
+        default="coverage",
+        description="Rikiavimas: didžiausias padengimas arba mažiausiai trūkstamų ingredientų",
+    )
+    max_missing: Optional[int] = Field(
+        default=None, ge=0, description="Daugiausia trūkstamų ingredientų"
+    )
+    limit: int = Field(default=20, ge=1, le=100)
+    offset: int = Field(default=0, ge=0)
+
+
+class PantryRecipeSchema(RecipeSummarySchema):
+    matched: int
+    missing: int
+    coverage: float
+
+
+class PantryResponse(Schema):
+    total: int
+    items: list[PantryRecipeSchema]
+
+
+class RelatedRecipesResponse(Schema):
+    items: list[RecipeSummarySchema]
+
+
+class RelatedFilters(Schema):
+    limit: int = Field(default=6, ge=1, le=12)
+
+
+class RecommendedFilters(Schema):
+    limit: int = Field(default=20, ge=1, le=50)
+
+
+class RecipeViewDaySchema(Schema):
+    day: date
+    views: int
+
+
+class RecipeViewStatsResponse(Schema):
+    total: int
+    days: list[RecipeViewDaySchema]
+
+
+class RecipeViewStatsFilters(Schema):
+    days: int = Field(default=30, ge=1, le=365)
+
+
+class SuggestFilters(Schema):
+    q: str = Field(default="", max_length=100, description="Įvesties pradžia")
+    limit: int = Field(default=8, ge=1, le=20)
+    kind: list[Literal["recipe", "ingredient", "tag", "cuisine"]] = Field(
+        default=[], description="Apriboti rūšis (pakartotas parametras)"
+    )
 
 
 class CommentCreateSchema(Schema):
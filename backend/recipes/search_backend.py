@@ -0,0 +1,226 @@
+"""Paieškos backend'ų sąsaja ir surikiuotų rezultatų talpykla.
+
+Principai:
+- `list_recipes`, signalai ir komandos kalba tik su šiuo moduliu; konkretus
+  backend'as parenkamas `RECIPE_SEARCH_BACKEND` nustatymu (import kelias),
+  pvz. `recipes.search_backend.UpstashSearchBackend` ar
+  `recipes.bm25.BM25SearchBackend`.
+- Backend'as grąžina surikiuotus receptų ID; `None` reiškia „išjungtas arba
+  klaida“ – tada naudojama DB paieška (`recipes.fulltext`).
+- Struktūrinius filtrus backend'as gali pritaikyti pats: tada `filter_key`
+  grąžina netuščią raktą, o ID sąrašas jau galutinis. Kitaip filtruojama
+  lokaliai.
+- Surikiuoti sąrašai laikomi proceso atmintyje (TTL + LRU) pagal normalizuotą
+  užklausą ir filtrą, todėl vartant tos pačios paieškos puslapius backend'as
+  kviečiamas vieną kartą. Raktas turi paieškos generaciją (bendroje `cache`),
+  kurią didina kiekvienas `index_recipe` / `delete_recipe` / `bulk_index`.
+- Jei reikia daugiau rezultatų nei jau turime, užklausa pakartojama su
+  didesniu `limit` (po `RESULT_CHUNK_SIZE`), todėl puslapiuoti galima ir
+  toliau nei pirmi 1000 rezultatų.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterable
+from functools import lru_cache
+from typing import Any, Protocol
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+
+from . import upstash_search
+from .filtering import has_structured_filters
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKEND = "recipes.search_backend.UpstashSearchBackend"
+SEARCH_GENERATION_KEY = "recipes:search:generation"
+# Kiek rezultatų prašome vienu kvietimu; daugiau – tik kai prireikia.
+RESULT_CHUNK_SIZE = 1000
+
+_result_cache: OrderedDict[tuple, tuple[float, list[int], bool]] = OrderedDict()
+_result_cache_lock = threading.Lock()
+
+
+class SearchBackend(Protocol):
+    """Ką turi mokėti paieškos backend'as."""
+
+    def is_enabled(self) -> bool: ...
+
+    def index_recipe(self, recipe_id: int) -> None:
+        """Įtraukia / atnaujina receptą (nepublikuotą – pašalina)."""
+
+    def delete_recipe(self, recipe_id: int) -> None: ...
+
+    def bulk_index(self, recipe_ids: Iterable[int] | None = None) -> int:
+        """Perindeksuoja nurodytus (arba, kai `None`, visus) receptus."""
+
+    def filter_key(self, filters: Any) -> str:
+        """Netuščias raktas, jei backend'as pats pritaikys šiuos filtrus."""
+
+    def search(self, query: str, *, limit: int, filters: Any = None) -> list[int] | None: ...
+
+
+class UpstashSearchBackend:
+    """Upstash Search (`recipes.upstash_search`) adapteris."""
+
+    def is_enabled(self) -> bool:
+        return upstash_search.is_enabled()
+
+    def index_recipe(self, recipe_id: int) -> None:
+        upstash_search.upsert_recipe(recipe_id)
+
+    def delete_recipe(self, recipe_id: int) -> None:
+        upstash_search.delete_recipe(recipe_id)
+
+    def bulk_index(self, recipe_ids: Iterable[int] | None = None) -> int:
+        return upstash_search.bulk_upsert_recipes(recipe_ids)
+
+    def filter_key(self, filters: Any) -> str:
+        if filters is None or not upstash_search.filter_pushdown_enabled():
+            return ""
+        return upstash_search.build_filter_expression(filters)
+
+    def search(self, query: str, *, limit: int, filters: Any = None) -> list[int] | None:
+        return upstash_search.search_recipe_ids(
+            query, limit=limit, filter=self.filter_key(filters)
+        )
+
+
+@lru_cache(maxsize=4)
+def _load_backend(path: str) -> SearchBackend:
+    return import_string(path)()
+
+
+def get_search_backend() -> SearchBackend:
+    return _load_backend(getattr(settings, "RECIPE_SEARCH_BACKEND", DEFAULT_BACKEND))
+
+
+# -- generacija ------------------------------------------------------------
+
+
+def search_generation() -> int:
+    generation = cache.get(SEARCH_GENERATION_KEY)
+    if generation is None:
+        # Ne nuo 0 – išmestas raktas neturi atgaivinti senų sąrašų.
+        cache.add(SEARCH_GENERATION_KEY, int(time.time() * 1000), timeout=None)
+        generation = cache.get(SEARCH_GENERATION_KEY, 0)
+    return int(generation)
+
+
+def bump_search_generation() -> None:
+    """Pažymi, kad indeksas pasikeitė (talpinti sąrašai nebegalioja)."""
+
+    try:
+        cache.incr(SEARCH_GENERATION_KEY)
+    except ValueError:
+        search_generation()
+
+
+# -- indeksavimas ------------------------------------------------------------
+
+
+def index_recipe(recipe_id: int) -> None:
+    backend = get_search_backend()
+    if not backend.is_enabled():
+        return
+    backend.index_recipe(recipe_id)
+    bump_search_generation()
+
+
+def delete_recipe(recipe_id: int) -> None:
+    backend = get_search_backend()
+    if not backend.is_enabled():
+        return
+    backend.delete_recipe(recipe_id)
+    bump_search_generation()
+
+
+def bulk_index(recipe_ids: Iterable[int] | None = None) -> int:
+    backend = get_search_backend()
+    if not backend.is_enabled():
+        return 0
+    indexed = backend.bulk_index(recipe_ids)
+    bump_search_generation()
+    return indexed
+
+
+# -- paieška -----------------------------------------------------------------
+
+
+def _result_cache_timeout() -> int:
+    return getattr(settings, "RECIPE_SEARCH_RESULT_CACHE_TIMEOUT", 300)
+
+
+def _result_cache_size() -> int:
+    return getattr(settings, "RECIPE_SEARCH_RESULT_CACHE_SIZE", 256)
+
+
+def max_results() -> int:
+    """Daugiausia surikiuotų ID vienai užklausai (`RECIPE_SEARCH_MAX_RESULTS`)."""
+
+    return getattr(settings, "RECIPE_SEARCH_MAX_RESULTS", 10_000)
+
+
+def normalize_query(query: str) -> str:
+    return " ".join((query or "").lower().split())
+
+
+def is_enabled() -> bool:
+    return get_search_backend().is_enabled()
+
+
+def ranked_recipe_ids(
+    query: str, *, filters: Any = None, min_results: int = RESULT_CHUNK_SIZE
+) -> tuple[list[int], bool, bool] | None:
+    """`(surikiuoti receptų ID, ar filtrai jau pritaikyti, ar sąrašas pilnas)`.
+
+    Grąžina bent `min_results` ID (jei tiek yra ir neviršija
+    `RECIPE_SEARCH_MAX_RESULTS`). Kol sąrašas nepilnas, jo ilgis – tik apatinė
+    rezultatų skaičiaus riba. `None` – backend'as išjungtas arba klaida.
+    """
+
+    backend = get_search_backend()
+    if not backend.is_enabled():
+        return None
+
+    filter_key = backend.filter_key(filters) if filters is not None else ""
+    prefiltered = bool(filter_key) or filters is None or not has_structured_filters(filters)
+
+    normalized = normalize_query(query)
+    if not normalized:
+        return [], prefiltered, True
+
+    key = (search_generation(), normalized, filter_key)
+    now = time.monotonic()
+    with _result_cache_lock:
+        cached = _result_cache.get(key)
+        if cached is not None and cached[0] <= now:
+            del _result_cache[key]
+            cached = None
+        if cached is not None:
+            _result_cache.move_to_end(key)
+            _, ids, exhausted = cached
+            if exhausted or len(ids) >= min_results:
+                return ids, prefiltered, exhausted
+
+    # Trūksta rezultatų – prašome iki artimiausio chunk'o ribos.
+    ceiling = max_results()
+    chunks = -(-max(min_results, 1) // RESULT_CHUNK_SIZE)
+    limit = min(chunks * RESULT_CHUNK_SIZE, ceiling)
+    ids = backend.search(normalized, limit=limit, filters=filters if filter_key else None)
+    if ids is None:
+        return None
+    exhausted = len(ids) < limit or limit >= ceiling
+
+    with _result_cache_lock:
+        _result_cache[key] = (now + _result_cache_timeout(), ids, exhausted)
+        _result_cache.move_to_end(key)
+        while len(_result_cache) > _result_cache_size():
+            _result_cache.popitem(last=False)
+    return ids, prefiltered, exhausted
@@ -1,30 +1,381 @@
-"""Signalai Upstash Search indeksavimui.
+"""Signalai paieškos indeksavimui ir įvertinimų suvestinėms.
 
 Principai:
 - Indeksuojam tik publikuotus receptus.
 - Po bet kokio recepto / ingredientų / M2M pasikeitimo perindeksuojam receptą.
+  Pervadinus ar ištrynus tag'ą, kategoriją, virtuvę ar valgio tipą
+  perindeksuojami jo receptai – dokumentuose laikomi ir lookup'ų slugai
+  (filtrams).
 - Darom per `transaction.on_commit`, kad indeksuotume tik sėkmingai išsaugotą būseną.
-- Upstash klaidos neturi blokuoti įrašymo.
+- Paieškos backend'as (`recipes.search_backend`) parenkamas nustatymuose;
+  jo klaidos neturi blokuoti įrašymo.
+- Sąrašo talpyklos (total ir pan.) generacija didinama po commit'o, kai
+  keičiasi receptas ar jo filtruojami ryšiai.
+- Paieškos laukai (`search_document`, `search_vector`) perskaičiuojami po
+  commit'o, kai keičiasi receptas, jo ingredientai, tag'ai ar jų pavadinimai.
+- Pasiūlymų (typeahead) indeksui po commit'o pranešama, kurie receptai,
+  ingredientai, tag'ai ar virtuvės pasikeitė.
+- Panašių receptų indeksui (`recipes.related`) pakeitę ingredientus, tag'us ar
+  publikavimą receptai įrašomi į eilę – vieną kartą per transakciją;
+  perskaičiuoja `update_related_recipes` worker'is.
+- Ingredientų paieškos indeksui (`recipes.pantry`) po commit'o pranešama,
+  kurių receptų ingredientai ar publikavimas pasikeitė.
+- Viešos detalės talpykla (`recipes.detail_cache`) pasendinama po commit'o,
+  kai keičiasi receptas, jo M2M ryšiai, ingredientai, žingsniai ar komentarai;
+  pasikeitus žodynams (tag'ams, ingredientams, vienetams) – visos detalės.
+- `Rating` pakeitimai ne per API (adminas, kaskadinis trynimas) koreguoja
+  `RecipeRatingStats` delta atnaujinimu. API kelias signalų nekelia
+  (`bulk_create`), todėl dvigubai neskaičiuojama.
+- Naujam receptui iškart sukuriama nulinė `RecipePopularity` eilutė
+  (`sort=trending|popular` rikiuoja vien jos indeksais).
 """
 
 from __future__ import annotations
 
+import threading
+
 from django.db import transaction
-from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 
-from .models import Recipe, RecipeIngredient
-from .upstash_search import delete_recipe, upsert_recipe
+from .detail_cache import bump_detail_versions
+from .fulltext import refresh_search_documents
+from .listing_cache import bump_listing_generation
+from .models import (
+    Comment,
+    CookingMethod,
+    Cuisine,
+    Ingredient,
+    MealType,
+    MeasurementUnit,
+    Rating,
+    Recipe,
+    RecipeCategory,
+    RecipeIngredient,
+    RecipePopularity,
+    RecipeRatingStats,
+    RecipeStep,
+    Tag,
+)
+from .pantry import bump_pantry_generation
+from .ratings import apply_rating_delta
+from .related import schedule_related_update
+from .search_backend import bulk_index, delete_recipe, index_recipe
+from .suggest import bump_suggest_generation, entry_key
 
 
 def _schedule_upsert(recipe_id: int) -> None:
-    transaction.on_commit(lambda: upsert_recipe(recipe_id))
+    transaction.on_commit(lambda: index_recipe(recipe_id))
+
+
+def _schedule_bulk_upsert(recipe_ids: set[int]) -> None:
+    if not recipe_ids:
+        return
+    # `robust` – paieškos klaida tik registruojama, įrašymas jau įvykęs.
+    transaction.on_commit(lambda: bulk_index(recipe_ids), robust=True)
 
 
 def _schedule_delete(recipe_id: int) -> None:
     transaction.on_commit(lambda: delete_recipe(recipe_id))
 
 
+def _schedule_listing_bump(recipe_ids: set[int] | None) -> None:
+    transaction.on_commit(lambda: bump_listing_generation(recipe_ids))
+
+
+def _schedule_search_refresh(recipe_ids: set[int] | None) -> None:
+    if recipe_ids is not None and not recipe_ids:
+        return
+    transaction.on_commit(lambda: refresh_search_documents(recipe_ids))
+
+
+@receiver(post_save, sender=Recipe, dispatch_uid="recipes.fulltext.recipe_post_save")
+def _recipe_search_changed(sender, instance: Recipe, **kwargs) -> None:
+    _schedule_search_refresh({instance.id})
+
+
+@receiver(
+    post_save,
+    sender=RecipeIngredient,
+    dispatch_uid="recipes.fulltext.recipeingredient_post_save",
+)
+@receiver(
+    post_delete,
+    sender=RecipeIngredient,
+    dispatch_uid="recipes.fulltext.recipeingredient_post_delete",
+)
+def _recipeingredient_search_changed(sender, instance: RecipeIngredient, **kwargs) -> None:
+    _schedule_search_refresh({instance.recipe_id})
+
+
+@receiver(
+    m2m_changed,
+    sender=Recipe.tags.through,
+    dispatch_uid="recipes.fulltext.recipe_tags_m2m_changed",
+)
+def _recipe_tags_search_changed(
+    sender, instance, action: str, reverse: bool, pk_set: set[int] | None, **kwargs
+) -> None:
+    if action not in {"post_add", "post_remove", "post_clear"}:
+        return
+    if not reverse:
+        _schedule_search_refresh({instance.pk})
+    else:
+        _schedule_search_refresh(set(pk_set) if pk_set is not None else None)
+
+
+@receiver(post_save, sender=Tag, dispatch_uid="recipes.fulltext.tag_post_save")
+@receiver(pre_delete, sender=Tag, dispatch_uid="recipes.fulltext.tag_pre_delete")
+def _tag_search_changed(sender, instance: Tag, created: bool = False, **kwargs) -> None:
+    # Trinant M2M eilutės dingsta be `m2m_changed`, todėl receptus renkam prieš tai.
+    if created:
+        return
+    _schedule_search_refresh(set(instance.recipes.values_list("id", flat=True)))
+
+
+@receiver(post_save, sender=Ingredient, dispatch_uid="recipes.fulltext.ingredient_post_save")
+def _ingredient_search_changed(sender, instance: Ingredient, created: bool, **kwargs) -> None:
+    if created:
+        return
+    _schedule_search_refresh(
+        set(instance.ingredient_recipes.values_list("recipe_id", flat=True))
+    )
+
+
+def _schedule_suggest_bump(key: str) -> None:
+    transaction.on_commit(lambda: bump_suggest_generation([key]))
+
+
+SUGGEST_KINDS = {Recipe: "recipe", Ingredient: "ingredient", Tag: "tag", Cuisine: "cuisine"}
+
+
+@receiver(post_save, sender=Recipe, dispatch_uid="recipes.suggest.recipe_post_save")
+@receiver(post_delete, sender=Recipe, dispatch_uid="recipes.suggest.recipe_post_delete")
+@receiver(post_save, sender=Ingredient, dispatch_uid="recipes.suggest.ingredient_post_save")
+@receiver(post_delete, sender=Ingredient, dispatch_uid="recipes.suggest.ingredient_post_delete")
+@receiver(post_save, sender=Tag, dispatch_uid="recipes.suggest.tag_post_save")
+@receiver(post_delete, sender=Tag, dispatch_uid="recipes.suggest.tag_post_delete")
+@receiver(post_save, sender=Cuisine, dispatch_uid="recipes.suggest.cuisine_post_save")
+@receiver(post_delete, sender=Cuisine, dispatch_uid="recipes.suggest.cuisine_post_delete")
+def _suggest_entry_changed(sender, instance, **kwargs) -> None:
+    _schedule_suggest_bump(entry_key(SUGGEST_KINDS[sender], instance.pk))
+
+
+_related_pending = threading.local()
+
+
+def _flush_related_update() -> None:
+    recipe_ids = getattr(_related_pending, "recipe_ids", None)
+    _related_pending.recipe_ids = set()
+    if recipe_ids:
+        schedule_related_update(recipe_ids)
+
+
+def _schedule_related_update(recipe_ids: set[int]) -> None:
+    # Recepto išsaugojimas admin'e kelia po signalą kiekvienai ingredientų
+    # eilutei – ID kaupiami, o pirmas `on_commit` atnaujina visus iš karto.
+    if not hasattr(_related_pending, "recipe_ids"):
+        _related_pending.recipe_ids = set()
+    _related_pending.recipe_ids.update(recipe_ids)
+    transaction.on_commit(_flush_related_update)
+
+
+@receiver(pre_save, sender=Recipe, dispatch_uid="recipes.related.recipe_pre_save")
+def _recipe_related_pre_save(sender, instance: Recipe, **kwargs) -> None:
+    # MinHash požymiai – ingredientai ir tag'ai; iš paties recepto svarbu tik
+    # publikavimas, todėl kiti laukai (pavadinimas, aprašymas...) eilės nepildo.
+    instance._was_published = bool(instance.pk) and Recipe.objects.filter(
+        pk=instance.pk, published_at__isnull=False
+    ).exists()
+
+
+@receiver(post_save, sender=Recipe, dispatch_uid="recipes.related.recipe_post_save")
+def _recipe_related_saved(sender, instance: Recipe, created: bool, **kwargs) -> None:
+    # Naujas receptas požymių dar neturi – juos atneš ingredientų ir tag'ų signalai.
+    if created:
+        return
+    if getattr(instance, "_was_published", None) != (instance.published_at is not None):
+        _schedule_related_update({instance.id})
+
+
+@receiver(post_delete, sender=Recipe, dispatch_uid="recipes.related.recipe_post_delete")
+def _recipe_related_deleted(sender, instance: Recipe, **kwargs) -> None:
+    _schedule_related_update({instance.id})
+
+
+@receiver(
+    post_save,
+    sender=RecipeIngredient,
+    dispatch_uid="recipes.related.recipeingredient_post_save",
+)
+@receiver(
+    post_delete,
+    sender=RecipeIngredient,
+    dispatch_uid="recipes.related.recipeingredient_post_delete",
+)
+def _recipeingredient_related_changed(sender, instance: RecipeIngredient, **kwargs) -> None:
+    _schedule_related_update({instance.recipe_id})
+
+
+@receiver(
+    m2m_changed,
+    sender=Recipe.tags.through,
+    dispatch_uid="recipes.related.recipe_tags_m2m_changed",
+)
+def _recipe_tags_related_changed(
+    sender, instance, action: str, reverse: bool, pk_set: set[int] | None, **kwargs
+) -> None:
+    if action not in {"post_add", "post_remove", "post_clear"}:
+        return
+    if not reverse:
+        _schedule_related_update({instance.pk})
+    elif pk_set:
+        _schedule_related_update(set(pk_set))
+
+
+def _schedule_pantry_bump(recipe_id: int) -> None:
+    transaction.on_commit(lambda: bump_pantry_generation({recipe_id}))
+
+
+@receiver(post_save, sender=Recipe, dispatch_uid="recipes.pantry.recipe_post_save")
+@receiver(post_delete, sender=Recipe, dispatch_uid="recipes.pantry.recipe_post_delete")
+def _recipe_pantry_changed(sender, instance: Recipe, **kwargs) -> None:
+    _schedule_pantry_bump(instance.id)
+
+
+@receiver(
+    post_save,
+    sender=RecipeIngredient,
+    dispatch_uid="recipes.pantry.recipeingredient_post_save",
+)
+@receiver(
+    post_delete,
+    sender=RecipeIngredient,
+    dispatch_uid="recipes.pantry.recipeingredient_post_delete",
+)
+def _recipeingredient_pantry_changed(sender, instance: RecipeIngredient, **kwargs) -> None:
+    _schedule_pantry_bump(instance.recipe_id)
+
+
+def _schedule_detail_bump(recipe_ids: set[int] | None) -> None:
+    transaction.on_commit(lambda: bump_detail_versions(recipe_ids))
+
+
+@receiver(post_save, sender=Recipe, dispatch_uid="recipes.detail.recipe_post_save")
+@receiver(post_delete, sender=Recipe, dispatch_uid="recipes.detail.recipe_post_delete")
+def _recipe_detail_changed(sender, instance: Recipe, **kwargs) -> None:
+    _schedule_detail_bump({instance.id})
+
+
+@receiver(
+    post_save,
+    sender=RecipeIngredient,
+    dispatch_uid="recipes.detail.recipeingredient_post_save",
+)
+@receiver(
+    post_delete, sender=RecipeIngredient, dispatch_uid="recipes.detail.recipeingredient_post_delete"
+)
+@receiver(post_save, sender=RecipeStep, dispatch_uid="recipes.detail.recipestep_post_save")
+@receiver(post_delete, sender=RecipeStep, dispatch_uid="recipes.detail.recipestep_post_delete")
+@receiver(post_save, sender=Comment, dispatch_uid="recipes.detail.comment_post_save")
+@receiver(post_delete, sender=Comment, dispatch_uid="recipes.detail.comment_post_delete")
+def _recipe_child_detail_changed(sender, instance, **kwargs) -> None:
+    _schedule_detail_bump({instance.recipe_id})
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through, dispatch_uid="recipes.detail.tags_m2m")
+@receiver(
+    m2m_changed, sender=Recipe.categories.through, dispatch_uid="recipes.detail.categories_m2m"
+)
+@receiver(m2m_changed, sender=Recipe.cuisines.through, dispatch_uid="recipes.detail.cuisines_m2m")
+@receiver(
+    m2m_changed, sender=Recipe.meal_types.through, dispatch_uid="recipes.detail.meal_types_m2m"
+)
+@receiver(
+    m2m_changed,
+    sender=Recipe.cooking_methods.through,
+    dispatch_uid="recipes.detail.cooking_methods_m2m",
+)
+def _recipe_m2m_detail_changed(
+    sender, instance, action: str, reverse: bool, pk_set: set[int] | None, **kwargs
+) -> None:
+    if action not in {"post_add", "post_remove", "post_clear"}:
+        return
+    if not reverse:
+        _schedule_detail_bump({instance.pk})
+    else:
+        # Atvirkštinis `clear()` nepateikia receptų – pasendinam visas detales.
+        _schedule_detail_bump(set(pk_set) if pk_set is not None else None)
+
+
+@receiver(post_save, sender=Tag, dispatch_uid="recipes.detail.tag_post_save")
+@receiver(post_save, sender=RecipeCategory, dispatch_uid="recipes.detail.category_post_save")
+@receiver(post_save, sender=Cuisine, dispatch_uid="recipes.detail.cuisine_post_save")
+@receiver(post_save, sender=MealType, dispatch_uid="recipes.detail.mealtype_post_save")
+@receiver(post_save, sender=CookingMethod, dispatch_uid="recipes.detail.cookingmethod_post_save")
+@receiver(post_save, sender=Ingredient, dispatch_uid="recipes.detail.ingredient_post_save")
+@receiver(post_save, sender=MeasurementUnit, dispatch_uid="recipes.detail.unit_post_save")
+def _lookup_detail_changed(sender, instance, created: bool = False, **kwargs) -> None:
+    # Naujas įrašas dar nepriskirtas jokiam receptui; trynimą pajaučia M2M signalai.
+    if created:
+        return
+    _schedule_detail_bump(None)
+
+
+@receiver(post_save, sender=Recipe, dispatch_uid="recipes.listing.recipe_post_save")
+@receiver(post_delete, sender=Recipe, dispatch_uid="recipes.listing.recipe_post_delete")
+def _recipe_listing_changed(sender, instance: Recipe, **kwargs) -> None:
+    _schedule_listing_bump({instance.id})
+
+
+@receiver(
+    m2m_changed,
+    sender=Recipe.tags.through,
+    dispatch_uid="recipes.listing.recipe_tags_m2m_changed",
+)
+@receiver(
+    m2m_changed,
+    sender=Recipe.categories.through,
+    dispatch_uid="recipes.listing.recipe_categories_m2m_changed",
+)
+@receiver(
+    m2m_changed,
+    sender=Recipe.cuisines.through,
+    dispatch_uid="recipes.listing.recipe_cuisines_m2m_changed",
+)
+@receiver(
+    m2m_changed,
+    sender=Recipe.meal_types.through,
+    dispatch_uid="recipes.listing.recipe_meal_types_m2m_changed",
+)
+def _recipe_listing_m2m_changed(
+    sender, instance, action: str, reverse: bool, pk_set: set[int] | None, **kwargs
+) -> None:
+    if action not in {"post_add", "post_remove", "post_clear"}:
+        return
+    if not reverse:
+        _schedule_listing_bump({instance.pk})
+    else:
+        # Pvz., `tag.recipes.clear()` – `pk_set` nežinomas, todėl pilnas perkrovimas.
+        _schedule_listing_bump(set(pk_set) if pk_set is not None else None)
+
+
+@receiver(post_save, sender=Tag, dispatch_uid="recipes.listing.tag_post_save")
+@receiver(post_save, sender=RecipeCategory, dispatch_uid="recipes.listing.category_post_save")
+@receiver(post_save, sender=Cuisine, dispatch_uid="recipes.listing.cuisine_post_save")
+@receiver(post_save, sender=MealType, dispatch_uid="recipes.listing.mealtype_post_save")
+@receiver(post_delete, sender=Tag, dispatch_uid="recipes.listing.tag_post_delete")
+@receiver(post_delete, sender=RecipeCategory, dispatch_uid="recipes.listing.category_post_delete")
+@receiver(post_delete, sender=Cuisine, dispatch_uid="recipes.listing.cuisine_post_delete")
+@receiver(post_delete, sender=MealType, dispatch_uid="recipes.listing.mealtype_post_delete")
+def _lookup_changed(sender, instance, created: bool = False, **kwargs) -> None:
+    # Naujas lookup'as dar neturi receptų; pakeistas slugas ar ištrintas
+    # lookup'as paliečia nežinomą receptų aibę – pilnas perkrovimas.
+    if created:
+        return
+    _schedule_listing_bump(None)
+
+
 @receiver(post_save, sender=Recipe, dispatch_uid="recipes.upstash.recipe_post_save")
 def _recipe_post_save(sender, instance: Recipe, **kwargs) -> None:
     # Upsert funkcija pati nuspręs: jei nepublikuota – delete.
@@ -65,7 +416,68 @@ def _recipeingredient_post_delete(sender, instance: RecipeIngredient, **kwargs)
     sender=Recipe.cuisines.through,
     dispatch_uid="recipes.upstash.recipe_cuisines_m2m_changed",
 )
-def _recipe_m2m_changed(sender, instance: Recipe, action: str, **kwargs) -> None:
+@receiver(
+    m2m_changed,
+    sender=Recipe.meal_types.through,
+    dispatch_uid="recipes.upstash.recipe_meal_types_m2m_changed",
+)
+def _recipe_m2m_changed(
+    sender, instance, action: str, reverse: bool, pk_set: set[int] | None, **kwargs
+) -> None:
+    if reverse and action == "pre_clear":
+        # `tag.recipes.clear()` – po `post_clear` receptų aibė nebežinoma.
+        instance._search_cleared_ids = set(instance.recipes.values_list("id", flat=True))
+        return
     if action not in {"post_add", "post_remove", "post_clear"}:
         return
-    _schedule_upsert(instance.id)
+    if not reverse:
+        _schedule_upsert(instance.pk)
+    elif pk_set is not None:
+        _schedule_bulk_upsert(set(pk_set))
+    else:
+        _schedule_bulk_upsert(getattr(instance, "_search_cleared_ids", set()))
+
+
+@receiver(post_save, sender=Tag, dispatch_uid="recipes.upstash.tag_post_save")
+@receiver(post_save, sender=RecipeCategory, dispatch_uid="recipes.upstash.category_post_save")
+@receiver(post_save, sender=Cuisine, dispatch_uid="recipes.upstash.cuisine_post_save")
+@receiver(post_save, sender=MealType, dispatch_uid="recipes.upstash.mealtype_post_save")
+@receiver(pre_delete, sender=Tag, dispatch_uid="recipes.upstash.tag_pre_delete")
+@receiver(pre_delete, sender=RecipeCategory, dispatch_uid="recipes.upstash.category_pre_delete")
+@receiver(pre_delete, sender=Cuisine, dispatch_uid="recipes.upstash.cuisine_pre_delete")
+@receiver(pre_delete, sender=MealType, dispatch_uid="recipes.upstash.mealtype_pre_delete")
+def _lookup_search_changed(sender, instance, created: bool = False, **kwargs) -> None:
+    # Dokumentų `*_slugs` laukai pasensta pervadinus lookup'ą; trinant M2M eilutės
+    # dingsta be `m2m_changed`, todėl receptus renkam prieš tai.
+    if created:
+        return
+    _schedule_bulk_upsert(set(instance.recipes.values_list("id", flat=True)))
+
+
+@receiver(pre_save, sender=Rating, dispatch_uid="recipes.ratings.rating_pre_save")
+def _rating_pre_save(sender, instance: Rating, **kwargs) -> None:
+    previous = None
+    if instance.pk:
+        previous = (
+            Rating.objects.filter(pk=instance.pk).values_list("value", flat=True).first()
+        )
+    instance._previous_value = previous
+
+
+@receiver(post_save, sender=Rating, dispatch_uid="recipes.ratings.rating_post_save")
+def _rating_post_save(sender, instance: Rating, created: bool, **kwargs) -> None:
+    previous = None if created else getattr(instance, "_previous_value", None)
+    if created:
+        RecipeRatingStats.objects.get_or_create(recipe_id=instance.recipe_id)
+    apply_rating_delta(instance.recipe_id, previous, instance.value)
+
+
+@receiver(post_delete, sender=Rating, dispatch_uid="recipes.ratings.rating_post_delete")
+def _rating_post_delete(sender, instance: Rating, **kwargs) -> None:
+    apply_rating_delta(instance.recipe_id, instance.value, None)
+
+
+@receiver(post_save, sender=Recipe, dispatch_uid="recipes.popularity.recipe_post_save")
+def _recipe_popularity_created(sender, instance: Recipe, created: bool, **kwargs) -> None:
+    if created:
+        RecipePopularity.objects.get_or_create(recipe_id=instance.id)
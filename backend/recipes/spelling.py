@@ -0,0 +1,300 @@
+"""Paieškos užklausų taisymas („Galbūt turėjote omenyje…“).
+
+Principai:
+- Žodynas – sulankstyti žodžiai iš publikuotų receptų pavadinimų,
+  ingredientų, tag'ų ir virtuvių, su dažniu (kiek įrašų juos turi). Kiekvienam
+  žodžiui saugomos ir pradinės (su diakritikais) formos – pasiūlyme rodoma
+  dažniausia, pvz. „šaltibarščiai“, o ne „saltibarsciai“.
+- Kandidatai randami „symmetric delete“ indeksu: kiekvienam žodžiui iš anksto
+  sugeneruojami variantai be 1–2 raidžių, užklausos žodžiui – taip pat, ir
+  sankirta patikrinama tikru Damerau-Levenshtein atstumu. Paieška –
+  keli žodyno kreipiniai, be DB.
+- Žodynas atnaujinamas inkrementiškai per tą patį `listing_cache` kanalą kaip
+  pasiūlymai (`recipes.suggest`), nes keičiasi tie patys įrašai.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from collections import Counter
+from collections.abc import Iterable
+
+from . import listing_cache
+from .models import Cuisine, Ingredient, Recipe, Tag
+from .suggest import SUGGEST_CHANNEL, entry_key
+from .text import surface_terms
+
+logger = logging.getLogger(__name__)
+
+# Trumpesni žodžiai netaisomi – per daug dviprasmybių.
+MIN_WORD_LENGTH = 4
+# Iki šio ilgio leidžiama 1 klaida, ilgesniems – 2.
+SINGLE_EDIT_MAX_LENGTH = 6
+
+LABEL_SOURCES = {
+    "recipe": (Recipe.objects.filter(published_at__isnull=False), "title"),
+    "ingredient": (Ingredient.objects.all(), "name"),
+    "tag": (Tag.objects.all(), "name"),
+    "cuisine": (Cuisine.objects.all(), "name"),
+}
+
+
+def max_distance(word: str) -> int:
+    return 1 if len(word) <= SINGLE_EDIT_MAX_LENGTH else 2
+
+
+def deletes(word: str, distance: int) -> set[str]:
+    """Visi `word` variantai be iki `distance` raidžių (įskaitant patį žodį)."""
+
+    result = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {
+            variant[:position] + variant[position + 1:]
+            for variant in frontier
+            for position in range(len(variant))
+        }
+        result |= frontier
+    return result
+
+
+def edit_distance(left: str, right: str, limit: int) -> int:
+    """Damerau-Levenshtein (sukeistos gretimos raidės = 1); > `limit` – `limit + 1`."""
+
+    if abs(len(left) - len(right)) > limit:
+        return limit + 1
+    previous_previous: list[int] = []
+    previous = list(range(len(right) + 1))
+    for i, left_char in enumerate(left, start=1):
+        current = [i] + [0] * len(right)
+        for j, right_char in enumerate(right, start=1):
+            cost = 0 if left_char == right_char else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (
+                i > 1
+                and j > 1
+                and left_char == right[j - 2]
+                and left[i - 2] == right_char
+            ):
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous_previous, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+
+class SpellingIndex:
+    """Vieno proceso taisymo žodynas. Visi metodai saugūs gijoms."""
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._generation: int | None = None
+        self._entry_words: dict[str, tuple[tuple[str, str], ...]] = {}
+        self._frequency: Counter[str] = Counter()
+        self._surfaces: dict[str, Counter[str]] = {}
+        self._deletes: dict[str, set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._frequency)
+
+    # -- užkrovimas ----------------------------------------------------------
+
+    def _fetch(
+        self, keys: Iterable[str] | None = None
+    ) -> dict[str, tuple[tuple[str, str], ...]]:
+        wanted: dict[str, set[int]] | None = None
+        if keys is not None:
+            wanted = {kind: set() for kind in LABEL_SOURCES}
+            for key in keys:
+                kind, _, raw_id = key.partition(":")
+                if kind in wanted:
+                    wanted[kind].add(int(raw_id))
+
+        words: dict[str, tuple[tuple[str, str], ...]] = {}
+        for kind, (qs, field) in LABEL_SOURCES.items():
+            if wanted is not None:
+                if not wanted[kind]:
+                    continue
+                qs = qs.filter(id__in=wanted[kind])
+            for object_id, label in qs.order_by().values_list("id", field).iterator():
+                terms = {
+                    (term, surface)
+                    for term, surface in surface_terms(label)
+                    if len(term) >= MIN_WORD_LENGTH
+                }
+                if terms:
+                    words[entry_key(kind, object_id)] = tuple(sorted(terms))
+        return words
+
+    def _add_word(self, word: str, surface: str) -> None:
+        self._surfaces.setdefault(word, Counter())[surface] += 1
+        self._frequency[word] += 1
+        if self._frequency[word] == 1:
+            for variant in deletes(word, max_distance(word)):
+                self._deletes.setdefault(variant, set()).add(word)
+
+    def _remove_word(self, word: str, surface: str) -> None:
+        surfaces = self._surfaces.get(word)
+        if surfaces is not None:
+            surfaces[surface] -= 1
+            if surfaces[surface] <= 0:
+                del surfaces[surface]
+        self._frequency[word] -= 1
+        if self._frequency[word] > 0:
+            return
+        del self._frequency[word]
+        self._surfaces.pop(word, None)
+        for variant in deletes(word, max_distance(word)):
+            candidates = self._deletes.get(variant)
+            if candidates is None:
+                continue
+            candidates.discard(word)
+            if not candidates:
+                del self._deletes[variant]
+
+    def load(self) -> None:
+        generation = listing_cache.listing_generation(SUGGEST_CHANNEL)
+        entry_words = self._fetch()
+        with self._lock:
+            self._entry_words = {}
+            self._frequency = Counter()
+            self._surfaces = {}
+            self._deletes = {}
+            for key, words in entry_words.items():
+                self._entry_words[key] = words
+                for word, surface in words:
+                    self._add_word(word, surface)
+            self._generation = generation
+
+    def refresh(self, keys: Iterable[str]) -> None:
+        keys = set(keys)
+        if not keys:
+            return
+        fetched = self._fetch(keys)
+        with self._lock:
+            for key in keys:
+                for word, surface in self._entry_words.pop(key, ()):
+                    self._remove_word(word, surface)
+                words = fetched.get(key)
+                if words:
+                    self._entry_words[key] = words
+                    for word, surface in words:
+                        self._add_word(word, surface)
+
+    def sync(self) -> None:
+        if not self._sync_lock.acquire(blocking=self._generation is None):
+            return
+        try:
+            if self._generation is None:
+                self.load()
+                return
+            generation, changed = listing_cache.changes_since(
+                self._generation, channel=SUGGEST_CHANNEL
+            )
+            if generation == self._generation:
+                return
+            if changed is None:
+                self.load()
+                return
+            self.refresh(changed)
+            with self._lock:
+                self._generation = generation
+        finally:
+            self._sync_lock.release()
+
+    # -- užklausos -----------------------------------------------------------
+
+    def correct_word(self, word: str) -> str | None:
+        """Artimiausias žodyno žodis arba `None` (žodis žinomas / netaisomas)."""
+
+        if len(word) < MIN_WORD_LENGTH:
+            return None
+        with self._lock:
+            if word in self._frequency:
+                return None
+            limit = max_distance(word)
+            candidates: set[str] = set()
+            for variant in deletes(word, limit):
+                candidates |= self._deletes.get(variant, set())
+
+            best: tuple[int, int, str] | None = None
+            for candidate in candidates:
+                distance = edit_distance(word, candidate, limit)
+                if distance > limit:
+                    continue
+                rank = (distance, -self._frequency[candidate], candidate)
+                if best is None or rank < best:
+                    best = rank
+        return best[2] if best is not None else None
+
+    def surface(self, word: str) -> str:
+        """Dažniausia `word` forma su diakritikais (žodyne) arba pats `word`."""
+
+        with self._lock:
+            surfaces = self._surfaces.get(word)
+            if not surfaces:
+                return word
+            # Vienodo dažnio formos – pastoviai, pagal abėcėlę.
+            return min(surfaces.items(), key=lambda pair: (-pair[1], pair[0]))[0]
+
+    def correct(self, query: str) -> str | None:
+        """Pataisyta užklausa arba `None`, jei nėra ką taisyti.
+
+        Pataisyti žodžiai grąžinami dažniausia žodyno forma su diakritikais,
+        nepataisyti – kaip parašyti užklausoje (mažosiomis).
+        """
+
+        changed = False
+        corrected: list[str] = []
+        for word, typed in surface_terms(query):
+            replacement = self.correct_word(word)
+            if replacement is not None:
+                changed = True
+                corrected.append(self.surface(replacement))
+            else:
+                corrected.append(typed)
+        return " ".join(corrected) if changed else None
+
+
+_index: SpellingIndex | None = None
+_index_lock = threading.Lock()
+
+
+def get_spelling_index() -> SpellingIndex | None:
+    """Sinchronizuotas proceso žodynas arba `None`, jei nepavyko užkrauti."""
+
+    global _index
+    try:
+        if _index is None:
+            with _index_lock:
+                if _index is None:
+                    index = SpellingIndex()
+                    index.sync()
+                    _index = index
+        _index.sync()
+        return _index
+    except Exception:
+        logger.exception("Taisymo žodynas: nepavyko užkrauti/sinchronizuoti")
+        return None
+
+
+def suggest_correction(query: str) -> str | None:
+    index = get_spelling_index()
+    if index is None:
+        return None
+    return index.correct(query)
+
+
+def warm_spelling_index() -> None:
+    """Užkrauna žodyną paleidžiant procesą (kviečiama iš `wsgi.py` / `asgi.py`)."""
+
+    from django.db import connections
+
+    try:
+        index = get_spelling_index()
+        if index is not None:
+            logger.info("Taisymo žodynas: užkrauta %s žodžių", len(index))
+    finally:
+        connections.close_all()
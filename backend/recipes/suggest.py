@@ -0,0 +1,286 @@
+"""Paieškos laukelio pasiūlymai (typeahead) iš atmintyje laikomo indekso.
+
+Principai:
+- Receptų pavadinimai, ingredientai, tag'ai ir virtuvės laikomi viename
+  surikiuotame `(frazė, raktas)` masyve. Frazės sulankstytos (`fold_text`) ir
+  prasideda kiekvieno žodžio pradžioje, todėl „bulv“ randa ir „Šaltibarščiai
+  su bulvėmis“. Prefikso paieška – `bisect` + nuoseklus skaitymas.
+- Rikiuojama pagal populiarumą (receptui – įvertinimai ir išsaugojimai,
+  lookup'ui – publikuotų receptų skaičius), užklausa DB nepaliečia.
+- Indeksas atnaujinamas inkrementiškai iš `recipes.signals` per atskirą
+  `listing_cache` kanalą; populiarumas perskaičiuojamas pilnu perkrovimu kas
+  `RECIPE_SUGGEST_MAX_AGE` sekundžių.
+- Užklausos gija tik patikrina generaciją (`cache`) ir amžių; DB darbas
+  (pakeitimai ir pilnas perkrovimas) vyksta fono gijoje, o tuo metu
+  atsakoma iš esamo indekso. Blokuojama tik pirmą kartą užkraunant.
+"""
+
+from __future__ import annotations
+
+import bisect
+import logging
+import threading
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db.models import Count, Q
+
+from . import listing_cache
+from .models import Cuisine, Ingredient, Recipe, Tag
+from .text import fold_text
+
+logger = logging.getLogger(__name__)
+
+SUGGEST_CHANNEL = "suggest"
+KINDS = ("recipe", "ingredient", "tag", "cuisine")
+# Kiek prefiksą atitinkančių frazių daugiausiai peržiūrime prieš rikiuojant.
+MAX_CANDIDATES = 2000
+
+LOOKUP_MODELS = {"ingredient": Ingredient, "tag": Tag, "cuisine": Cuisine}
+
+
+@dataclass(frozen=True)
+class SuggestItem:
+    kind: str
+    id: int
+    label: str
+    slug: str
+    popularity: int
+    folded: str = field(init=False, compare=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "folded", fold_text(self.label))
+
+
+def entry_key(kind: str, object_id: int) -> str:
+    return f"{kind}:{object_id}"
+
+
+def _phrases(label: str) -> list[str]:
+    """Sulankstyta frazė nuo kiekvieno žodžio pradžios."""
+
+    words = fold_text(label).split()
+    return [" ".join(words[position:]) for position in range(len(words))]
+
+
+class SuggestIndex:
+    """Vieno proceso pasiūlymų indeksas. Visi metodai saugūs gijoms."""
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._generation: int | None = None
+        self._loaded_at = 0.0
+        self._entries: list[tuple[str, str]] = []
+        self._items: dict[str, SuggestItem] = {}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    # -- užkrovimas ----------------------------------------------------------
+
+    def _fetch(self, keys: Iterable[str] | None = None) -> dict[str, SuggestItem]:
+        wanted: dict[str, set[int]] | None = None
+        if keys is not None:
+            wanted = {kind: set() for kind in KINDS}
+            for key in keys:
+                kind, _, raw_id = key.partition(":")
+                if kind in wanted:
+                    wanted[kind].add(int(raw_id))
+
+        items: dict[str, SuggestItem] = {}
+
+        recipes = Recipe.objects.filter(published_at__isnull=False).order_by()
+        if wanted is not None:
+            recipes = recipes.filter(id__in=wanted["recipe"])
+        if wanted is None or wanted["recipe"]:
+            rows = recipes.values_list(
+                "id", "title", "slug", "rating_stats__rating_count"
+            ).annotate(bookmark_count=Count("bookmarks"))
+            for recipe_id, title, slug, rating_count, bookmark_count in rows:
+                items[entry_key("recipe", recipe_id)] = SuggestItem(
+                    "recipe", recipe_id, title, slug, (rating_count or 0) + bookmark_count
+                )
+
+        for kind, model in LOOKUP_MODELS.items():
+            if wanted is not None and not wanted[kind]:
+                continue
+            qs = model.objects.order_by()
+            if wanted is not None:
+                qs = qs.filter(id__in=wanted[kind])
+            if kind == "ingredient":
+                usage = Count(
+                    "ingredient_recipes__recipe",
+                    filter=Q(ingredient_recipes__recipe__published_at__isnull=False),
+                    distinct=True,
+                )
+            else:
+                usage = Count("recipes", filter=Q(recipes__published_at__isnull=False))
+            for object_id, name, slug, count in qs.annotate(usage=usage).values_list(
+                "id", "name", "slug", "usage"
+            ):
+                items[entry_key(kind, object_id)] = SuggestItem(kind, object_id, name, slug, count)
+        return items
+
+    def load(self) -> None:
+        generation = listing_cache.listing_generation(SUGGEST_CHANNEL)
+        items = self._fetch()
+        entries = sorted(
+            (phrase, key) for key, item in items.items() for phrase in _phrases(item.label)
+        )
+        with self._lock:
+            self._items = items
+            self._entries = entries
+            self._generation = generation
+            self._loaded_at = time.monotonic()
+
+    def refresh(self, keys: Iterable[str]) -> None:
+        keys = set(keys)
+        if not keys:
+            return
+        fetched = self._fetch(keys)
+        with self._lock:
+            for key in keys:
+                previous = self._items.pop(key, None)
+                if previous is not None:
+                    for phrase in _phrases(previous.label):
+                        entry = (phrase, key)
+                        position = bisect.bisect_left(self._entries, entry)
+                        if position < len(self._entries) and self._entries[position] == entry:
+                            del self._entries[position]
+                item = fetched.get(key)
+                if item is not None:
+                    self._items[key] = item
+                    for phrase in _phrases(item.label):
+                        bisect.insort(self._entries, (phrase, key))
+
+    def _is_stale(self) -> bool:
+        max_age = getattr(settings, "RECIPE_SUGGEST_MAX_AGE", 3600)
+        return (
+            time.monotonic() - self._loaded_at > max_age
+            or listing_cache.listing_generation(SUGGEST_CHANNEL) != self._generation
+        )
+
+    def _apply_changes(self) -> None:
+        max_age = getattr(settings, "RECIPE_SUGGEST_MAX_AGE", 3600)
+        if time.monotonic() - self._loaded_at > max_age:
+            self.load()
+            return
+        generation, changed = listing_cache.changes_since(
+            self._generation, channel=SUGGEST_CHANNEL
+        )
+        if generation == self._generation:
+            return
+        if changed is None:
+            self.load()
+            return
+        self.refresh(changed)
+        with self._lock:
+            self._generation = generation
+
+    def _sync_in_background(self) -> None:
+        from django.db import connections
+
+        try:
+            self._apply_changes()
+        except Exception:
+            logger.exception("Pasiūlymų indeksas: nepavyko sinchronizuoti fone")
+        finally:
+            connections.close_all()
+            self._sync_lock.release()
+
+    def sync(self) -> None:
+        if self._generation is None:
+            # Pirmas užkrovimas – be indekso atsakyti nėra iš ko.
+            with self._sync_lock:
+                if self._generation is None:
+                    self.load()
+            return
+        # Kita gija jau sinchronizuoja – nelaukiam, atsakom iš esamo indekso.
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            stale = self._is_stale()
+        except BaseException:
+            self._sync_lock.release()
+            raise
+        if not stale:
+            self._sync_lock.release()
+            return
+        # Užraktą atlaisvina fono gija.
+        threading.Thread(
+            target=self._sync_in_background, name="recipe-suggest-sync", daemon=True
+        ).start()
+
+    # -- užklausos -----------------------------------------------------------
+
+    def suggest(
+        self, query: str, *, limit: int = 8, kinds: Iterable[str] | None = None
+    ) -> list[SuggestItem]:
+        prefix = fold_text(query)
+        if not prefix:
+            return []
+        allowed = set(kinds) if kinds else None
+
+        with self._lock:
+            matches: dict[str, bool] = {}
+            position = bisect.bisect_left(self._entries, (prefix, ""))
+            scanned = 0
+            while position < len(self._entries) and scanned < MAX_CANDIDATES:
+                phrase, key = self._entries[position]
+                if not phrase.startswith(prefix):
+                    break
+                position += 1
+                scanned += 1
+                item = self._items[key]
+                if allowed is not None and item.kind not in allowed:
+                    continue
+                # Ilgiausia frazė prasideda nuo pavadinimo pradžios (ne nuo
+                # vidurinio žodžio) – tokie atitikmenys rodomi pirmi.
+                from_start = len(phrase) == len(item.folded)
+                matches[key] = matches.get(key, False) or from_start
+            candidates = [(self._items[key], from_start) for key, from_start in matches.items()]
+
+        candidates.sort(key=lambda pair: (not pair[1], -pair[0].popularity, len(pair[0].label)))
+        return [item for item, _ in candidates[:limit]]
+
+
+_index: SuggestIndex | None = None
+_index_lock = threading.Lock()
+
+
+def get_suggest_index() -> SuggestIndex | None:
+    """Sinchronizuotas proceso indeksas arba `None`, jei nepavyko užkrauti."""
+
+    global _index
+    try:
+        if _index is None:
+            with _index_lock:
+                if _index is None:
+                    index = SuggestIndex()
+                    index.sync()
+                    _index = index
+        _index.sync()
+        return _index
+    except Exception:
+        logger.exception("Pasiūlymų indeksas: nepavyko užkrauti/sinchronizuoti")
+        return None
+
+
+def warm_suggest_index() -> None:
+    """Užkrauna indeksą paleidžiant procesą (kviečiama iš `wsgi.py` / `asgi.py`)."""
+
+    from django.db import connections
+
+    try:
+        index = get_suggest_index()
+        if index is not None:
+            logger.info("Pasiūlymų indeksas: užkrauta %s įrašų", len(index))
+    finally:
+        connections.close_all()
+
+
+def bump_suggest_generation(keys: Iterable[str] | None) -> None:
+    listing_cache.bump_listing_generation(keys, channel=SUGGEST_CHANNEL)
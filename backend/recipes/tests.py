@@ -1,3 +1,1241 @@
-from django.test import TestCase
+"""Receptų modulio testai (pytest-django + model-bakery)."""
 
-# Create your tests here.
+from __future__ import annotations
+
+import base64
+import copy
+import io
+import os
+import threading
+from collections import Counter
+from datetime import timedelta
+
+import numpy as np
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.utils import timezone
+from model_bakery import baker
+from PIL import Image
+from pilkit.processors import ResizeToFill, ResizeToFit
+
+from . import (
+    filter_index,
+    image_jobs,
+    image_origin,
+    listing_cache,
+    pantry,
+    popularity,
+    recommendations,
+    related,
+    search_backend,
+    signals,
+    spelling,
+    suggest,
+    upstash_search,
+    view_counter,
+)
+from .bm25 import BM25Index
+from .filtering import apply_structured_filters
+from .image_pipeline import VariantSpec, describe_original, render_variants
+from .image_variants import (
+    FORMATS,
+    SIZES,
+    current_variants,
+    generate_variants,
+    is_current,
+    regenerate_variants,
+)
+from .models import (
+    Bookmark,
+    Comment,
+    Cuisine,
+    ImageVariantJob,
+    Ingredient,
+    MealType,
+    Rating,
+    Recipe,
+    RecipeIngredient,
+    RecipePopularity,
+    RecipeRatingStats,
+    RecipeViewDaily,
+    RelatedRecipeUpdate,
+    Tag,
+)
+from .pagination import LIST_ORDERING
+from .ratings import apply_rating_delta, reconcile_rating_stats, set_user_rating
+from .schemas import RecipeFilters
+
+pytestmark = pytest.mark.django_db
+
+User = get_user_model()
+
+
+@pytest.fixture(autouse=True)
+def _fresh_process_state(monkeypatch):
+    # Generacijos ir proceso indeksas gyvena ilgiau nei testo transakcija.
+    cache.clear()
+    monkeypatch.setattr(filter_index, "_index", None)
+    search_backend._result_cache.clear()
+    yield
+    cache.clear()
+
+
+def _stats(recipe: Recipe) -> dict[str, int]:
+    stats = RecipeRatingStats.objects.get(recipe=recipe)
+    return {
+        "sum": stats.rating_sum,
+        "count": stats.rating_count,
+        "histogram": [getattr(stats, f"rating_{value}") for value in range(1, 6)],
+    }
+
+
+# --- Keyset puslapiavimas ---
+
+
+@pytest.mark.parametrize("index_enabled", [True, False])
+def test_cursor_round_trip_with_null_published_at(client, settings, index_enabled):
+    settings.RECIPE_FILTER_INDEX_ENABLED = index_enabled
+    now = timezone.now()
+    published = [now, now, now - timedelta(days=1), None, None, None, now - timedelta(days=2)]
+    recipes = [baker.make(Recipe, published_at=value) for value in published]
+    # Vienodi `updated_at` – rikiavimą lemia tik `id`.
+    Recipe.objects.filter(id__in=[r.id for r in recipes[:2] + recipes[3:5]]).update(updated_at=now)
+
+    seen: list[int] = []
+    cursor = None
+    while True:
+        params = {"limit": 2, "count": "none"}
+        if cursor:
+            params["cursor"] = cursor
+        payload = client.get("/api/recipes/", params).json()
+        seen.extend(item["id"] for item in payload["items"])
+        cursor = payload["next_cursor"]
+        if not cursor:
+            break
+
+    assert seen == list(Recipe.objects.order_by(*LIST_ORDERING).values_list("id", flat=True))
+
+
+def test_invalid_cursor_is_rejected(client):
+    baker.make(Recipe)
+
+    assert client.get("/api/recipes/", {"cursor": "nesąmonė"}).status_code == 400
+
+
+# --- Įvertinimai (`recipes.ratings`) ---
+
+
+def test_set_user_rating_creates_updates_and_ignores_same_value():
+    recipe = baker.make(Recipe)
+    alice, bob = baker.make(User, _quantity=2)
+
+    set_user_rating(user=alice, recipe_id=recipe.pk, value=4)
+    set_user_rating(user=bob, recipe_id=recipe.pk, value=2)
+    assert _stats(recipe) == {"sum": 6, "count": 2, "histogram": [0, 1, 0, 1, 0]}
+
+    set_user_rating(user=alice, recipe_id=recipe.pk, value=5)
+    assert _stats(recipe) == {"sum": 7, "count": 2, "histogram": [0, 1, 0, 0, 1]}
+    assert Rating.objects.get(user=alice, recipe=recipe).value == 5
+
+    set_user_rating(user=alice, recipe_id=recipe.pk, value=5)
+    assert _stats(recipe) == {"sum": 7, "count": 2, "histogram": [0, 1, 0, 0, 1]}
+    assert Rating.objects.filter(recipe=recipe).count() == 2
+
+
+def test_apply_rating_delta():
+    recipe = baker.make(Recipe)
+    RecipeRatingStats.objects.create(recipe=recipe)
+
+    apply_rating_delta(recipe.pk, None, 3)
+    apply_rating_delta(recipe.pk, None, 5)
+    assert _stats(recipe) == {"sum": 8, "count": 2, "histogram": [0, 0, 1, 0, 1]}
+
+    apply_rating_delta(recipe.pk, 3, 1)
+    assert _stats(recipe) == {"sum": 6, "count": 2, "histogram": [1, 0, 0, 0, 1]}
+
+    apply_rating_delta(recipe.pk, 5, None)
+    assert _stats(recipe) == {"sum": 1, "count": 1, "histogram": [1, 0, 0, 0, 0]}
+
+    apply_rating_delta(recipe.pk, 1, 1)
+    assert _stats(recipe) == {"sum": 1, "count": 1, "histogram": [1, 0, 0, 0, 0]}
+
+
+def test_apply_rating_delta_without_stats_row_is_noop():
+    recipe = baker.make(Recipe)
+
+    apply_rating_delta(recipe.pk, None, 4)
+    assert not RecipeRatingStats.objects.filter(recipe=recipe).exists()
+
+
+def test_admin_save_and_delete_update_stats_via_signals():
+    recipe = baker.make(Recipe)
+    user = baker.make(User)
+
+    rating = Rating.objects.create(user=user, recipe=recipe, value=2)
+    assert _stats(recipe) == {"sum": 2, "count": 1, "histogram": [0, 1, 0, 0, 0]}
+
+    rating.value = 4
+    rating.save()
+    assert _stats(recipe) == {"sum": 4, "count": 1, "histogram": [0, 0, 0, 1, 0]}
+
+    rating.delete()
+    assert _stats(recipe) == {"sum": 0, "count": 0, "histogram": [0, 0, 0, 0, 0]}
+
+
+def test_user_cascade_delete_updates_stats():
+    recipe = baker.make(Recipe)
+    alice, bob = baker.make(User, _quantity=2)
+    set_user_rating(user=alice, recipe_id=recipe.pk, value=5)
+    set_user_rating(user=bob, recipe_id=recipe.pk, value=3)
+
+    alice.delete()
+    assert _stats(recipe) == {"sum": 3, "count": 1, "histogram": [0, 0, 1, 0, 0]}
+
+
+def test_recipe_cascade_delete_removes_stats():
+    recipe = baker.make(Recipe)
+    set_user_rating(user=baker.make(User), recipe_id=recipe.pk, value=5)
+
+    recipe.delete()
+    assert not RecipeRatingStats.objects.exists()
+    assert not Rating.objects.exists()
+
+
+def test_reconcile_rating_stats_fixes_corrupted_summary():
+    first, second = baker.make(Recipe, _quantity=2)
+    user = baker.make(User)
+    set_user_rating(user=user, recipe_id=first.pk, value=4)
+    set_user_rating(user=user, recipe_id=second.pk, value=2)
+
+    RecipeRatingStats.objects.filter(recipe=first).update(rating_sum=99, rating_count=7)
+    assert reconcile_rating_stats(dry_run=True) == 1
+    assert _stats(first)["sum"] == 99
+
+    assert reconcile_rating_stats() == 1
+    assert _stats(first) == {"sum": 4, "count": 1, "histogram": [0, 0, 0, 1, 0]}
+    assert reconcile_rating_stats() == 0
+
+
+def test_queryset_update_bypasses_stats_until_reconciled():
+    recipe = baker.make(Recipe)
+    set_user_rating(user=baker.make(User), recipe_id=recipe.pk, value=1)
+
+    Rating.objects.filter(recipe=recipe).update(value=5)
+    assert _stats(recipe) == {"sum": 1, "count": 1, "histogram": [1, 0, 0, 0, 0]}
+
+    assert reconcile_rating_stats([recipe.pk]) == 1
+    assert _stats(recipe) == {"sum": 5, "count": 1, "histogram": [0, 0, 0, 0, 1]}
+
+
+def test_reconcile_rating_stats_creates_missing_and_zeroes_orphans():
+    rated, unrated = baker.make(Recipe, _quantity=2)
+    Rating.objects.bulk_create([Rating(user=baker.make(User), recipe=rated, value=3)])
+    RecipeRatingStats.objects.create(recipe=unrated, rating_sum=5, rating_count=1, rating_5=1)
+
+    assert reconcile_rating_stats() == 2
+    assert _stats(rated) == {"sum": 3, "count": 1, "histogram": [0, 0, 1, 0, 0]}
+    assert _stats(unrated) == {"sum": 0, "count": 0, "histogram": [0, 0, 0, 0, 0]}
+
+
+# --- Sąrašo total ir jo talpykla ---
+
+
+def test_list_total_is_cached_per_generation(client, settings, django_capture_on_commit_callbacks):
+    settings.RECIPE_FILTER_INDEX_ENABLED = False
+    baker.make(Recipe, difficulty="easy", _quantity=3)
+
+    def total(**params):
+        return client.get("/api/recipes/", {"difficulty": "easy", **params}).json()["total"]
+
+    assert total() == 3
+    assert total(count="none") is None
+
+    # Be generacijos padidinimo (on_commit neįvykdytas) – grąžinamas talpinamas kiekis,
+    # nepriklausomai nuo puslapio.
+    baker.make(Recipe, difficulty="easy")
+    assert total(offset=2) == 3
+    assert total(count="estimate") == 3
+
+    with django_capture_on_commit_callbacks(execute=True):
+        baker.make(Recipe, difficulty="easy")
+    assert total() == 5
+
+
+def test_normalize_filters_ignores_paging_order_and_case():
+    first = RecipeFilters(search="  Šalti  Barščiai ", tag=["b", "a"], limit=5, offset=10)
+    second = RecipeFilters(search="šalti barščiai", tag=["a", "b"], cursor="x", count="none")
+
+    assert listing_cache.normalize_filters(first) == listing_cache.normalize_filters(second)
+    assert listing_cache.normalize_filters(RecipeFilters(tag=["a"])) != (
+        listing_cache.normalize_filters(RecipeFilters(tag=["b"]))
+    )
+
+
+# --- Struktūriniai filtrai: bitmap indeksas ir DB kelias ---
+
+
+@pytest.fixture
+def filterable_recipes():
+    vegan, quick, cold = (baker.make(Tag, slug=slug) for slug in ("vegan", "greita", "salta"))
+    lithuanian = baker.make(Cuisine, slug="lietuviu")
+    recipes = []
+    for i in range(12):
+        recipe = baker.make(Recipe, difficulty=("easy", "medium", "hard")[i % 3])
+        recipe.tags.set([tag for k, tag in enumerate((vegan, quick, cold)) if i >> k & 1])
+        if i % 4 == 0:
+            recipe.cuisines.add(lithuanian)
+        recipes.append(recipe)
+    return recipes
+
+
+@pytest.mark.parametrize(
+    "filters",
+    [
+        {},
+        {"tag": ["vegan"]},
+        {"tag": ["vegan", "greita"]},
+        {"tag": ["vegan|salta"]},
+        {"tag": ["!greita"]},
+        {"tag": ["!vegan|salta"]},
+        {"tag": ["vegan", "!salta"], "difficulty": ["easy|hard"]},
+        {"tag": ["greita|salta", "!vegan"], "cuisine": ["lietuviu"]},
+        {"cuisine": ["!lietuviu"], "difficulty": ["!medium"]},
+        {"tag": ["nera"]},
+        {"tag": ["!nera"]},
+    ],
+)
+def test_filter_index_matches_db_filtering(filterable_recipes, filters):
+    recipe_filters = RecipeFilters(**filters)
+    index = filter_index.RecipeFilterIndex()
+    index.load()
+
+    expected = set(
+        apply_structured_filters(Recipe.objects.all(), recipe_filters).values_list("id", flat=True)
+    )
+    assert set(index.resolve(recipe_filters)) == expected
+
+
+# --- Filtrų kiekiai (facets) ---
+
+
+class FakeSearchBackend:
+    """Paieškos backend'as testams: bet kokiai užklausai grąžina `ids` (iki `limit`)."""
+
+    ids: list[int] = []
+    limits: list[int] = []
+    indexed: list[int] = []
+
+    def is_enabled(self) -> bool:
+        return True
+
+    def index_recipe(self, recipe_id: int) -> None:
+        FakeSearchBackend.indexed.append(recipe_id)
+
+    def delete_recipe(self, recipe_id: int) -> None:
+        pass
+
+    def bulk_index(self, recipe_ids=None) -> int:
+        FakeSearchBackend.indexed.extend(recipe_ids or ())
+        return len(recipe_ids or ())
+
+    def filter_key(self, filters) -> str:
+        return ""
+
+    def search(self, query: str, *, limit: int, filters=None) -> list[int]:
+        FakeSearchBackend.limits.append(limit)
+        return FakeSearchBackend.ids[:limit]
+
+
+@pytest.fixture
+def fake_search(settings, monkeypatch):
+    settings.RECIPE_SEARCH_BACKEND = "recipes.tests.FakeSearchBackend"
+    monkeypatch.setattr(FakeSearchBackend, "ids", [])
+    monkeypatch.setattr(FakeSearchBackend, "limits", [])
+    monkeypatch.setattr(FakeSearchBackend, "indexed", [])
+    return FakeSearchBackend
+
+
+def _bulk_recipes(count: int) -> list[Recipe]:
+    now = timezone.now()
+    return Recipe.objects.bulk_create(
+        Recipe(
+            title=f"Receptas {i}",
+            slug=f"receptas-{i}",
+            preparation_time=10,
+            cooking_time=20,
+            difficulty="easy" if i % 3 else "hard",
+            published_at=now,
+        )
+        for i in range(count)
+    )
+
+
+def _facet_counts(payload: dict) -> dict[str, dict[str, int]]:
+    return {
+        dimension: {bucket["slug"]: bucket["count"] for bucket in buckets}
+        for dimension, buckets in payload.items()
+        if dimension != "truncated"
+    }
+
+
+@pytest.mark.parametrize("filters", [{}, {"tag": ["vegan"]}, {"tag": ["!salta"]}])
+def test_facets_from_index_match_db(client, settings, filterable_recipes, filters):
+    settings.RECIPE_FILTER_INDEX_ENABLED = True
+    from_index = client.get("/api/recipes/facets", filters).json()
+    cache.clear()
+    settings.RECIPE_FILTER_INDEX_ENABLED = False
+    from_db = client.get("/api/recipes/facets", filters).json()
+
+    assert from_index == from_db
+    assert not from_index["truncated"]
+
+
+def test_facet_counts(client, filterable_recipes):
+    payload = client.get("/api/recipes/facets", {"tag": ["vegan"]}).json()
+
+    # Receptai su nelyginiu `i` – vegan; iš jų `greita` – i & 2, `salta` – i & 4.
+    assert _facet_counts(payload) == {
+        "tags": {"vegan": 6, "greita": 3, "salta": 2},
+        "categories": {},
+        "cuisines": {},
+        "meal_types": {},
+        "difficulties": {"easy": 2, "medium": 2, "hard": 2},
+    }
+    assert [bucket["slug"] for bucket in payload["tags"]][0] == "vegan"
+
+
+def test_search_facets_cover_all_results_not_first_chunk(client, settings, fake_search):
+    recipes = _bulk_recipes(1500)
+    vegan = baker.make(Tag, slug="vegan")
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe_id=recipe.id, tag_id=vegan.id) for recipe in recipes[::2]
+    )
+    fake_search.ids = [recipe.id for recipe in reversed(recipes)]
+
+    # Sąrašo puslapis sušildo talpyklą tik pirmu chunk'u (1000 ID).
+    assert len(client.get("/api/recipes/", {"search": "receptas"}).json()["items"]) == 20
+    payload = client.get("/api/recipes/facets", {"search": "receptas"}).json()
+
+    assert _facet_counts(payload)["tags"] == {"vegan": 750}
+    assert _facet_counts(payload)["difficulties"] == {"easy": 1000, "hard": 500}
+    assert not payload["truncated"]
+
+    cache.clear()
+    settings.RECIPE_SEARCH_MAX_RESULTS = 1200
+    search_backend._result_cache.clear()
+    payload = client.get("/api/recipes/facets", {"search": "receptas"}).json()
+    assert payload["truncated"]
+    assert sum(_facet_counts(payload)["difficulties"].values()) == 1200
+
+
+# --- Struktūriniai filtrai Upstash užklausoje ---
+
+
+def test_build_filter_expression():
+    filters = RecipeFilters(tag=["vegan|greita", "!astru"], difficulty=["easy"])
+
+    assert upstash_search.build_filter_expression(filters) == (
+        "(tag_slugs GLOB '*|greita|*' OR tag_slugs GLOB '*|vegan|*')"
+        " AND tag_slugs NOT GLOB '*|astru|*'"
+        " AND difficulty IN ('easy')"
+    )
+    assert upstash_search.build_filter_expression(RecipeFilters()) == ""
+    # Ne slugas – išraiškos nekuriam, filtruojama lokaliai.
+    assert upstash_search.build_filter_expression(RecipeFilters(tag=["a' OR 1"])) == ""
+
+
+def test_recipe_document_has_slug_fields():
+    recipe = baker.make(Recipe, difficulty="easy")
+    recipe.tags.set([baker.make(Tag, slug="vegan"), baker.make(Tag, slug="greita")])
+    recipe.meal_types.add(baker.make(MealType, slug="pietus"))
+
+    content = upstash_search.build_recipe_document(recipe)["content"]
+    assert content["tag_slugs"] == "|greita|vegan|"
+    assert content["meal_type_slugs"] == "|pietus|"
+    assert content["cuisine_slugs"] == ""
+    assert content["difficulty"] == "easy"
+
+
+def test_search_documents_follow_lookup_changes(fake_search, django_capture_on_commit_callbacks):
+    first, second = baker.make(Recipe, _quantity=2)
+    meal_type = baker.make(MealType, slug="pietus")
+    tag = baker.make(Tag, slug="vegan")
+
+    with django_capture_on_commit_callbacks(execute=True):
+        first.meal_types.add(meal_type)
+    assert fake_search.indexed == [first.id]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        tag.recipes.add(first, second)
+    assert sorted(fake_search.indexed[1:]) == [first.id, second.id]
+
+    # Pervadintas slugas – visų jo receptų dokumentai perrašomi.
+    fake_search.indexed.clear()
+    with django_capture_on_commit_callbacks(execute=True):
+        tag.slug = "veganiska"
+        tag.save()
+    assert sorted(fake_search.indexed) == [first.id, second.id]
+
+    fake_search.indexed.clear()
+    with django_capture_on_commit_callbacks(execute=True):
+        tag.delete()
+    assert sorted(fake_search.indexed) == [first.id, second.id]
+
+
+# --- Paieškos rezultatų sąrašai ir puslapiavimas po 1000 ---
+
+
+def test_search_total_is_unknown_until_all_ids_are_fetched(client, fake_search):
+    recipes = _bulk_recipes(1500)
+    fake_search.ids = [recipe.id for recipe in reversed(recipes)]
+
+    first = client.get("/api/recipes/", {"search": "receptas"}).json()
+    assert first["total"] is None
+    assert [item["id"] for item in first["items"]] == fake_search.ids[:20]
+    assert fake_search.limits == [1000]
+
+    deep = client.get("/api/recipes/", {"search": "receptas", "offset": 1200}).json()
+    assert deep["total"] == 1500
+    assert [item["id"] for item in deep["items"]] == fake_search.ids[1200:1220]
+    assert fake_search.limits == [1000, 2000]
+
+    # Pilnas sąrašas jau talpykloje – total žinomas ir pirmam puslapiui.
+    assert client.get("/api/recipes/", {"search": "receptas"}).json()["total"] == 1500
+    assert fake_search.limits == [1000, 2000]
+
+
+def test_search_cursor_pages_past_first_chunk(client, fake_search):
+    recipes = _bulk_recipes(1100)
+    fake_search.ids = [recipe.id for recipe in recipes]
+
+    seen: list[int] = []
+    cursor = None
+    while True:
+        params = {"search": "receptas", "limit": 100, "count": "none"}
+        if cursor:
+            params["cursor"] = cursor
+        payload = client.get("/api/recipes/", params).json()
+        seen.extend(item["id"] for item in payload["items"])
+        cursor = payload["next_cursor"]
+        if not cursor:
+            break
+
+    assert seen == fake_search.ids
+    assert fake_search.limits == [1000, 2000]
+
+
+# --- DB paieška be Upstash (`recipes.fulltext`) ---
+
+
+def test_search_document_is_folded_and_found_without_diacritics(
+    client, django_capture_on_commit_callbacks
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        recipe = baker.make(
+            Recipe,
+            title="Šaltibarščiai",
+            description="",
+            description_html="<p>Gaivi <b>vasaros</b> sriuba</p>",
+            published_at=timezone.now(),
+        )
+        baker.make(Recipe, title="Cepelinai", published_at=timezone.now())
+    with django_capture_on_commit_callbacks(execute=True):
+        baker.make(
+            RecipeIngredient, recipe=recipe, ingredient=baker.make(Ingredient, name="Burokėliai")
+        )
+        recipe.tags.add(baker.make(Tag, name="Lietuviška"))
+
+    recipe.refresh_from_db()
+    assert recipe.search_document == "saltibarsciai gaivi vasaros sriuba burokeliai lietuviska"
+
+    for query in ("saltibarsciai", "BUROKĖL", "vasaros sriuba"):
+        payload = client.get("/api/recipes/", {"search": query}).json()
+        assert [item["id"] for item in payload["items"]] == [recipe.id], query
+    assert client.get("/api/recipes/", {"search": "sriuba cepelinai"}).json()["items"] == []
+
+
+# --- BM25 segmentas + žurnalas ---
+
+
+def test_bm25_segment_and_journal_round_trip(tmp_path):
+    reader = BM25Index(tmp_path)
+    assert reader.search("sriuba", limit=10) is None
+
+    BM25Index(tmp_path).rebuild(
+        {1: (3, {"burokeliai": 2, "sriuba": 1}), 2: (2, {"sriuba": 1, "salta": 1})}
+    )
+    assert reader.search("burokeliai", limit=10) == [1]
+    assert sorted(reader.search("sriuba", limit=10)) == [1, 2]
+
+    # Kitas procesas rašo į žurnalą; skaitytuvas pakeitimus pamato be perkrovimo.
+    writer = BM25Index(tmp_path)
+    writer.append(
+        [
+            {"op": "put", "id": 3, "len": 2, "tf": {"burokeliai": 1, "kefyras": 1}},
+            {"op": "del", "id": 2},
+            {"op": "put", "id": 1, "len": 1, "tf": {"agurkai": 1}},
+        ]
+    )
+    expected = {"burokeliai": [3], "sriuba": [], "agurkai": [1], "kef": [3]}
+    for query, ids in expected.items():
+        assert reader.search(query, limit=10) == ids
+        assert BM25Index(tmp_path).search(query, limit=10) == ids
+
+    writer.compact()
+    assert not list(tmp_path.glob("journal-1.jsonl"))
+    fresh = BM25Index(tmp_path)
+    fresh.refresh()
+    assert fresh._segment.documents() == {
+        1: (1, {"agurkai": 1}),
+        3: (2, {"burokeliai": 1, "kefyras": 1}),
+    }
+    for query, ids in expected.items():
+        assert reader.search(query, limit=10) == ids
+
+
+# --- Paieškos pasiūlymai (`recipes.suggest`) ---
+
+
+def test_suggest_ranks_title_start_then_popularity():
+    now = timezone.now()
+    middle = baker.make(Recipe, title="Šaltibarščiai su bulvėmis", published_at=now)
+    popular = baker.make(Recipe, title="Bulviniai blynai", published_at=now)
+    plain = baker.make(Recipe, title="Bulvių plokštainis", published_at=now)
+    baker.make(Recipe, title="Bulvių košė", published_at=None)
+    RecipeRatingStats.objects.update_or_create(recipe=middle, defaults={"rating_count": 9})
+    RecipeRatingStats.objects.update_or_create(recipe=popular, defaults={"rating_count": 2})
+    baker.make("recipes.Bookmark", recipe=popular)
+    ingredient = baker.make(Ingredient, name="Bulvės")
+    baker.make(RecipeIngredient, recipe=plain, ingredient=ingredient)
+
+    index = suggest.SuggestIndex()
+    index.load()
+
+    # Pavadinimo pradžia pirmiau už vidurinį žodį, toliau – populiarumas.
+    assert [item.id for item in index.suggest("BULV", kinds=["recipe"])] == [
+        popular.id,
+        plain.id,
+        middle.id,
+    ]
+    assert [(item.kind, item.id) for item in index.suggest("bulves")] == [
+        ("ingredient", ingredient.id)
+    ]
+    assert index.suggest("bulv", limit=1, kinds=["recipe"])[0].id == popular.id
+
+    # Inkrementinis atnaujinimas: senos frazės dingsta, naujos atsiranda.
+    Recipe.objects.filter(id=plain.id).update(title="Kugelis")
+    index.refresh([suggest.entry_key("recipe", plain.id)])
+    assert plain.id not in [item.id for item in index.suggest("bulv", kinds=["recipe"])]
+    assert [item.id for item in index.suggest("kug")] == [plain.id]
+
+
+# --- „Galbūt turėjote omenyje…“ (`recipes.spelling`) ---
+
+
+def test_empty_search_returns_did_you_mean(
+    client, settings, monkeypatch, django_capture_on_commit_callbacks
+):
+    monkeypatch.setattr(spelling, "_index", None)
+    with django_capture_on_commit_callbacks(execute=True):
+        soup = baker.make(Recipe, title="Šaltibarščiai", published_at=timezone.now())
+        baker.make(Recipe, title="Cepelinai su mėsa", published_at=timezone.now())
+
+    payload = client.get("/api/recipes/", {"search": "saltibarsciaj su"}).json()
+    assert payload["items"] == []
+    assert payload["did_you_mean"] == "šaltibarščiai su"
+    assert payload["autocorrected"] is False
+
+    # Rastų rezultatų netaisom; netaisomi ir tolesni puslapiai.
+    assert client.get("/api/recipes/", {"search": "cepelinai"}).json()["did_you_mean"] is None
+    deep = client.get("/api/recipes/", {"search": "saltibarsciaj", "offset": 20}).json()
+    assert deep["did_you_mean"] is None
+
+    settings.RECIPE_SEARCH_AUTOCORRECT = True
+    corrected = client.get("/api/recipes/", {"search": "saltibarsciaj"}).json()
+    assert [item["id"] for item in corrected["items"]] == [soup.id]
+    assert corrected["did_you_mean"] == "šaltibarščiai"
+    assert corrected["autocorrected"] is True
+
+
+# --- Panašūs receptai (`recipes.related`) ---
+
+
+def _features(**recipes: list[int]) -> dict[int, np.ndarray]:
+    return {int(name[1:]): np.array(values, dtype=np.uint64) for name, values in recipes.items()}
+
+
+def test_related_orders_by_similarity_and_incremental_matches_rebuild(tmp_path):
+    before = _features(
+        r1=[1, 2, 3, 4, 5, 6],
+        r2=[1, 2, 3, 4, 5, 7],
+        r3=[1, 2, 3, 8, 9, 10],
+        r4=[20, 21, 22],
+        r5=[20, 21, 23],
+    )
+    index = related.RelatedIndex(tmp_path)
+    assert index.related(1) is None
+    index.rebuild(before)
+
+    assert index.related(1) == [2, 3]
+    assert index.related(4) == [5]
+    assert index.related(1, limit=1) == [2]
+    assert index.related(99) == []
+
+    # r2 pakeistas, r5 išimtas, r6 naujas – kaip pilnas perstatymas.
+    after = {**before, **_features(r2=[20, 21, 22, 24], r6=[1, 2, 3, 4, 5])}
+    del after[5]
+    changed = {2, 5, 6}
+    incremental = related.apply_changes(
+        related.build_index(before), {rid: after[rid] for rid in changed if rid in after}, changed
+    )
+    rebuilt = related.build_index(after)
+    assert incremental["id"].tolist() == rebuilt["id"].tolist()
+    assert incremental["neighbours"].tolist() == rebuilt["neighbours"].tolist()
+    assert rebuilt["neighbours"][0][:2].tolist() == [6, 3]
+
+
+def test_related_queue_only_on_feature_changes(monkeypatch, django_capture_on_commit_callbacks):
+    # Ankstesnių testų (atšauktų transakcijų) sukaupti ID čia nereikalingi.
+    monkeypatch.setattr(signals, "_related_pending", threading.local())
+    recipe = baker.make(Recipe, published_at=timezone.now())
+
+    def queued() -> list[int]:
+        return list(RelatedRecipeUpdate.objects.values_list("recipe_id", flat=True))
+
+    with django_capture_on_commit_callbacks(execute=True):
+        recipe.title = "Kitas pavadinimas"
+        recipe.save()
+    assert queued() == []
+
+    with django_capture_on_commit_callbacks(execute=True):
+        baker.make(RecipeIngredient, recipe=recipe)
+        recipe.tags.add(baker.make(Tag))
+    assert queued() == [recipe.id]
+
+    RelatedRecipeUpdate.objects.all().delete()
+    with django_capture_on_commit_callbacks(execute=True):
+        recipe.published_at = None
+        recipe.save()
+    assert queued() == [recipe.id]
+
+
+# --- Asmeninės rekomendacijos (`recipes.recommendations`) ---
+
+
+def test_recommendations_rank_cooccurrence_and_skip_seen(tmp_path):
+    a, b, c, d, e = baker.make(Recipe, published_at=timezone.now(), _quantity=5)
+    first, second, third, fourth, target = baker.make(User, _quantity=5)
+    for user, recipe in [(first, a), (first, b), (second, a), (second, b), (third, a)]:
+        baker.make(Bookmark, user=user, recipe=recipe)
+    baker.make(Bookmark, user=third, recipe=c)
+    baker.make(Rating, user=second, recipe=c, value=4)
+    # 1★ – ne skonio ženklas; atskiras naudotojas be bendrų receptų.
+    baker.make(Rating, user=fourth, recipe=d, value=1)
+    baker.make(Bookmark, user=fourth, recipe=e)
+    baker.make(Bookmark, user=target, recipe=a)
+
+    index = recommendations.RecommendationIndex(tmp_path)
+    assert index.recommend(target.id, limit=10) is None
+    index.rebuild()
+
+    assert index.recommend(target.id, limit=10) == [b.id, c.id]
+    assert index.recommend(target.id, limit=1) == [b.id]
+    assert index.recommend(fourth.id, limit=10) == []
+
+    # Jau matytas (net ir prastai įvertintas) receptas nerekomenduojamas.
+    baker.make(Rating, user=target, recipe=b, value=2)
+    assert index.recommend(target.id, limit=10) == [c.id]
+
+
+# --- Populiarumo įverčiai (`recipes.popularity`) ---
+
+
+def _scores() -> dict[int, int]:
+    return dict(RecipePopularity.objects.values_list("recipe_id", "popular_score"))
+
+
+def test_update_scores_applies_only_new_events(client):
+    first, second, third = baker.make(Recipe, published_at=timezone.now(), _quantity=3)
+    assert _scores() == {first.id: 0, second.id: 0, third.id: 0}
+    baker.make(Bookmark, recipe=first)
+    baker.make(Rating, recipe=second, value=5)
+    comment = baker.make(Comment, recipe=third, is_approved=False)
+
+    assert popularity.update_scores() == {"rating": 1, "bookmark": 1, "comment": 0}
+    assert _scores() == {first.id: 2, second.id: 1, third.id: 0}
+    trending = RecipePopularity.objects.get(recipe=first).trending_score
+
+    # Be naujų įvykių niekas nepasikeičia (tie patys įvykiai dar kartą neskaičiuojami).
+    assert popularity.update_scores() == {"rating": 0, "bookmark": 0, "comment": 0}
+    assert _scores() == {first.id: 2, second.id: 1, third.id: 0}
+    assert RecipePopularity.objects.get(recipe=first).trending_score == trending
+
+    Comment.objects.filter(id=comment.id).update(is_approved=True)
+    baker.make(Bookmark, recipe=second)
+    assert popularity.update_scores() == {"rating": 0, "bookmark": 1, "comment": 1}
+    assert _scores() == {first.id: 2, second.id: 3, third.id: 3}
+
+    popularity.update_scores(rebuild=True)
+    assert _scores() == {first.id: 2, second.id: 3, third.id: 3}
+
+    # Lygūs įverčiai – pagal ID mažėjančiai; cursor'is tęsia tą pačią tvarką.
+    page = client.get("/api/recipes/", {"sort": "popular", "limit": 2}).json()
+    assert [item["id"] for item in page["items"]] == [third.id, second.id]
+    rest = client.get(
+        "/api/recipes/", {"sort": "popular", "limit": 2, "cursor": page["next_cursor"]}
+    ).json()
+    assert [item["id"] for item in rest["items"]] == [first.id]
+    assert rest["next_cursor"] is None
+
+
+# --- Peržiūrų skaitiklis (`recipes.view_counter`) ---
+
+
+@pytest.fixture
+def view_buffer(monkeypatch):
+    # Foninės gijos nepaleidžiam – buferį įrašo pats testas.
+    monkeypatch.setattr(view_counter, "_buffer", Counter())
+    monkeypatch.setattr(view_counter, "_flusher_pid", os.getpid())
+    return view_counter._buffer
+
+
+def _daily_views() -> dict[int, int]:
+    return dict(RecipeViewDaily.objects.values_list("recipe_id", "views"))
+
+
+def test_flush_views_upserts_daily_counts(view_buffer):
+    first, second = baker.make(Recipe, _quantity=2)
+    for recipe_id in (first.id, first.id, second.id, 999_999):
+        view_counter.record_view(recipe_id)
+    assert view_counter.pending_views(first.id) == 2
+
+    # Ištrinto recepto peržiūros praleidžiamos.
+    assert view_counter.flush_views() == 3
+    assert _daily_views() == {first.id: 2, second.id: 1}
+    assert not view_buffer
+    assert view_counter.flush_views() == 0
+
+    view_counter.record_view(first.id)
+    view_counter.flush_views()
+    assert _daily_views() == {first.id: 3, second.id: 1}
+
+
+def test_failed_flush_returns_views_to_buffer(view_buffer, monkeypatch):
+    recipe = baker.make(Recipe)
+    view_counter.record_view(recipe.id)
+    upsert = view_counter._upsert
+
+    def fail(rows):
+        view_counter.record_view(recipe.id)  # įrašymo metu atėjusi peržiūra
+        raise RuntimeError("DB nepasiekiama")
+
+    monkeypatch.setattr(view_counter, "_upsert", fail)
+    with pytest.raises(RuntimeError):
+        view_counter.flush_views()
+    assert view_counter.pending_views(recipe.id) == 2
+
+    monkeypatch.setattr(view_counter, "_upsert", upsert)
+    assert view_counter.flush_views() == 1
+    assert _daily_views() == {recipe.id: 2}
+
+
+# --- „Ką galiu pagaminti?“ (`recipes.pantry`) ---
+
+
+def test_pantry_ranks_by_coverage_or_missing_with_exclusions(client, monkeypatch):
+    monkeypatch.setattr(pantry, "_index", None)
+    ingredients = {slug: baker.make(Ingredient, slug=slug) for slug in "bsvmkxyr"}
+
+    def recipe(slugs: str, published: bool = True) -> Recipe:
+        instance = baker.make(Recipe, published_at=timezone.now() if published else None)
+        for slug in slugs:
+            baker.make(RecipeIngredient, recipe=instance, ingredient=ingredients[slug])
+        return instance
+
+    full = recipe("bs")
+    large = recipe("bsvmkxy")
+    small = recipe("bmk")
+    nuts = recipe("br")
+    recipe("mk")
+    recipe("bs", published=False)
+
+    def ids(**params) -> list[int]:
+        payload = client.get("/api/recipes/pantry", {"ingredient": ["b", "s", "v"], **params})
+        return [item["id"] for item in payload.json()["items"]]
+
+    assert ids() == [full.id, nuts.id, large.id, small.id]
+    assert ids(rank="missing") == [full.id, nuts.id, small.id, large.id]
+    assert ids(exclude="r") == [full.id, large.id, small.id]
+    assert ids(exclude="r", rank="missing") == [full.id, small.id, large.id]
+    assert ids(rank="missing", max_missing=2) == [full.id, nuts.id, small.id]
+
+    payload = client.get("/api/recipes/pantry", {"ingredient": ["b", "s", "v"], "limit": 3})
+    assert payload.json()["total"] == 4
+    item = payload.json()["items"][2]
+    assert (item["id"], item["matched"], item["missing"]) == (large.id, 3, 4)
+    assert item["coverage"] == round(3 / 7, 4)
+
+
+# --- Viešos detalės talpykla (`recipes.detail_cache`) ---
+
+
+def test_detail_cache_invalidated_by_m2m_and_comments(
+    client, settings, django_capture_on_commit_callbacks
+):
+    settings.RECIPE_VIEW_COUNTER_ENABLED = False
+    recipe = baker.make(Recipe, slug="kugelis", title="Kugelis", published_at=timezone.now())
+    cuisine = baker.make(Cuisine, slug="lietuviu")
+    url = "/api/recipes/kugelis"
+
+    assert client.get(url).json()["cuisines"] == []
+    # `update()` signalų nekelia – atsakymas lieka iš talpyklos.
+    Recipe.objects.filter(id=recipe.id).update(title="Bulvių plokštainis")
+    assert client.get(url).json()["title"] == "Kugelis"
+
+    with django_capture_on_commit_callbacks(execute=True):
+        recipe.cuisines.add(cuisine)
+    detail = client.get(url).json()
+    assert detail["title"] == "Bulvių plokštainis"
+    assert [item["slug"] for item in detail["cuisines"]] == ["lietuviu"]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        cuisine.recipes.remove(recipe)
+    assert client.get(url).json()["cuisines"] == []
+
+    with django_capture_on_commit_callbacks(execute=True):
+        comment = baker.make(Comment, recipe=recipe, is_approved=True, content="Skanu!")
+    assert [item["content"] for item in client.get(url).json()["comments"]] == ["Skanu!"]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        comment.delete()
+    assert client.get(url).json()["comments"] == []
+
+
+# --- ETag / 304 ---
+
+
+def test_list_etag_not_modified_and_invalidated_by_edit(client, django_capture_on_commit_callbacks):
+    recipe = baker.make(Recipe, published_at=timezone.now())
+
+    first = client.get("/api/recipes/")
+    etag = first["ETag"]
+    assert first.status_code == 200 and etag
+
+    assert client.get("/api/recipes/", HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    with django_capture_on_commit_callbacks(execute=True):
+        recipe.title = "Šaltibarščiai"
+        recipe.save()
+
+    changed = client.get("/api/recipes/", HTTP_IF_NONE_MATCH=etag)
+    assert changed.status_code == 200
+    assert changed["ETag"] != etag
+    assert changed.json()["items"][0]["title"] == "Šaltibarščiai"
+
+
+def test_detail_etag_not_modified_and_invalidated_by_edit(
+    client, settings, django_capture_on_commit_callbacks
+):
+    settings.RECIPE_VIEW_COUNTER_ENABLED = False
+    recipe = baker.make(Recipe, published_at=timezone.now())
+    url = f"/api/recipes/{recipe.slug}"
+
+    etag = client.get(url)["ETag"]
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+    assert client.get(url, HTTP_IF_NONE_MATCH=f"W/{etag}").status_code == 304
+
+    with django_capture_on_commit_callbacks(execute=True):
+        recipe.description = "Atnaujintas aprašymas"
+        recipe.save()
+
+    changed = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert changed.status_code == 200
+    assert changed["ETag"] != etag
+    assert changed.json()["description"] == "Atnaujintas aprašymas"
+
+
+# --- Paveikslėlių manifestas ---
+
+
+def _jpeg(width: int = 1600, height: int = 1000) -> ContentFile:
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 80, 40)).save(buffer, "JPEG")
+    return ContentFile(buffer.getvalue())
+
+
+@pytest.fixture
+def recipe_with_image(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.RECIPE_IMAGE_JOBS_ENABLED = False
+    recipe = baker.make(Recipe)
+    recipe.image.save("foto.jpg", _jpeg())
+    recipe.refresh_from_db()
+    return recipe
+
+
+def test_saving_image_builds_complete_manifest(recipe_with_image, tmp_path):
+    recipe = recipe_with_image
+
+    assert is_current(recipe)
+    manifest = recipe.image_variants
+    assert manifest["source"] == recipe.image.name
+    assert manifest["original"]["width"] == 1600
+    for size in SIZES:
+        for fmt in FORMATS:
+            entry = manifest["variants"][size][fmt]
+            assert (tmp_path / entry["name"]).is_file()
+            assert entry["bytes"] > 0 and entry["width"] <= 1600
+    assert not generate_variants(recipe)
+
+
+# --- Paveikslėlių darbų eilė (`recipes.image_jobs`) ---
+
+
+def test_image_job_retries_with_backoff_then_fails(
+    settings, tmp_path, monkeypatch, django_capture_on_commit_callbacks
+):
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.RECIPE_IMAGE_JOBS_ENABLED = True
+    settings.RECIPE_IMAGE_JOB_MAX_ATTEMPTS = 2
+    recipe = baker.make(Recipe)
+    with django_capture_on_commit_callbacks(execute=True):
+        recipe.image.save("foto.jpg", _jpeg())
+    job = ImageVariantJob.objects.get()
+    assert (job.object_id, job.source) == (recipe.id, recipe.image.name)
+    assert recipe.image_variants == {}
+
+    def broken(obj, **kwargs):
+        raise OSError("diskas pilnas")
+
+    generate = image_jobs.generate_variants
+    monkeypatch.setattr(image_jobs, "generate_variants", broken)
+
+    assert image_jobs.claim_jobs(10) == [job.id]
+    assert image_jobs.claim_jobs(10) == []
+    started = timezone.now()
+    assert image_jobs.run_job(job.id) == ImageVariantJob.Status.PENDING
+    job.refresh_from_db()
+    assert job.attempts == 1 and job.last_error == "OSError: diskas pilnas"
+    assert job.run_after - started >= image_jobs.RETRY_BASE
+    # Pauzė dar nepasibaigė – darbas nepaimamas.
+    assert image_jobs.claim_jobs(10) == []
+
+    ImageVariantJob.objects.filter(id=job.id).update(run_after=started)
+    assert image_jobs.claim_jobs(10) == [job.id]
+    started = timezone.now()
+    assert image_jobs.run_job(job.id) == ImageVariantJob.Status.FAILED
+    job.refresh_from_db()
+    assert job.attempts == 2
+    assert job.run_after - started >= 2 * image_jobs.RETRY_BASE
+    ImageVariantJob.objects.filter(id=job.id).update(run_after=started)
+    assert image_jobs.claim_jobs(10) == []
+
+    # Pakartotinis įtraukimas grąžina tą patį darbą į eilę.
+    monkeypatch.setattr(image_jobs, "generate_variants", generate)
+    with django_capture_on_commit_callbacks(execute=True):
+        image_jobs.enqueue(recipe)
+    assert ImageVariantJob.objects.get().status == ImageVariantJob.Status.PENDING
+    assert image_jobs.claim_jobs(10) == [job.id]
+    assert image_jobs.run_job(job.id) == ImageVariantJob.Status.DONE
+    recipe.refresh_from_db()
+    assert is_current(recipe)
+
+
+def test_stale_running_job_is_reclaimed():
+    job = baker.make(
+        ImageVariantJob,
+        kind=ImageVariantJob.Kind.RECIPE,
+        status=ImageVariantJob.Status.RUNNING,
+        locked_at=timezone.now() - image_jobs.STALE_AFTER - timedelta(seconds=1),
+    )
+    assert image_jobs.claim_jobs(10) == [job.id]
+
+
+# --- Manifesto tikrinimas ir dalinis perstatymas ---
+
+
+def test_is_current_rejects_stale_or_partial_manifest(recipe_with_image):
+    recipe = recipe_with_image
+    manifest = recipe.image_variants
+
+    partial = copy.deepcopy(manifest)
+    del partial["variants"]["thumb"]["avif"]
+    recipe.image_variants = partial
+    assert not is_current(recipe)
+
+    without_original = {**manifest, "original": {}}
+    recipe.image_variants = without_original
+    assert not is_current(recipe)
+
+    recipe.image_variants = {**manifest, "source": "recipes/hero/kita.jpg"}
+    assert not is_current(recipe)
+    assert current_variants(recipe) == {}
+
+
+def test_regenerate_subset_on_current_and_stale_manifest(recipe_with_image):
+    recipe = recipe_with_image
+
+    assert len(regenerate_variants(recipe, sizes=("large",), formats=("webp",))) == 1
+    assert is_current(recipe)
+
+    partial = copy.deepcopy(recipe.image_variants)
+    del partial["variants"]["small"]
+    Recipe.objects.filter(pk=recipe.pk).update(image_variants=partial)
+    recipe.refresh_from_db()
+
+    # Nepilnas manifestas perrašomas visas, nepaisant pasirinkto poaibio.
+    encoded = regenerate_variants(recipe, sizes=("large",), formats=("webp",))
+    assert len(encoded) == len(SIZES) * len(FORMATS)
+    recipe.refresh_from_db()
+    assert is_current(recipe)
+
+
+# --- Variantai iš vieno dekodavimo (`recipes.image_pipeline`) ---
+
+
+def test_render_variants_matches_spec_sizes():
+    specs = {
+        ("large", "webp"): VariantSpec([ResizeToFit(800, 800)], "WEBP", {"quality": 80}),
+        ("large", "avif"): VariantSpec([ResizeToFit(800, 800)], "AVIF", {"quality": 60}),
+        ("thumb", "webp"): VariantSpec([ResizeToFill(120, 120)], "WEBP"),
+        ("huge", "webp"): VariantSpec([ResizeToFit(4000, 4000)], "WEBP"),
+    }
+    rendered = render_variants(_jpeg(1600, 1000).read(), specs)
+
+    sizes = {key: Image.open(io.BytesIO(data)).size for key, data in rendered.variants.items()}
+    assert sizes == {
+        ("large", "webp"): (800, 500),
+        ("large", "avif"): (800, 500),
+        ("thumb", "webp"): (120, 120),
+        # Kaip `imagekit`: didinama iš pilno originalo, ne iš sumažinto dekodavimo.
+        ("huge", "webp"): (4000, 2500),
+    }
+    assert Image.open(io.BytesIO(rendered.variants[("large", "avif")])).format == "AVIF"
+
+
+# --- Originalo matmenys, LQIP ir spalva ---
+
+
+def test_detail_image_has_dimensions_lqip_and_color(client, settings, recipe_with_image):
+    settings.RECIPE_VIEW_COUNTER_ENABLED = False
+    images = client.get(f"/api/recipes/{recipe_with_image.slug}").json()["images"]
+
+    assert (images["width"], images["height"]) == (1600, 1000)
+    assert (images["large"]["width"], images["large"]["height"]) == (1280, 800)
+    prefix = "data:image/webp;base64,"
+    assert images["lqip"].startswith(prefix)
+    preview = Image.open(io.BytesIO(base64.b64decode(images["lqip"][len(prefix) :])))
+    assert preview.size == (16, 10)
+    red, green, blue = (int(images["color"][i : i + 2], 16) for i in (1, 3, 5))
+    assert abs(red - 200) <= 8 and abs(green - 80) <= 8 and abs(blue - 40) <= 8
+
+
+def test_dominant_color_is_most_common_not_average():
+    image = Image.new("RGB", (100, 100), (20, 120, 40))
+    image.paste((240, 240, 240), (0, 0, 100, 30))
+
+    described = describe_original(image, (100, 100))
+    assert described["color"] == "#147828"
+
+
+# --- Pasirašytas paveikslėlių origin (`recipes.image_origin`) ---
+
+
+@pytest.fixture
+def origin_recipe(settings, monkeypatch, recipe_with_image):
+    settings.RECIPE_IMAGE_ORIGIN_KEY = "origin-test-key"
+    settings.RECIPE_IMAGE_ORIGIN_WORKERS = 1
+    monkeypatch.setattr(image_origin, "_slots", None)
+    return recipe_with_image
+
+
+def test_origin_serves_signed_variant_and_rejects_bad_requests(client, origin_recipe):
+    url = image_origin.signed_url(origin_recipe, 320, "webp")
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response["Content-Type"] == "image/webp"
+    assert response["Cache-Control"] == image_origin.CACHE_CONTROL
+    assert Image.open(io.BytesIO(response.content)).size == (320, 200)
+
+    path, _, signature = url.partition("?s=")
+    assert client.get(f"{path}?s={'0' * len(signature)}").status_code == 403
+    assert client.get(path).status_code == 403
+    # Kitas plotis su tuo pačiu parašu – parašas nebegalioja.
+    assert client.get(url.replace("/320/", "/640/")).status_code == 403
+    # Neleistinas plotis – 404 net ir su teisingu parašu.
+    unlisted = image_origin.signed_url(origin_recipe, 333, "webp")
+    assert client.get(unlisted).status_code == 404
+
+
+def test_origin_returns_503_when_encoding_pool_is_busy(client, origin_recipe):
+    cached = image_origin.signed_url(origin_recipe, 320, "avif")
+    assert client.get(cached).status_code == 200
+
+    slots = image_origin._encoding_slots()
+    assert slots.acquire(blocking=False)
+    try:
+        busy = client.get(image_origin.signed_url(origin_recipe, 640, "avif"))
+        assert busy.status_code == 503
+        assert busy["Retry-After"] == "2"
+        assert busy["Cache-Control"] == "no-store"
+        # Jau užkoduotas variantas skaitomas iš saugyklos – pool'o nereikia.
+        assert client.get(cached).status_code == 200
+    finally:
+        slots.release()
+    assert client.get(image_origin.signed_url(origin_recipe, 640, "avif")).status_code == 200
+
+
+# --- Variantų perstatymas tik pasikeitus šaltiniui ir `gc_image_variants` ---
+
+
+def test_variants_are_scheduled_only_when_image_changes(recipe_with_image, monkeypatch):
+    scheduled = []
+    monkeypatch.setattr(image_jobs, "schedule_variants", scheduled.append)
+    recipe = recipe_with_image
+
+    recipe.title = "Kitas pavadinimas"
+    recipe.save()
+    assert scheduled == []
+
+    recipe.image.save("kita.jpg", _jpeg(800, 500))
+    assert scheduled == [recipe]
+    recipe.save()
+    assert scheduled == [recipe]
+
+    # Atidėtas `image` – būsena nežinoma, planuojama iš naujo.
+    deferred = Recipe.objects.defer("image").get(pk=recipe.pk)
+    deferred.save()
+    assert scheduled == [recipe, deferred]
+
+
+def test_gc_image_variants_deletes_only_old_orphans(recipe_with_image, tmp_path):
+    recipe = recipe_with_image
+    live = [
+        entry["name"]
+        for formats in recipe.image_variants["variants"].values()
+        for entry in formats.values()
+    ]
+    orphans = [
+        tmp_path / "CACHE/images/recipes/hero/senas/thumb.webp",
+        tmp_path / f"CACHE/origin/recipe/{recipe.pk + 1}/abc123/320.webp",
+    ]
+    for orphan in orphans:
+        orphan.parent.mkdir(parents=True, exist_ok=True)
+        orphan.write_bytes(b"x" * 10)
+
+    # Numatytai jaunesni nei 24 h failai neliečiami.
+    call_command("gc_image_variants", stdout=io.StringIO())
+    assert all(orphan.exists() for orphan in orphans)
+
+    out = io.StringIO()
+    call_command("gc_image_variants", "--min-age-hours", "0", "--dry-run", stdout=out)
+    assert "būtų ištrinta 2" in out.getvalue()
+    assert all(orphan.exists() for orphan in orphans)
+
+    call_command("gc_image_variants", "--min-age-hours", "0", stdout=io.StringIO())
+    assert not any(orphan.exists() for orphan in orphans)
+    assert all((tmp_path / name).is_file() for name in live)
+    assert (tmp_path / recipe.image.name).is_file()
@@ -0,0 +1,60 @@
+"""Teksto normalizavimas paieškai.
+
+Principai:
+- Ta pati funkcija taikoma ir indeksuojamam tekstui, ir užklausai, todėl
+  „saltibarsciai“ sutampa su „šaltibarščiai“.
+- Lankstymas daromas Python'e (NFKD + diakritikų šalinimas), todėl nereikia
+  PostgreSQL `unaccent` plėtinio ir SQLite elgiasi taip pat.
+"""
+
+from __future__ import annotations
+
+import re
+import unicodedata
+from collections.abc import Iterable
+
+from django.utils.html import strip_tags
+
+_TERM_RE = re.compile(r"\w+")
+
+
+def fold_text(value: str | None) -> str:
+    """Mažosios raidės be diakritikų ir su suglaudintais tarpais."""
+
+    decomposed = unicodedata.normalize("NFKD", value or "")
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(stripped.casefold().split())
+
+
+def fold_terms(value: str | None) -> list[str]:
+    """Sulankstyti užklausos žodžiai (be skyrybos)."""
+
+    return _TERM_RE.findall(fold_text(value))
+
+
+def surface_terms(value: str | None) -> list[tuple[str, str]]:
+    """`(sulankstytas, pradinis)` žodžių poros; pradinis – mažosiomis su diakritikais."""
+
+    pairs: list[tuple[str, str]] = []
+    for word in _TERM_RE.findall(unicodedata.normalize("NFC", value or "").casefold()):
+        terms = fold_terms(word)
+        pairs.extend((term, word if len(terms) == 1 else term) for term in terms)
+    return pairs
+
+
+def recipe_search_texts(
+    *,
+    title: str,
+    description: str,
+    description_html: str,
+    ingredient_names: Iterable[str],
+    tag_names: Iterable[str],
+) -> tuple[str, str]:
+    """Recepto paieškos tekstas: (pavadinimas, visa kita), jau sulankstytas.
+
+    Pavadinimas atskirai, kad paieškos vektoriuje gautų didesnį svorį.
+    """
+
+    plain_description = description or strip_tags(description_html or "")
+    body = " ".join([plain_description, *ingredient_names, *tag_names])
+    return fold_text(title), fold_text(body)
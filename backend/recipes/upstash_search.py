@@ -6,13 +6,16 @@ Tikslas:
 - Klaidos indeksuojant neturi blokuoti recepto išsaugojimo (log + continue).
 
 Šis modulis sąmoningai neturi jokių signalų registracijos – tai daroma per
-`recipes.signals` ir `RecipesConfig.ready()`.
+`recipes.signals` ir `RecipesConfig.ready()`. Likusi programa su juo kalba
+per `recipes.search_backend.UpstashSearchBackend`.
 """
 
 from __future__ import annotations
 
 import logging
 import os
+import re
+from collections.abc import Iterable
 from functools import lru_cache
 from typing import Any
 
@@ -22,10 +25,17 @@ from django.utils.html import strip_tags
 
 from upstash_search import Search
 
+from .filtering import SLUG_FILTERS, filter_clauses
 from .models import Recipe
 
 logger = logging.getLogger(__name__)
 
+# Struktūrinių filtrų laukai dokumento `content`'e. Upstash filtrai veikia tik
+# `content` laukams, todėl slugus laikome ten kaip `|a|b|` eilutę – narystė
+# tikrinama `GLOB '*|a|*'`, o skirtukai neleidžia `veg` sutapti su `vegan`.
+FILTER_CONTENT_FIELDS = {field: f"{field}_slugs" for field in SLUG_FILTERS}
+_SAFE_FILTER_VALUE = re.compile(r"^[\w-]+$")
+
 
 def _recipe_document_id(recipe_id: int) -> str:
     return f"recipe:{recipe_id}"
@@ -82,7 +92,12 @@ def _compact_join(values: list[str]) -> str:
     return ", ".join(items)
 
 
-def _published_recipe_queryset() -> QuerySet[Recipe]:
+def _slug_list(values: list[str]) -> str:
+    items = sorted({v.strip() for v in values if v and v.strip()})
+    return f"|{'|'.join(items)}|" if items else ""
+
+
+def published_recipe_queryset() -> QuerySet[Recipe]:
     return (
         Recipe.objects.filter(published_at__isnull=False)
         .prefetch_related(
@@ -127,7 +142,12 @@ def build_recipe_document(recipe: Recipe) -> dict[str, Any]:
         "cuisines": _compact_join(cuisines),
         "categories": _compact_join(categories),
         "tags": _compact_join(tags),
+        "difficulty": recipe.difficulty or "",
     }
+    for field, relation in SLUG_FILTERS.items():
+        content[FILTER_CONTENT_FIELDS[field]] = _slug_list(
+            [item.slug for item in getattr(recipe, relation).all()]
+        )
 
     metadata: dict[str, Any] = {
         "recipe_id": recipe.id,
@@ -156,21 +176,54 @@ def upsert_recipe(recipe_id: int) -> None:
         return
 
     try:
-        recipe = _published_recipe_queryset().filter(id=recipe_id).first()
+        recipe = published_recipe_queryset().filter(id=recipe_id).first()
         index = _client().index(_index_name())
 
         if recipe is None:
             index.delete(ids=[_recipe_document_id(recipe_id)])
-            return
-
-        doc = build_recipe_document(recipe)
-        index.upsert(documents=[doc])
+        else:
+            index.upsert(documents=[build_recipe_document(recipe)])
 
     except Exception:
         logger.exception(
             "Upstash Search: nepavyko upsert'inti recepto (recipe_id=%s)", recipe_id)
 
 
+def bulk_upsert_recipes(recipe_ids: Iterable[int] | None = None, *, batch_size: int = 100) -> int:
+    """Upsert'ina receptus partijomis; grąžina upsert'intų dokumentų skaičių.
+
+    `recipe_ids=None` – visi publikuoti receptai. Nurodyti, bet nepublikuoti
+    (ar ištrinti) receptai pašalinami iš indekso.
+    """
+
+    if not _is_enabled():
+        return 0
+
+    qs = published_recipe_queryset().order_by("id")
+    wanted: set[int] | None = None
+    if recipe_ids is not None:
+        wanted = set(recipe_ids)
+        qs = qs.filter(id__in=wanted)
+
+    index = _client().index(_index_name())
+    upserted = 0
+    batch: list[dict[str, Any]] = []
+    for recipe in qs.iterator(chunk_size=batch_size):
+        batch.append(build_recipe_document(recipe))
+        if wanted is not None:
+            wanted.discard(recipe.id)
+        if len(batch) >= batch_size:
+            index.upsert(documents=batch)
+            upserted += len(batch)
+            batch = []
+    if batch:
+        index.upsert(documents=batch)
+        upserted += len(batch)
+    if wanted:
+        index.delete(ids=[_recipe_document_id(recipe_id) for recipe_id in sorted(wanted)])
+    return upserted
+
+
 def delete_recipe(recipe_id: int) -> None:
     """Pašalina recepto dokumentą iš Upstash Search."""
 
@@ -185,11 +238,49 @@ def delete_recipe(recipe_id: int) -> None:
             "Upstash Search: nepavyko ištrinti recepto (recipe_id=%s)", recipe_id)
 
 
-def search_recipe_ids(query: str, *, limit: int = 10) -> list[int] | None:
+def filter_pushdown_enabled() -> bool:
+    """Ar struktūrinius filtrus perduoti Upstash užklausai."""
+
+    return getattr(settings, "UPSTASH_SEARCH_FILTER_PUSHDOWN", True)
+
+
+def _clause_expression(field: str, values: tuple[str, ...], negated: bool) -> str:
+    if field == "difficulty":
+        quoted = ", ".join(f"'{value}'" for value in values)
+        return f"difficulty {'NOT IN' if negated else 'IN'} ({quoted})"
+
+    content_field = FILTER_CONTENT_FIELDS[field]
+    operator = "NOT GLOB" if negated else "GLOB"
+    parts = [f"{content_field} {operator} '*|{value}|*'" for value in values]
+    if len(parts) == 1:
+        return parts[0]
+    return "(" + (" AND " if negated else " OR ").join(parts) + ")"
+
+
+def build_filter_expression(filters: Any) -> str:
+    """Struktūriniai filtrai kaip Upstash filtro išraiška (tuščia – be filtrų).
+
+    Semantika ta pati kaip `recipes.filtering`: sąlygos jungiamos AND, `|`
+    reikšmės – OR, `!` – NOT. Jei kuri nors reikšmė netinka išraiškai (ne slugas),
+    grąžinama tuščia eilutė ir filtruojama lokaliai.
+    """
+
+    expressions: list[str] = []
+    for field, clauses in filter_clauses(filters).items():
+        for clause in clauses:
+            if not all(_SAFE_FILTER_VALUE.match(value) for value in clause.values):
+                return ""
+            expressions.append(_clause_expression(field, clause.values, clause.negated))
+    return " AND ".join(expressions)
+
+
+def search_recipe_ids(query: str, *, limit: int = 10, filter: str = "") -> list[int] | None:
     """Grąžina receptų ID iš Upstash pagal užklausą.
 
     Pastabos:
     - Upstash index'e laikome tik publikuotus receptus, todėl rezultatai yra publikuoti.
+    - `filter` – `build_filter_expression` išraiška; taikoma prieš `limit`, todėl
+      retas filtras nebepraranda atitikmenų už pirmų `limit` rezultatų ribos.
     - Jei integracija išjungta arba įvyksta klaida – grąžina `None`.
     """
 
@@ -202,7 +293,7 @@ def search_recipe_ids(query: str, *, limit: int = 10) -> list[int] | None:
 
     try:
         index = _client().index(_index_name())
-        scores = index.search(cleaned_query, limit=limit)
+        scores = index.search(cleaned_query, limit=limit, filter=filter)
 
         ids: list[int] = []
         seen: set[int] = set()
@@ -216,3 +307,4 @@ def search_recipe_ids(query: str, *, limit: int = 10) -> list[int] | None:
     except Exception:
         logger.exception("Upstash Search: nepavyko atlikti paieškos")
         return None
+
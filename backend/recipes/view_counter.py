@@ -0,0 +1,126 @@
+"""Receptų peržiūrų skaitiklis be DB kreipinio užklausos metu.
+
+Principai:
+- `record_view()` tik padidina skaitiklį proceso atmintyje (`(receptas,
+  diena) -> n`), todėl detalės užklausa DB nerašo ir karštas receptas
+  nesukelia eilučių užraktų.
+- Foninė gija kas `RECIPE_VIEW_FLUSH_INTERVAL` sekundžių paima visą buferį ir
+  įrašo jį vienu `INSERT ... ON CONFLICT DO UPDATE SET views = views + ...`
+  į `RecipeViewDaily` (dienos suvestinės).
+- Nepavykęs įrašymas grąžina skaičius į buferį; proceso pabaigoje
+  (`atexit`, pvz., gunicorn graceful restart) buferis įrašomas sinchroniškai.
+- Gija paleidžiama tingiai ir iš naujo po `fork` (worker'iai).
+"""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from datetime import date
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from .models import Recipe, RecipeViewDaily
+
+logger = logging.getLogger(__name__)
+
+_buffer: Counter[tuple[int, date]] = Counter()
+_buffer_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_flusher_pid: int | None = None
+
+
+def _flush_interval() -> float:
+    return float(getattr(settings, "RECIPE_VIEW_FLUSH_INTERVAL", 30))
+
+
+def is_enabled() -> bool:
+    return getattr(settings, "RECIPE_VIEW_COUNTER_ENABLED", True)
+
+
+def _upsert(rows: list[tuple[int, date, int]]) -> None:
+    table = connection.ops.quote_name(RecipeViewDaily._meta.db_table)
+    recipes = connection.ops.quote_name(Recipe._meta.db_table)
+    # SELECT iš receptų lentelės – ištrintiems receptams eilutė neįterpiama.
+    sql = (
+        f"INSERT INTO {table} (recipe_id, day, views) "
+        f"SELECT id, %s, %s FROM {recipes} WHERE id = %s "
+        f"ON CONFLICT (recipe_id, day) DO UPDATE SET views = {table}.views + excluded.views"
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(sql, [(day, views, recipe_id) for recipe_id, day, views in rows])
+
+
+def flush_views() -> int:
+    """Įrašo sukauptas peržiūras; grąžina įrašytų (receptas, diena) porų skaičių."""
+
+    with _flush_lock:
+        with _buffer_lock:
+            if not _buffer:
+                return 0
+            pending = dict(_buffer)
+            _buffer.clear()
+        rows = [(recipe_id, day, views) for (recipe_id, day), views in sorted(pending.items())]
+        try:
+            _upsert(rows)
+        except Exception:
+            with _buffer_lock:
+                _buffer.update(pending)
+            raise
+        return len(rows)
+
+
+def _flush_loop() -> None:
+    while True:
+        time.sleep(_flush_interval())
+        close_old_connections()
+        try:
+            flush_views()
+        except Exception:
+            logger.exception("Peržiūrų skaitiklis: nepavyko įrašyti (bus bandoma vėl)")
+
+
+def _ensure_flusher() -> None:
+    global _flusher_pid
+    pid = os.getpid()
+    if _flusher_pid == pid:
+        return
+    with _buffer_lock:
+        if _flusher_pid == pid:
+            return
+        if _flusher_pid is not None:
+            # Po `fork` tėvinio proceso buferis vaikui nepriklauso.
+            _buffer.clear()
+        _flusher_pid = pid
+    threading.Thread(target=_flush_loop, name="recipe-view-flush", daemon=True).start()
+
+
+def record_view(recipe_id: int) -> None:
+    if not is_enabled():
+        return
+    _ensure_flusher()
+    with _buffer_lock:
+        _buffer[(recipe_id, timezone.localdate())] += 1
+
+
+def pending_views(recipe_id: int) -> int:
+    """Dar neįrašytos šio proceso peržiūros (rodymui kartu su DB suvestine)."""
+
+    with _buffer_lock:
+        return sum(views for (rid, _), views in _buffer.items() if rid == recipe_id)
+
+
+@atexit.register
+def _flush_on_exit() -> None:
+    if _flusher_pid != os.getpid():
+        return
+    try:
+        flush_views()
+    except Exception:
+        logger.exception("Peržiūrų skaitiklis: nepavyko įrašyti uždarant procesą")
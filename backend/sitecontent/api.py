@@ -1,8 +1,11 @@
 """Ninja endpoint'ai globaliam svetainės turiniui."""
 
-from django.db.models import Prefetch
+from django.db.models import Count, Max, Prefetch, Value
+from django.http import HttpResponse
 from ninja import Router
 
+from recipe_platform.conditional import make_etag, not_modified
+
 from .models import (
     Footer,
     FooterColumn,
@@ -35,6 +38,32 @@ def _abs_media_url(request, file_field) -> str | None:
     return request.build_absolute_uri(url)
 
 
+def _content_version(*querysets) -> tuple:
+    """(naujausias `updated_at`, kiekis) kiekvienam rinkiniui – viena UNION ALL užklausa.
+
+    Kiekis pagauna ištrynimus, `updated_at` – pakeitimus ir naujus įrašus.
+    """
+
+    parts = [
+        qs.order_by()
+        .annotate(group=Value(0))
+        .values("group")
+        .annotate(latest=Max("updated_at"), total=Count("id"))
+        .values_list("latest", "total")
+        for qs in querysets
+    ]
+    first, *rest = parts
+    return tuple(first.union(*rest, all=True)) if rest else tuple(first)
+
+
+def _check_etag(request, http_response: HttpResponse, *parts) -> HttpResponse | None:
+    etag = make_etag(request.build_absolute_uri(), *parts)
+    unchanged = not_modified(request, etag)
+    if unchanged is None:
+        http_response["ETag"] = etag
+    return unchanged
+
+
 def _serialize_dropdown(request, dropdown: HeaderDropdownItem) -> HeaderDropdownSchema:
     return HeaderDropdownSchema(
         id=dropdown.id,
@@ -107,7 +136,16 @@ def _serialize_hero(request, hero: HeroBlock) -> HeroBlockSchema:
 
 
 @router.get("/header", response=SiteHeaderSchema | None)
-def get_header(request):
+def get_header(request, http_response: HttpResponse):
+    version = _content_version(
+        SiteHeader.objects.filter(is_active=True),
+        HeaderMenu.objects.all(),
+        HeaderDropdownItem.objects.all(),
+    )
+    unchanged = _check_etag(request, http_response, "header", version)
+    if unchanged is not None:
+        return unchanged
+
     dropdown_prefetch = Prefetch(
         "dropdown_items", queryset=HeaderDropdownItem.objects.order_by("order")
     )
@@ -128,7 +166,12 @@ def get_header(request):
 
 
 @router.get("/footer", response=FooterSchema | None)
-def get_footer(request):
+def get_footer(request, http_response: HttpResponse):
+    version = _content_version(Footer.objects.filter(is_active=True), FooterColumn.objects.all())
+    unchanged = _check_etag(request, http_response, "footer", version)
+    if unchanged is not None:
+        return unchanged
+
     footer = (
         Footer.objects.filter(is_active=True)
         .prefetch_related(
@@ -145,6 +188,11 @@ def get_footer(request):
 
 
 @router.get("/heroes", response=list[HeroBlockSchema])
-def list_heroes(request):
+def list_heroes(request, http_response: HttpResponse):
+    version = _content_version(HeroBlock.objects.filter(is_active=True))
+    unchanged = _check_etag(request, http_response, "heroes", version)
+    if unchanged is not None:
+        return unchanged
+
     heroes = HeroBlock.objects.filter(is_active=True).order_by("title")
     return [_serialize_hero(request, hero) for hero in heroes]